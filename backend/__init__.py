@@ -1,30 +1,57 @@
 """
-This module initializes the backend package by importing key functions and constants
+This module initializes the backend package by exposing key functions and constants
 for use throughout the application.
+
+The names are imported from their modules on first access, so that importing a
+subpackage such as backend.video does not load the application settings, which
+need the full environment.
 """
 
-from .application import create_flask_app
-from .auth import authenticate_user, cognito_token_required
-from .database import create_db_tables, initialize_database, update_configuration
-from .environ import (
-    extract_environment_variable,
-    safe_create_results_folder,
-    safe_create_upload_folder,
-)
-from .exceptions import AuthError
-from .model_routes import register_project_model_routes
-from .routes import (
-    register_login_route,
-    register_react_base,
-    register_registration_route,
-    register_user_logout,
-    register_user_validation,
-    register_video_processing,
-)
-from .settings import (
-    ALLOWED_CORS_ORIGINS,
-    ALLOWED_FIELDS,
-    DEBUG,
-    STATIC_FOLDER,
-    TEMPLATE_FOLDER,
-)
+import importlib
+
+_EXPORTS = {
+    ".application": ("create_flask_app",),
+    ".auth": ("authenticate_user", "cognito_token_required"),
+    ".database": ("create_db_tables", "initialize_database", "update_configuration"),
+    ".environ": (
+        "extract_environment_variable",
+        "safe_create_results_folder",
+        "safe_create_upload_folder",
+    ),
+    ".exceptions": ("AuthError", "RenderRequestError"),
+    ".model_routes": ("register_project_model_routes",),
+    ".routes": (
+        "register_local_identity_route",
+        "register_login_route",
+        "register_preview_route",
+        "register_react_base",
+        "register_registration_route",
+        "register_user_logout",
+        "register_user_validation",
+        "register_video_processing",
+    ),
+    ".settings": (
+        "ALLOWED_CORS_ORIGINS",
+        "ALLOWED_FIELDS",
+        "DEBUG",
+        "STATIC_FOLDER",
+        "TEMPLATE_FOLDER",
+        "USE_X_SENDFILE",
+    ),
+}
+_MODULES = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = sorted(_MODULES)
+
+
+def __getattr__(name):
+    module = _MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -2,16 +2,107 @@
 This module handles user authentication using AWS Cognito.
 """
 
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
 from functools import wraps
 from http import HTTPStatus
 
 import boto3
 import jwt
 import requests
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
 from flask import jsonify, request
 
 from .environ import extract_environment_variable
 from .exceptions import AuthError
+from .local_identity import get_local_cognito_client
+from .settings import (
+    COGNITO_CONNECT_TIMEOUT_SEC,
+    COGNITO_MAX_ATTEMPTS,
+    COGNITO_MAX_POOL_CONNECTIONS,
+    COGNITO_READ_TIMEOUT_SEC,
+    COGNITO_RETRY_MODE,
+    CONFIRMATION_ATTEMPTS,
+    CONFIRMATION_BACKOFF_SEC,
+    IDENTITY_BACKEND,
+    JWKS_MIN_REFETCH_SEC,
+    JWKS_TIMEOUT_SEC,
+    JWKS_TTL_SEC,
+    LOCAL_IDENTITY_BACKEND,
+    VERIFIED_TOKEN_CACHE_SIZE,
+    VERIFY_CONFIRMATION,
+)
+
+# The Cognito client of this process and the ID of the process that created it
+_cognito_client = None
+_cognito_client_pid = None
+_cognito_client_lock = threading.Lock()
+
+
+def create_cognito_client():
+    """Create a client for the configured identity backend.
+
+    Returns:
+        The in-memory user pool with the local identity backend, otherwise a new
+        botocore.client.CognitoIdentityProvider.
+    """
+    if IDENTITY_BACKEND == LOCAL_IDENTITY_BACKEND:
+        return get_local_cognito_client()
+    config = Config(
+        max_pool_connections=COGNITO_MAX_POOL_CONNECTIONS,
+        retries={
+            "mode": COGNITO_RETRY_MODE,
+            "max_attempts": COGNITO_MAX_ATTEMPTS,
+        },
+        connect_timeout=COGNITO_CONNECT_TIMEOUT_SEC,
+        read_timeout=COGNITO_READ_TIMEOUT_SEC,
+    )
+    # Sessions are not thread-safe, so the client gets a private one
+    return boto3.session.Session().client(
+        "cognito-idp",
+        region_name=extract_environment_variable("AWS_REGION"),
+        config=config,
+    )
+
+
+def get_cognito_client():
+    """Return the Cognito client shared by every request in this process.
+
+    The client is created on first use. boto3 clients are thread-safe, so one
+    client and its connection pool serve all requests. A process forked after
+    the client was created builds its own, since connections cannot be shared
+    across processes. With the local identity backend, the in-memory user pool
+    is returned instead.
+
+    Returns:
+        botocore.client.CognitoIdentityProvider: The shared client.
+    """
+    global _cognito_client, _cognito_client_pid
+    with _cognito_client_lock:
+        if _cognito_client is None or _cognito_client_pid != os.getpid():
+            _cognito_client = create_cognito_client()
+            _cognito_client_pid = os.getpid()
+        return _cognito_client
+
+
+def set_cognito_client(cognito_client):
+    """Replace the shared Cognito client.
+
+    A client wrapped in a botocore Stubber can be installed this way to run the
+    auth code offline.
+
+    Args:
+        cognito_client: The client to use, or None to create a new one on the
+            next call to get_cognito_client.
+    """
+    global _cognito_client, _cognito_client_pid
+    with _cognito_client_lock:
+        _cognito_client = cognito_client
+        _cognito_client_pid = os.getpid()
 
 
 def authenticate_user(username, password):
@@ -27,20 +118,25 @@ def authenticate_user(username, password):
     Raises:
         AuthError: If the user requires a new password or if credentials are invalid.
     """
-    aws_region = extract_environment_variable("AWS_REGION")
     client_id = extract_environment_variable("CLIENT_ID")
-    cognito_client = boto3.client("cognito-idp", region_name=aws_region)
-    try:
-        response = cognito_client.initiate_auth(
-            ClientId=client_id,
-            AuthFlow="USER_PASSWORD_AUTH",
-            AuthParameters={"USERNAME": username, "PASSWORD": password},
-        )
-        if "ChallengeName" in response:
-            raise AuthError("New password required", HTTPStatus.FORBIDDEN)
-        return response["AuthenticationResult"]
-    except cognito_client.exceptions.NotAuthorizedException as e:
-        raise AuthError("Invalid credentials", HTTPStatus.UNAUTHORIZED) from e
+    cognito_client = get_cognito_client()
+    for confirmed in (False, True):
+        try:
+            response = cognito_client.initiate_auth(
+                ClientId=client_id,
+                AuthFlow="USER_PASSWORD_AUTH",
+                AuthParameters={"USERNAME": username, "PASSWORD": password},
+            )
+            break
+        except cognito_client.exceptions.NotAuthorizedException as e:
+            raise AuthError("Invalid credentials", HTTPStatus.UNAUTHORIZED) from e
+        except cognito_client.exceptions.UserNotConfirmedException as e:
+            # Registration confirms in the background; finish it if it is behind
+            if confirmed or not confirm_user_account(username):
+                raise AuthError("Account is not confirmed", HTTPStatus.FORBIDDEN) from e
+    if "ChallengeName" in response:
+        raise AuthError("New password required", HTTPStatus.FORBIDDEN)
+    return response["AuthenticationResult"]
 
 
 def register_user_with_permanent_password(username, password, user_attributes):
@@ -54,9 +150,8 @@ def register_user_with_permanent_password(username, password, user_attributes):
     Raises:
     AuthError: If the user already exists or if credentials are invalid.
     """
-    aws_region = extract_environment_variable("AWS_REGION")
     client_id = extract_environment_variable("CLIENT_ID")
-    cognito_client = boto3.client("cognito-idp", region_name=aws_region)
+    cognito_client = get_cognito_client()
     return cognito_client.sign_up(
         ClientId=client_id,
         Username=username,
@@ -67,33 +162,78 @@ def register_user_with_permanent_password(username, password, user_attributes):
 
 
 def confirm_user_account(username):
-    aws_region = extract_environment_variable("AWS_REGION")
-    # Initialize the Cognito client
-    cognito_client = boto3.client(
-        "cognito-idp", region_name=aws_region
-    )  # Specify your AWS region
+    """Confirm a signed-up user, retrying transient Cognito failures.
 
-    try:
-        # Confirm the user account
-        response = cognito_client.admin_confirm_sign_up(
-            UserPoolId=extract_environment_variable("USER_POOL_ID"),
-            Username=username,
-        )
-        print(f"User '{username}' has been confirmed successfully.")
-        return response
+    Confirming is idempotent: a user who is already confirmed counts as a
+    success, so the confirmation can be repeated safely.
 
-    except cognito_client.exceptions.UserNotFoundException:
-        print(f"User '{username}' not found in the user pool.")
-    except Exception as e:
-        print("An error occurred during user confirmation:", e)
+    Args:
+        username (str): The user name of the user to confirm.
+
+    Returns:
+        bool: True if the user is confirmed, False if the user does not exist or
+        every attempt failed.
+    """
+    cognito_client = get_cognito_client()
+    user_pool_id = extract_environment_variable("USER_POOL_ID")
+    for attempt in range(CONFIRMATION_ATTEMPTS):
+        try:
+            cognito_client.admin_confirm_sign_up(
+                UserPoolId=user_pool_id, Username=username
+            )
+            print(f"User '{username}' has been confirmed successfully.")
+            break
+        except cognito_client.exceptions.NotAuthorizedException:
+            # Cognito refuses to confirm a user twice
+            print(f"User '{username}' was already confirmed.")
+            break
+        except cognito_client.exceptions.UserNotFoundException:
+            print(f"User '{username}' not found in the user pool.")
+            return False
+        except (ClientError, BotoCoreError) as e:
+            print(f"Confirmation attempt {attempt + 1} for '{username}' failed: {e}")
+            if attempt + 1 < CONFIRMATION_ATTEMPTS:
+                time.sleep(CONFIRMATION_BACKOFF_SEC * 2**attempt)
+    else:
+        return False
+
+    if VERIFY_CONFIRMATION:
+        user = cognito_client.admin_get_user(UserPoolId=user_pool_id, Username=username)
+        print(f"User '{username}' status: {user['UserStatus']}")
+    return True
+
+
+_confirming = set()
+_confirming_lock = threading.Lock()
+
+
+def start_user_confirmation(username):
+    """Confirm a signed-up user on a background thread.
+
+    A confirmation already running for the same user is not started again.
+
+    Args:
+        username (str): The user name of the user to confirm.
+    """
+    with _confirming_lock:
+        if username in _confirming:
+            return
+        _confirming.add(username)
+
+    def confirm():
+        try:
+            confirm_user_account(username)
+        except Exception as e:
+            print(f"An error occurred during user confirmation: {e}")
+        finally:
+            with _confirming_lock:
+                _confirming.discard(username)
+
+    threading.Thread(target=confirm, name="user-confirmation", daemon=True).start()
 
 
 def add_preferred_username(username, preferred_username_value):
-    aws_region = extract_environment_variable("AWS_REGION")
-    # Initialize the Cognito client
-    cognito_client = boto3.client(
-        "cognito-idp", region_name=aws_region
-    )  # Specify your AWS region
+    cognito_client = get_cognito_client()
 
     try:
         # Add preferred_username attribute to the user
@@ -115,24 +255,240 @@ def add_preferred_username(username, preferred_username_value):
         print("An error occurred while adding preferred_username:", e)
 
 
-# Function to get Cognito public keys (JWKs)
+class JWKSCache:
+    """
+    A thread-safe cache of the signing keys published at a JWKS URL.
+
+    Keys are served from memory for the TTL. After that the stale keys keep
+    being served while one background thread fetches the new set. A token
+    signed with an unknown key ID triggers one synchronous refetch, at most
+    every JWKS_MIN_REFETCH_SEC, so rotated keys are picked up straight away
+    while forged key IDs cannot make every request fetch the set. Synchronous
+    fetches are single-flight: requests that need one while another is running
+    wait for it and use its keys.
+
+    Attributes:
+    -----------
+    jwks_url : str
+        The URL of the key set.
+    ttl_sec : float
+        How long a fetched key set is fresh.
+    keys : dict
+        The PyJWK signing keys by key ID.
+    """
+
+    def __init__(self, jwks_url, ttl_sec, loader=None):
+        """
+        Args:
+            jwks_url (str): The URL of the key set.
+            ttl_sec (float): How long a fetched key set is fresh.
+            loader (callable, optional): Returns the JWKS document instead of
+                downloading it from jwks_url.
+        """
+        self.jwks_url = jwks_url
+        self.ttl_sec = ttl_sec
+        self.loader = loader
+        self.keys = {}
+        self.fetched_at = 0.0
+        self.refetched_at = 0.0
+        self.refreshing = False
+        self.lock = threading.Lock()
+        # Held for the whole of a synchronous fetch
+        self.fetch_lock = threading.Lock()
+
+    def fetch(self):
+        """Download the key set and replace the cached keys.
+
+        Raises:
+            jwt.PyJWKClientError: If the key set cannot be fetched or parsed.
+        """
+        try:
+            if self.loader is not None:
+                jwks = self.loader()
+            else:
+                response = requests.get(self.jwks_url, timeout=JWKS_TIMEOUT_SEC)
+                response.raise_for_status()
+                jwks = response.json()
+            jwk_set = jwt.PyJWKSet.from_dict(jwks)
+        except (requests.RequestException, ValueError, jwt.PyJWTError) as e:
+            raise jwt.PyJWKClientError(f"Could not fetch the JWKS: {e}") from e
+        keys = {key.key_id: key for key in jwk_set.keys if key.key_id}
+        with self.lock:
+            self.keys = keys
+            self.fetched_at = time.monotonic()
+
+    def _refresh_in_background(self):
+        try:
+            self.fetch()
+        except jwt.PyJWKClientError as e:
+            print(f"Keeping the cached JWKS: {e}")
+        finally:
+            with self.lock:
+                self.refreshing = False
+
+    def get_signing_key(self, kid):
+        """Return the signing key with a given key ID.
+
+        Args:
+            kid (str): The key ID from a token header.
+
+        Returns:
+            jwt.PyJWK: The signing key.
+
+        Raises:
+            jwt.PyJWKClientError: If the key set cannot be fetched or has no key
+            with that ID.
+        """
+        now = time.monotonic()
+        with self.lock:
+            keys = self.keys
+            stale = now - self.fetched_at > self.ttl_sec
+            refresh = bool(keys) and stale and not self.refreshing
+            if refresh:
+                self.refreshing = True
+            refetch = kid not in keys and (
+                not keys
+                or now - self.refetched_at > JWKS_MIN_REFETCH_SEC
+                or self.fetch_lock.locked()
+            )
+            if refetch:
+                self.refetched_at = now
+        if refresh:
+            threading.Thread(
+                target=self._refresh_in_background, name="jwks-refresh", daemon=True
+            ).start()
+        if refetch:
+            with self.fetch_lock:
+                with self.lock:
+                    keys = self.keys
+                    fetched = self.fetched_at > now
+                # A fetch that finished while this one waited is just as fresh
+                if not fetched:
+                    self.fetch()
+                    keys = self.keys
+        if kid not in keys:
+            raise jwt.PyJWKClientError(f"Unable to find a signing key for kid {kid}")
+        return keys[kid]
+
+    def get_signing_key_from_jwt(self, token):
+        """Return the signing key of a token, like PyJWKClient does.
+
+        Args:
+            token (str): The encoded token.
+
+        Returns:
+            jwt.PyJWK: The signing key.
+        """
+        return self.get_signing_key(jwt.get_unverified_header(token).get("kid"))
+
+
+class VerifiedTokenCache:
+    """
+    A bounded LRU cache of tokens whose signature and claims were verified.
+
+    Entries are keyed by the SHA-256 of the token and the verification options,
+    and are dropped once the token's exp passes, so a cached token is never
+    accepted after it would have expired.
+    """
+
+    def __init__(self, max_entries):
+        """
+        Args:
+            max_entries (int): The number of tokens remembered.
+        """
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(token, audience, issuer):
+        digest = hashlib.sha256(token.encode("utf-8")).hexdigest()
+        return digest, audience, issuer
+
+    def get(self, key):
+        """Return the claims of a verified token, or None if it is not cached."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry["exp"] <= time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return dict(entry)
+
+    def put(self, key, claims):
+        """Remember the claims of a verified token that has an exp claim."""
+        if not isinstance(claims.get("exp"), (int, float)):
+            return
+        with self.lock:
+            self.entries[key] = claims
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+_jwks_caches = {}
+_jwks_caches_lock = threading.Lock()
+verified_tokens = VerifiedTokenCache(VERIFIED_TOKEN_CACHE_SIZE)
+
+
 def get_cognito_public_keys():
+    """Return the process-wide signing key cache of the user pool.
+
+    Returns:
+        JWKSCache: The cache of the user pool's JWKS.
+    """
     aws_region = extract_environment_variable("AWS_REGION")
     user_pool_id = extract_environment_variable("USER_POOL_ID")
     cognito_domain = f"https://cognito-idp.{aws_region}.amazonaws.com"
     cognito_jwks_url = f"{cognito_domain}/{user_pool_id}/.well-known/jwks.json"
+    with _jwks_caches_lock:
+        if cognito_jwks_url not in _jwks_caches:
+            loader = None
+            if IDENTITY_BACKEND == LOCAL_IDENTITY_BACKEND:
+                loader = get_local_cognito_client().jwks
+            _jwks_caches[cognito_jwks_url] = JWKSCache(
+                cognito_jwks_url, JWKS_TTL_SEC, loader=loader
+            )
+        return _jwks_caches[cognito_jwks_url]
+
+
+def verify_cognito_token(token, audience=None, issuer=None):
+    """Verify a Cognito token, reusing the result of an earlier verification.
+
+    Args:
+        token (str): The encoded token.
+        audience (str, optional): The audience the token must be issued for.
+        issuer (str, optional): The issuer the token must come from.
 
-    # Pass the URL to the PyJWKClient
-    return jwt.PyJWKClient(cognito_jwks_url)
+    Returns:
+        dict: The decoded claims.
+
+    Raises:
+        jwt.InvalidTokenError: If the token is expired or invalid.
+        jwt.PyJWKClientError: If its signing key cannot be found.
+    """
+    key = verified_tokens.key(token, audience, issuer)
+    claims = verified_tokens.get(key)
+    if claims is not None:
+        return claims
+    signing_key = get_cognito_public_keys().get_signing_key_from_jwt(token)
+    claims = jwt.decode(
+        token,
+        signing_key.key,
+        algorithms=["RS256"],
+        audience=audience,
+        issuer=issuer,
+    )
+    verified_tokens.put(key, claims)
+    return dict(claims)
 
 
 def cognito_token_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        client_id = extract_environment_variable("CLIENT_ID")
-        jwks_client = get_cognito_public_keys()
         auth_header = request.headers.get("Authorization")
-        ALGORITHMS = ["RS256"]
         if not auth_header or not auth_header.startswith("Bearer "):
             return (
                 jsonify({"error": "Authorization token is missing or malformed"}),
@@ -141,13 +497,7 @@ def cognito_token_required(f):
 
         token = auth_header.split(" ")[1]  # Extract the token
         try:
-            signing_key = jwks_client.get_signing_key_from_jwt(token)
-            decoded_token = jwt.decode(
-                token,
-                signing_key.key,
-                algorithms=ALGORITHMS,
-                # Remove the 'audience' parameter if the token does not include the 'aud' claim
-            )
+            decoded_token = verify_cognito_token(token)
             request.user = decoded_token[
                 "sub"
             ]  # Attach user identity to request if needed
@@ -157,7 +507,7 @@ def cognito_token_required(f):
         except jwt.InvalidAudienceError:
             print("Invalid audience")
             return jsonify({"error": "Invalid audience in token"}), 401
-        except jwt.InvalidTokenError as e:
+        except (jwt.InvalidTokenError, jwt.PyJWKClientError) as e:
             print(f"Invalid token details: {e}")
             return jsonify({"error": f"Invalid token: {str(e)}"}), 401
 
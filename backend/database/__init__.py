@@ -1,6 +1,17 @@
 from .config import Config
 from .db import db
-from .models import Project
+from .models import (
+    Project,
+    ProxyRendition,
+    RenderJob,
+    RenderJobAccess,
+    RenderJobLease,
+    RenderJobStats,
+    RenderResult,
+    StoredFile,
+    UploadSession,
+    VideoProbe,
+)
 
 
 def initialize_database(app):
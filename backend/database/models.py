@@ -23,3 +23,132 @@ class Project(db.Model):
     )  # Use db.func for current timestamp
     user_id = db.Column(db.String(255), db.ForeignKey("users.id"), nullable=False)
     file_path = db.Column(db.String(300), nullable=True)  # Column to store file path
+
+
+class ProxyRendition(db.Model):
+    __tablename__ = "proxy_renditions"
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(
+        db.Integer, db.ForeignKey("projects.id"), nullable=False, unique=True
+    )
+    status = db.Column(db.String(20), nullable=False, default="pending")
+    created_at = db.Column(db.DateTime, default=func.now())
+    # Derivative file names, stored next to the upload like Project.file_path
+    proxy_path = db.Column(db.String(300), nullable=True)
+    thumbnails_path = db.Column(db.String(300), nullable=True)
+    poster_path = db.Column(db.String(300), nullable=True)
+    source_width = db.Column(db.Integer, nullable=True)
+    source_height = db.Column(db.Integer, nullable=True)
+    proxy_width = db.Column(db.Integer, nullable=True)
+    proxy_height = db.Column(db.Integer, nullable=True)
+    # Multiply proxy coordinates by these to get source pixel coordinates
+    scale_x = db.Column(db.Float, nullable=True)
+    scale_y = db.Column(db.Float, nullable=True)
+    project = db.relationship(
+        "Project", backref=db.backref("proxy", uselist=False, lazy=True)
+    )
+
+
+class VideoProbe(db.Model):
+    __tablename__ = "video_probes"
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(
+        db.Integer, db.ForeignKey("projects.id"), nullable=False, unique=True
+    )
+    status = db.Column(db.String(20), nullable=False, default="pending")
+    created_at = db.Column(db.DateTime, default=func.now())
+    width = db.Column(db.Integer, nullable=True)
+    height = db.Column(db.Integer, nullable=True)
+    # The exact frame rate is fps_num / fps_den, e.g. 30000 / 1001 for 29.97
+    fps_num = db.Column(db.Integer, nullable=True)
+    fps_den = db.Column(db.Integer, nullable=True)
+    duration_sec = db.Column(db.Float, nullable=True)
+    frame_count = db.Column(db.Integer, nullable=True)
+    # JSON list of [frame_number, time_sec] pairs, one per keyframe
+    keyframe_index = db.Column(db.Text, nullable=True)
+    project = db.relationship(
+        "Project", backref=db.backref("probe", uselist=False, lazy=True)
+    )
+
+
+class RenderJob(db.Model):
+    __tablename__ = "render_jobs"
+    id = db.Column(db.String(36), primary_key=True)  # UUID handed to the client
+    user_id = db.Column(db.String(255), nullable=True)
+    video_filename = db.Column(db.String(300), nullable=False)
+    result_path = db.Column(db.String(500), nullable=False)
+    # One of queued, running, done or failed
+    status = db.Column(db.String(20), nullable=False, default="queued")
+    progress = db.Column(db.Float, nullable=False, default=0.0)
+    frames_done = db.Column(db.Integer, nullable=False, default=0)
+    frame_count = db.Column(db.Integer, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=func.now())
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+
+class RenderJobLease(db.Model):
+    __tablename__ = "render_job_leases"
+    job_id = db.Column(db.String(36), db.ForeignKey("render_jobs.id"), primary_key=True)
+    # "hostname:pid" of the server process that queued the job
+    owner = db.Column(db.String(300), nullable=False)
+    # Unix time of the owner's last heartbeat; stale leases mean the owner died
+    heartbeat_at = db.Column(db.Float, nullable=False)
+
+
+class RenderJobAccess(db.Model):
+    __tablename__ = "render_job_access"
+    # Users other than the owner whose identical requests coalesced onto the job
+    job_id = db.Column(db.String(36), db.ForeignKey("render_jobs.id"), primary_key=True)
+    user_id = db.Column(db.String(255), primary_key=True)
+
+
+class RenderJobStats(db.Model):
+    __tablename__ = "render_job_stats"
+    job_id = db.Column(db.String(36), db.ForeignKey("render_jobs.id"), primary_key=True)
+    fps = db.Column(db.Float, nullable=False, default=0.0)
+    eta_sec = db.Column(db.Float, nullable=True)
+    # Cumulative seconds per render stage; pipelined stages overlap in time
+    decode_sec = db.Column(db.Float, nullable=False, default=0.0)
+    warp_sec = db.Column(db.Float, nullable=False, default=0.0)
+    blend_sec = db.Column(db.Float, nullable=False, default=0.0)
+    encode_sec = db.Column(db.Float, nullable=False, default=0.0)
+    updated_at = db.Column(db.DateTime, default=func.now(), onupdate=func.now())
+    job = db.relationship(
+        "RenderJob", backref=db.backref("stats", uselist=False, lazy=True)
+    )
+
+
+class RenderResult(db.Model):
+    __tablename__ = "render_results"
+    # SHA-256 of the source, overlay, placements, render mode and encoder settings
+    cache_key = db.Column(db.String(64), primary_key=True)
+    job_id = db.Column(db.String(36), db.ForeignKey("render_jobs.id"), nullable=False)
+    created_at = db.Column(db.DateTime, default=func.now())
+    job = db.relationship("RenderJob", lazy=True)
+
+
+class StoredFile(db.Model):
+    __tablename__ = "stored_files"
+    # Uploads with the same content share one file in the upload folder
+    sha256 = db.Column(db.String(64), primary_key=True)
+    filename = db.Column(db.String(300), nullable=False, unique=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    created_at = db.Column(db.DateTime, default=func.now())
+
+
+class UploadSession(db.Model):
+    __tablename__ = "upload_sessions"
+    id = db.Column(db.String(36), primary_key=True)  # UUID handed to the client
+    user_id = db.Column(db.String(255), db.ForeignKey("users.id"), nullable=False)
+    filename = db.Column(db.String(300), nullable=False)  # Sanitised client name
+    size = db.Column(db.BigInteger, nullable=False)
+    # Chunks are accepted in order, so this is also the offset of the next chunk
+    bytes_received = db.Column(db.BigInteger, nullable=False, default=0)
+    # One of uploading, writing (a chunk is being written), completing or complete
+    status = db.Column(db.String(20), nullable=False, default="uploading")
+    sha256 = db.Column(db.String(64), nullable=True)
+    project_id = db.Column(db.Integer, db.ForeignKey("projects.id"), nullable=True)
+    created_at = db.Column(db.DateTime, default=func.now())
+    updated_at = db.Column(db.DateTime, default=func.now(), onupdate=func.now())
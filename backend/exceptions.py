@@ -31,3 +31,28 @@ class AuthError(Exception):
         """
         self.status_code = status_code
         super().__init__(message)
+
+
+class RenderRequestError(Exception):
+    """
+    Custom exception class to handle invalid or rejected render and preview requests.
+
+    Attributes:
+    -----------
+    message : str
+        A human-readable message describing the error.
+    status_code : int
+        HTTP status code associated with the error.
+    """
+
+    def __init__(self, message, status_code):
+        """
+        Parameters:
+        -----------
+        message : str
+            A human-readable message describing the error.
+        status_code : int
+            HTTP status code associated with the error.
+        """
+        self.status_code = status_code
+        super().__init__(message)
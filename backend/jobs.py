@@ -0,0 +1,648 @@
+"""
+This module runs renders asynchronously on a pool of worker processes and keeps
+the state of each job in the render_jobs table.
+"""
+
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import create_engine, func, or_, select
+from sqlalchemy.exc import IntegrityError
+
+from .database import (
+    RenderJob,
+    RenderJobAccess,
+    RenderJobLease,
+    RenderJobStats,
+    RenderResult,
+    db,
+)
+from .exceptions import RenderRequestError
+from .video import (
+    STAGES,
+    RenderTelemetry,
+    render_placements,
+    render_placements_chunked,
+    render_variants,
+)
+
+# Workers write telemetry at most this often so they do not hammer the database
+PROGRESS_INTERVAL_SEC = 1.0
+
+# Server processes renew the leases of their jobs this often; a job whose lease
+# has not been renewed for LEASE_TIMEOUT_SEC belongs to a process that died
+LEASE_HEARTBEAT_SEC = 10.0
+LEASE_TIMEOUT_SEC = 60.0
+
+# One engine per worker process and database
+_engines = {}
+
+
+def get_engine(database_uri):
+    """Return the SQLAlchemy engine a worker process uses for job updates.
+
+    Args:
+        database_uri (str): The database URI of the application.
+
+    Returns:
+        Engine: An engine shared by every job run in this process.
+    """
+    if database_uri not in _engines:
+        _engines[database_uri] = create_engine(database_uri)
+    return _engines[database_uri]
+
+
+def update_job(database_uri, job_id, **values):
+    """Update the row of a render job from a worker process.
+
+    Args:
+        database_uri (str): The database URI of the application.
+        job_id (str): The ID of the job.
+        **values: The columns to set.
+    """
+    table = RenderJob.__table__
+    with get_engine(database_uri).begin() as connection:
+        connection.execute(table.update().where(table.c.id == job_id).values(**values))
+
+
+def record_telemetry(database_uri, job_ids, snapshot, **values):
+    """Store a telemetry snapshot of jobs, along with other job columns.
+
+    Args:
+        database_uri (str): The database URI of the application.
+        job_ids (list): The IDs of the jobs rendered together.
+        snapshot (dict): The snapshot returned by RenderTelemetry.snapshot.
+        **values: Other columns of the jobs to set.
+    """
+    frame_count = snapshot["frame_count"]
+    jobs = RenderJob.__table__
+    stats = RenderJobStats.__table__
+    with get_engine(database_uri).begin() as connection:
+        connection.execute(
+            jobs.update()
+            .where(jobs.c.id.in_(job_ids))
+            .values(
+                frames_done=snapshot["frames_done"],
+                frame_count=frame_count,
+                progress=(
+                    min(snapshot["frames_done"] / frame_count, 1.0)
+                    if frame_count
+                    else 0.0
+                ),
+                **values,
+            )
+        )
+        connection.execute(
+            stats.update()
+            .where(stats.c.job_id.in_(job_ids))
+            .values(
+                fps=snapshot["fps"],
+                eta_sec=snapshot["eta_sec"],
+                **{
+                    f"{stage}_sec": seconds
+                    for stage, seconds in snapshot["stage_sec"].items()
+                },
+            )
+        )
+
+
+def reclaim_orphaned_jobs(database_uri, now=None):
+    """Fail the queued and running jobs of server processes that have died.
+
+    A job is orphaned when its lease has not been renewed for
+    LEASE_TIMEOUT_SEC, or when it has no lease at all. Jobs owned by live
+    processes, including other servers sharing the database, are left alone.
+
+    Args:
+        database_uri (str): The database URI of the application.
+        now (float, optional): The current Unix time.
+
+    Returns:
+        int: The number of jobs marked as failed.
+    """
+    now = time.time() if now is None else now
+    jobs = RenderJob.__table__
+    leases = RenderJobLease.__table__
+    with get_engine(database_uri).begin() as connection:
+        result = connection.execute(
+            jobs.update()
+            .where(jobs.c.status.in_(["queued", "running"]))
+            .where(
+                or_(
+                    jobs.c.id.in_(
+                        select(leases.c.job_id).where(
+                            leases.c.heartbeat_at < now - LEASE_TIMEOUT_SEC
+                        )
+                    ),
+                    jobs.c.id.not_in(select(leases.c.job_id)),
+                )
+            )
+            .values(
+                status="failed",
+                error="Interrupted: the server running it stopped",
+                finished_at=func.now(),
+            )
+        )
+    return result.rowcount
+
+
+def run_render_job(
+    database_uri,
+    job_id,
+    video_path,
+    image_path,
+    result_path,
+    placements,
+    options,
+    probe=None,
+):
+    """Render a job in a worker process, recording its progress and outcome.
+
+    Args:
+        database_uri (str): The database URI of the application.
+        job_id (str): The ID of the job.
+        video_path (str): Path to the input video file.
+        image_path (str): Path to the overlay image file.
+        result_path (str): Path for saving the output video.
+        placements (list): The Placement objects to apply.
+        options (dict): The "backend" and "chunk_workers" render settings.
+        probe (dict, optional): The stored result of probe_video.
+
+    Returns:
+        bool: True if the render succeeded.
+    """
+    with get_engine(database_uri).begin() as connection:
+        connection.execute(RenderJobStats.__table__.insert().values(job_id=job_id))
+    update_job(database_uri, job_id, status="running", started_at=func.now())
+    reported_at = [0.0]
+
+    def report(telemetry):
+        now = time.monotonic()
+        if now - reported_at[0] < PROGRESS_INTERVAL_SEC:
+            return
+        reported_at[0] = now
+        record_telemetry(database_uri, [job_id], telemetry.snapshot())
+
+    telemetry = RenderTelemetry(listener=report)
+    try:
+        if options["chunk_workers"] > 1:
+            rendered = render_placements_chunked(
+                video_path,
+                image_path,
+                result_path,
+                placements,
+                workers=options["chunk_workers"],
+                telemetry=telemetry,
+                probe=probe,
+            )
+        else:
+            rendered = render_placements(
+                video_path,
+                image_path,
+                result_path,
+                placements,
+                backend=options["backend"],
+                telemetry=telemetry,
+                probe=probe,
+            )
+        if not rendered:
+            raise RuntimeError("The video or the overlay could not be read")
+    except Exception as e:
+        record_telemetry(
+            database_uri,
+            [job_id],
+            telemetry.snapshot(),
+            status="failed",
+            error=str(e),
+            finished_at=func.now(),
+        )
+        return False
+    snapshot = telemetry.snapshot()
+    snapshot["eta_sec"] = 0.0
+    record_telemetry(
+        database_uri, [job_id], snapshot, status="done", finished_at=func.now()
+    )
+    return True
+
+
+def run_variants_job(
+    database_uri, job_ids, video_path, variants, placements, probe=None
+):
+    """Render several overlay variants of a video from one decode pass.
+
+    Every variant has its own job; the jobs share progress and stage timings and
+    succeed or fail together.
+
+    Args:
+        database_uri (str): The database URI of the application.
+        job_ids (list): The IDs of the jobs, one per variant.
+        video_path (str): Path to the input video file.
+        variants (list): (image_path, result_path) pairs in the order of job_ids.
+        placements (list): The Placement objects to apply.
+        probe (dict, optional): The stored result of probe_video.
+
+    Returns:
+        bool: True if the render succeeded.
+    """
+    jobs = RenderJob.__table__
+    stats_rows = [{"job_id": job_id} for job_id in job_ids]
+    with get_engine(database_uri).begin() as connection:
+        connection.execute(RenderJobStats.__table__.insert(), stats_rows)
+        connection.execute(
+            jobs.update()
+            .where(jobs.c.id.in_(job_ids))
+            .values(status="running", started_at=func.now())
+        )
+    reported_at = [0.0]
+
+    def report(telemetry):
+        now = time.monotonic()
+        if now - reported_at[0] < PROGRESS_INTERVAL_SEC:
+            return
+        reported_at[0] = now
+        record_telemetry(database_uri, job_ids, telemetry.snapshot())
+
+    telemetry = RenderTelemetry(listener=report)
+    try:
+        if not render_variants(
+            video_path, variants, placements, telemetry=telemetry, probe=probe
+        ):
+            raise RuntimeError("The video or an overlay could not be read")
+    except Exception as e:
+        record_telemetry(
+            database_uri,
+            job_ids,
+            telemetry.snapshot(),
+            status="failed",
+            error=str(e),
+            finished_at=func.now(),
+        )
+        return False
+    snapshot = telemetry.snapshot()
+    snapshot["eta_sec"] = 0.0
+    record_telemetry(
+        database_uri, job_ids, snapshot, status="done", finished_at=func.now()
+    )
+    return True
+
+
+def find_user_job(job_id, user_id):
+    """Look up a render job that a user may see.
+
+    Must be called inside an application context.
+
+    Args:
+        job_id (str): The ID of the job.
+        user_id (str): The ID of the requesting user.
+
+    Returns:
+        RenderJob: The job if the user submitted it, or submitted an identical
+        request that was coalesced onto it; otherwise None.
+    """
+    granted = select(RenderJobAccess.job_id).where(RenderJobAccess.user_id == user_id)
+    return RenderJob.query.filter(
+        RenderJob.id == job_id,
+        or_(RenderJob.user_id == user_id, RenderJob.id.in_(granted)),
+    ).first()
+
+
+def serialize_stats(stats):
+    """Describe the telemetry of a render job for API responses.
+
+    Args:
+        stats (RenderJobStats): The telemetry row, or None before the job starts.
+
+    Returns:
+        dict: The frame rate, ETA and seconds per stage, or None.
+    """
+    if stats is None:
+        return None
+    return {
+        "fps": stats.fps,
+        "eta_sec": stats.eta_sec,
+        "stage_sec": {stage: getattr(stats, f"{stage}_sec") for stage in STAGES},
+    }
+
+
+def serialize_job(job):
+    """Describe a render job for API responses.
+
+    Args:
+        job (RenderJob): The job.
+
+    Returns:
+        dict: The public fields of the job.
+    """
+    return {
+        "id": job.id,
+        "status": job.status,
+        "progress": job.progress,
+        "frames_done": job.frames_done,
+        "frame_count": job.frame_count,
+        "telemetry": serialize_stats(job.stats),
+        "error": job.error,
+        "video_filename": job.video_filename,
+        "result_url": f"/jobs/{job.id}/result" if job.status == "done" else None,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+class RenderQueue:
+    """
+    Submits render jobs to a pool of worker processes once the scheduler lets
+    them start.
+
+    The pool is created on first use with the spawn start method, so no
+    request thread is forked. Every job holds a lease naming this process,
+    which a background thread renews; the same thread fails the jobs of
+    processes whose leases have gone stale, since their workers are gone.
+    """
+
+    def __init__(self, app, workers, options, scheduler):
+        """
+        Args:
+            app: The Flask application instance.
+            workers (int): The number of worker processes.
+            options (dict): The render settings passed to every job.
+            scheduler (RenderScheduler): Decides when queued jobs may start.
+        """
+        self.app = app
+        self.workers = workers
+        self.options = options
+        self.scheduler = scheduler
+        self.executor = None
+        self.database_uri = None
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.lock = threading.Lock()
+        # Serialises cache lookups with job creation so duplicates coalesce
+        self.submit_lock = threading.Lock()
+
+    def _start(self):
+        with self.lock:
+            if self.executor is not None:
+                return
+            self.database_uri = db.engine.url.render_as_string(hide_password=False)
+            reclaim_orphaned_jobs(self.database_uri)
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            threading.Thread(
+                target=self._heartbeat, name="render-lease-heartbeat", daemon=True
+            ).start()
+
+    def _heartbeat(self):
+        leases = RenderJobLease.__table__
+        jobs = RenderJob.__table__
+        while True:
+            time.sleep(LEASE_HEARTBEAT_SEC)
+            try:
+                with get_engine(self.database_uri).begin() as connection:
+                    connection.execute(
+                        leases.update()
+                        .where(leases.c.owner == self.owner)
+                        .where(
+                            leases.c.job_id.in_(
+                                select(jobs.c.id).where(
+                                    jobs.c.status.in_(["queued", "running"])
+                                )
+                            )
+                        )
+                        .values(heartbeat_at=time.time())
+                    )
+                reclaim_orphaned_jobs(self.database_uri)
+            except Exception as e:
+                print(f"Could not renew the render job leases: {e}")
+
+    def cached(self, cache_key, user_id=None):
+        """Find the job that rendered, or is rendering, a request.
+
+        Must be called inside an application context.
+
+        Args:
+            cache_key (str): The key returned by render_cache_key.
+            user_id (str, optional): The user making the request, who is given
+                access to the job if another user submitted it.
+
+        Returns:
+            RenderJob: A done job whose result file still exists, a queued or
+            running job, or None. Entries pointing at failed jobs or deleted
+            results are dropped.
+        """
+        self._start()
+        entry = db.session.get(RenderResult, cache_key)
+        if entry is None:
+            return None
+        job = entry.job
+        if job.status in ("queued", "running") or (
+            job.status == "done" and os.path.exists(job.result_path)
+        ):
+            return job if user_id is None else self._grant(job, user_id)
+        db.session.delete(entry)
+        db.session.commit()
+        return None
+
+    def submit(
+        self,
+        video_filename,
+        video_path,
+        image_path,
+        result_path,
+        placements,
+        user_id,
+        cost,
+        cache_key=None,
+        probe=None,
+    ):
+        """Record a queued job and hand it to the scheduler.
+
+        Requests with the same cache key as a queued, running or finished job are
+        coalesced onto that job instead.
+
+        Must be called inside an application context.
+
+        Args:
+            video_filename (str): The stored file name of the uploaded video.
+            video_path (str): Path to the input video file.
+            image_path (str): Path to the overlay image file.
+            result_path (str): Path for saving the output video.
+            placements (list): The Placement objects to apply.
+            user_id (str): The ID of the submitting user.
+            cost (int): The estimated cost of the render.
+            cache_key (str, optional): The key returned by render_cache_key.
+            probe (dict, optional): The stored result of probe_video.
+
+        Returns:
+            RenderJob: The queued job, or the existing job for the same key.
+
+        Raises:
+            RenderRequestError: If the scheduler does not admit the job.
+        """
+        with self.submit_lock:
+            if cache_key is not None:
+                job = self.cached(cache_key)
+                if job is not None:
+                    return self._grant(job, user_id)
+            job, created = self._create_job(
+                video_filename, result_path, user_id, cache_key
+            )
+            if not created:
+                return self._grant(job, user_id)
+            self._schedule(
+                [job],
+                cost,
+                run_render_job,
+                job.id,
+                video_path,
+                image_path,
+                result_path,
+                placements,
+                self.options,
+                probe,
+            )
+        self.scheduler.dispatch()
+        return job
+
+    def submit_variants(
+        self,
+        video_filename,
+        video_path,
+        variants,
+        placements,
+        user_id,
+        cost,
+        probe=None,
+    ):
+        """Record one job per overlay variant and schedule them as one render.
+
+        Variants whose cache key matches a queued, running or finished job are
+        coalesced onto that job; the others are rendered together so the video
+        is decoded once.
+
+        Must be called inside an application context.
+
+        Args:
+            video_filename (str): The stored file name of the uploaded video.
+            video_path (str): Path to the input video file.
+            variants (list): (image_path, result_path, cache_key) tuples.
+            placements (list): The Placement objects to apply.
+            user_id (str): The ID of the submitting user.
+            cost (int): The estimated cost of rendering every variant.
+            probe (dict, optional): The stored result of probe_video.
+
+        Returns:
+            list: The job of each variant, in order.
+
+        Raises:
+            RenderRequestError: If the scheduler does not admit the render.
+        """
+        with self.submit_lock:
+            jobs = []
+            pending = []
+            for image_path, result_path, cache_key in variants:
+                job, created = self.cached(cache_key), False
+                if job is None:
+                    job, created = self._create_job(
+                        video_filename, result_path, user_id, cache_key
+                    )
+                jobs.append(job if created else self._grant(job, user_id))
+                if created:
+                    pending.append((job, image_path))
+            if pending:
+                self._schedule(
+                    [job for job, _ in pending],
+                    cost * len(pending) // len(variants),
+                    run_variants_job,
+                    [job.id for job, _ in pending],
+                    video_path,
+                    [(image_path, job.result_path) for job, image_path in pending],
+                    placements,
+                    probe,
+                )
+        self.scheduler.dispatch()
+        return jobs
+
+    def _grant(self, job, user_id):
+        """Let a user whose request was coalesced onto a job see that job."""
+        if job.user_id != user_id and not db.session.get(
+            RenderJobAccess, (job.id, user_id)
+        ):
+            db.session.add(RenderJobAccess(job_id=job.id, user_id=user_id))
+            try:
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()  # Granted by a concurrent request
+        return job
+
+    def _create_job(self, video_filename, result_path, user_id, cache_key):
+        self._start()
+        job = RenderJob(
+            id=str(uuid.uuid4()),
+            status="queued",
+            user_id=user_id,
+            video_filename=video_filename,
+            result_path=result_path,
+        )
+        db.session.add(job)
+        db.session.add(
+            RenderJobLease(job_id=job.id, owner=self.owner, heartbeat_at=time.time())
+        )
+        if cache_key is not None:
+            db.session.add(RenderResult(cache_key=cache_key, job=job))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another server process recorded the same key first
+            db.session.rollback()
+            existing = self.cached(cache_key)
+            if existing is None:
+                raise
+            return existing, False
+        return job, True
+
+    def _schedule(self, jobs, cost, function, *args):
+        """Hand a render of some jobs to the scheduler.
+
+        The render calls function(database_uri, *args) in a worker process. If
+        the scheduler rejects it, the jobs and their cache entries are deleted.
+        """
+        job_ids = [job.id for job in jobs]
+
+        def start():
+            future = self.executor.submit(function, self.database_uri, *args)
+            for job_id in job_ids:
+                future.add_done_callback(
+                    lambda future, job_id=job_id: self._finished(job_id, future)
+                )
+            return future
+
+        try:
+            self.scheduler.submit(jobs[0].user_id, cost, start)
+        except RenderRequestError:
+            for model in (RenderResult, RenderJobLease):
+                model.query.filter(model.job_id.in_(job_ids)).delete(
+                    synchronize_session=False
+                )
+            for job in jobs:
+                db.session.delete(job)
+            db.session.commit()
+            raise
+
+    def _finished(self, job_id, future):
+        # Catches workers that died before they could record their own failure
+        error = future.exception()
+        if error is None:
+            return
+        with self.app.app_context():
+            job = db.session.get(RenderJob, job_id)
+            if job is not None and job.status in ("queued", "running"):
+                job.status = "failed"
+                job.error = str(error)
+                db.session.commit()
@@ -0,0 +1,281 @@
+"""
+This module provides an in-process stand-in for the Cognito user pool, so that
+registration, login and token verification can run without AWS.
+
+It implements the cognito-idp calls the application makes, keeps users in
+memory and signs RS256 tokens with a local key published as a JWKS document.
+Tokens carry the same issuer and audience as the configured user pool, so the
+verification code is the same for both backends. Users only live as long as the
+process, so the local backend is meant for a single server process.
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+import jwt
+from botocore.exceptions import ClientError
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from .environ import extract_environment_variable
+
+TOKEN_LIFETIME_SEC = 3600
+
+ERROR_CODES = (
+    "InvalidParameterException",
+    "NotAuthorizedException",
+    "ResourceNotFoundException",
+    "UserNotConfirmedException",
+    "UserNotFoundException",
+    "UsernameExistsException",
+)
+
+
+def load_signing_key(key_path=None):
+    """Load the RSA key tokens are signed with, or generate one.
+
+    Args:
+        key_path (str, optional): A PEM file holding the private key. Sharing it
+            lets several processes verify each other's tokens.
+
+    Returns:
+        RSAPrivateKey: The signing key.
+    """
+    if key_path:
+        with open(key_path, "rb") as key_file:
+            return serialization.load_pem_private_key(key_file.read(), password=None)
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+class LocalCognitoClient:
+    """
+    A thread-safe, in-memory implementation of the cognito-idp client calls the
+    application uses.
+
+    Errors are raised as botocore ClientError subclasses named after the
+    Cognito error codes and exposed on the exceptions attribute, like a boto3
+    client does.
+
+    Attributes:
+    -----------
+    issuer : str
+        The issuer URL of the emulated user pool.
+    client_id : str
+        The app client ID the tokens are issued for.
+    key_id : str
+        The key ID of the signing key in the JWKS.
+    users : dict
+        The registered users by user name.
+    """
+
+    def __init__(self, region, user_pool_id, client_id, signing_key):
+        """
+        Args:
+            region (str): The AWS region of the emulated user pool.
+            user_pool_id (str): The ID of the emulated user pool.
+            client_id (str): The app client ID the tokens are issued for.
+            signing_key (RSAPrivateKey): The key tokens are signed with.
+        """
+        self.issuer = f"https://cognito-idp.{region}.amazonaws.com/{user_pool_id}"
+        self.user_pool_id = user_pool_id
+        self.client_id = client_id
+        self.signing_key = signing_key
+        public_der = signing_key.public_key().public_bytes(
+            serialization.Encoding.DER,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+        self.key_id = hashlib.sha256(public_der).hexdigest()[:16]
+        self.exceptions = SimpleNamespace(
+            **{code: type(code, (ClientError,), {}) for code in ERROR_CODES}
+        )
+        self.users = {}
+        self.lock = threading.Lock()
+
+    def _error(self, code, message, operation):
+        return getattr(self.exceptions, code)(
+            {"Error": {"Code": code, "Message": message}}, operation
+        )
+
+    def _check_pool(self, user_pool_id, operation):
+        if user_pool_id != self.user_pool_id:
+            raise self._error(
+                "ResourceNotFoundException", "User pool does not exist", operation
+            )
+
+    def _user(self, username, operation):
+        user = self.users.get(username)
+        if user is None:
+            raise self._error(
+                "UserNotFoundException", "User does not exist.", operation
+            )
+        return user
+
+    @staticmethod
+    def _hash_password(password, salt):
+        return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, 1000)
+
+    def jwks(self):
+        """Return the JWKS document holding the public signing key.
+
+        Returns:
+            dict: The key set.
+        """
+        jwk = json.loads(
+            jwt.algorithms.RSAAlgorithm.to_jwk(self.signing_key.public_key())
+        )
+        jwk.update({"kid": self.key_id, "alg": "RS256", "use": "sig"})
+        return {"keys": [jwk]}
+
+    def sign_up(self, ClientId, Username, Password, UserAttributes=(), **kwargs):
+        if ClientId != self.client_id:
+            raise self._error(
+                "ResourceNotFoundException", "User pool client does not exist", "SignUp"
+            )
+        if not Username or not Password:
+            raise self._error(
+                "InvalidParameterException",
+                "Username and password are required",
+                "SignUp",
+            )
+        salt = os.urandom(16)
+        with self.lock:
+            if Username in self.users:
+                raise self._error(
+                    "UsernameExistsException", "User already exists", "SignUp"
+                )
+            sub = str(uuid.uuid4())
+            self.users[Username] = {
+                "sub": sub,
+                "salt": salt,
+                "password": self._hash_password(Password, salt),
+                "status": "UNCONFIRMED",
+                "attributes": {
+                    attribute["Name"]: attribute["Value"]
+                    for attribute in UserAttributes
+                },
+                "created_at": time.time(),
+            }
+        return {"UserConfirmed": False, "UserSub": sub}
+
+    def admin_confirm_sign_up(self, UserPoolId, Username, **kwargs):
+        self._check_pool(UserPoolId, "AdminConfirmSignUp")
+        with self.lock:
+            user = self._user(Username, "AdminConfirmSignUp")
+            if user["status"] == "CONFIRMED":
+                raise self._error(
+                    "NotAuthorizedException",
+                    "User cannot be confirmed. Current status is CONFIRMED",
+                    "AdminConfirmSignUp",
+                )
+            user["status"] = "CONFIRMED"
+        return {}
+
+    def admin_get_user(self, UserPoolId, Username, **kwargs):
+        self._check_pool(UserPoolId, "AdminGetUser")
+        with self.lock:
+            user = self._user(Username, "AdminGetUser")
+            attributes = dict(user["attributes"], sub=user["sub"])
+            return {
+                "Username": Username,
+                "UserAttributes": [
+                    {"Name": name, "Value": value} for name, value in attributes.items()
+                ],
+                "UserStatus": user["status"],
+                "Enabled": True,
+            }
+
+    def admin_update_user_attributes(
+        self, UserPoolId, Username, UserAttributes, **kwargs
+    ):
+        self._check_pool(UserPoolId, "AdminUpdateUserAttributes")
+        with self.lock:
+            user = self._user(Username, "AdminUpdateUserAttributes")
+            for attribute in UserAttributes:
+                user["attributes"][attribute["Name"]] = attribute["Value"]
+        return {}
+
+    def initiate_auth(self, ClientId, AuthFlow, AuthParameters, **kwargs):
+        if ClientId != self.client_id or AuthFlow != "USER_PASSWORD_AUTH":
+            raise self._error(
+                "InvalidParameterException", "Unsupported auth flow", "InitiateAuth"
+            )
+        username = AuthParameters.get("USERNAME")
+        password = AuthParameters.get("PASSWORD") or ""
+        with self.lock:
+            user = self.users.get(username)
+            if user is None or not hmac.compare_digest(
+                user["password"], self._hash_password(password, user["salt"])
+            ):
+                raise self._error(
+                    "NotAuthorizedException",
+                    "Incorrect username or password.",
+                    "InitiateAuth",
+                )
+            if user["status"] != "CONFIRMED":
+                raise self._error(
+                    "UserNotConfirmedException",
+                    "User is not confirmed.",
+                    "InitiateAuth",
+                )
+            user = dict(user, attributes=dict(user["attributes"]))
+        return {
+            "ChallengeParameters": {},
+            "AuthenticationResult": {
+                "AccessToken": self._token(username, user, "access"),
+                "IdToken": self._token(username, user, "id"),
+                "RefreshToken": secrets.token_urlsafe(48),
+                "ExpiresIn": TOKEN_LIFETIME_SEC,
+                "TokenType": "Bearer",
+            },
+        }
+
+    def _token(self, username, user, token_use):
+        now = int(time.time())
+        claims = {
+            "sub": user["sub"],
+            "iss": self.issuer,
+            "token_use": token_use,
+            "auth_time": now,
+            "iat": now,
+            "exp": now + TOKEN_LIFETIME_SEC,
+            "jti": str(uuid.uuid4()),
+        }
+        if token_use == "id":
+            # ID tokens are issued for the app client and carry the profile
+            claims.update(user["attributes"])
+            claims.update({"aud": self.client_id, "cognito:username": username})
+        else:
+            claims.update({"client_id": self.client_id, "username": username})
+        return jwt.encode(
+            claims, self.signing_key, algorithm="RS256", headers={"kid": self.key_id}
+        )
+
+
+_local_client = None
+_local_client_lock = threading.Lock()
+
+
+def get_local_cognito_client():
+    """Return the local user pool of this process, creating it on first use.
+
+    Returns:
+        LocalCognitoClient: The local user pool.
+    """
+    global _local_client
+    with _local_client_lock:
+        if _local_client is None:
+            key_path = os.getenv("LOCAL_IDENTITY_KEY_FILE")
+            _local_client = LocalCognitoClient(
+                extract_environment_variable("AWS_REGION"),
+                extract_environment_variable("USER_POOL_ID"),
+                extract_environment_variable("CLIENT_ID"),
+                load_signing_key(key_path),
+            )
+        return _local_client
@@ -1,11 +1,243 @@
+import json
 import os
+import threading
 import uuid
 
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, send_from_directory
 from werkzeug.utils import secure_filename
 
 from .auth import cognito_token_required
-from .database import Project, add_to_db_session
+from .database import (
+    Project,
+    ProxyRendition,
+    UploadSession,
+    VideoProbe,
+    add_to_db_session,
+    db,
+)
+from .settings import MAX_UPLOAD_BYTES, MAX_UPLOAD_CHUNK_BYTES, UPLOAD_CHUNK_BYTES
+from .uploads import (
+    claim_chunk,
+    claim_completion,
+    finish_upload,
+    partial_path,
+    preallocate,
+    release_chunk,
+    release_completion,
+    save_upload,
+    write_chunk,
+)
+from .video import generate_proxies, probe_video
+
+PROXY_FILES = {
+    "video": "proxy_path",
+    "thumbnails": "thumbnails_path",
+    "poster": "poster_path",
+}
+# Everything generate_proxies records, copied when another project shares the file
+RENDITION_FIELDS = (
+    "proxy_path",
+    "thumbnails_path",
+    "poster_path",
+    "source_width",
+    "source_height",
+    "proxy_width",
+    "proxy_height",
+    "scale_x",
+    "scale_y",
+)
+PROBE_FIELDS = (
+    "width",
+    "height",
+    "fps_num",
+    "fps_den",
+    "duration_sec",
+    "frame_count",
+    "keyframe_index",
+)
+
+
+def serialize_proxy(rendition):
+    """Describe a project's proxy rendition for API responses.
+
+    Args:
+        rendition (ProxyRendition): The rendition, or None.
+
+    Returns:
+        dict: The status, dimensions and scale factors, or None.
+    """
+    if rendition is None:
+        return None
+    return {
+        "status": rendition.status,
+        "proxy_width": rendition.proxy_width,
+        "proxy_height": rendition.proxy_height,
+        "scale_x": rendition.scale_x,
+        "scale_y": rendition.scale_y,
+    }
+
+
+def generate_project_proxies(app, rendition_id, file_path, basename):
+    """Generate the derivatives of an upload and record them on its rendition.
+
+    Args:
+        app: The Flask application instance.
+        rendition_id (int): The ID of the pending ProxyRendition.
+        file_path (str): Path to the uploaded video file.
+        basename (str): The file name prefix of the derivatives.
+    """
+    try:
+        result = generate_proxies(file_path, app.config["UPLOAD_FOLDER"], basename)
+    except Exception as e:
+        print(f"Proxy generation failed for {file_path}: {e}")
+        result = None
+    with app.app_context():
+        rendition = db.session.get(ProxyRendition, rendition_id)
+        if result is None:
+            rendition.status = "failed"
+        else:
+            for field, value in result.items():
+                setattr(rendition, field, value)
+            rendition.status = "ready"
+        db.session.commit()
+
+
+def start_proxy_generation(app, project_id, filename):
+    """Give a project a proxy rendition, generating it off the request thread.
+
+    Projects sharing a deduplicated upload reuse the derivatives that are already
+    ready instead of generating them again.
+
+    Args:
+        app: The Flask application instance.
+        project_id (int): The ID of the project.
+        filename (str): The stored file name of the project's video.
+    """
+    existing = (
+        ProxyRendition.query.join(Project)
+        .filter(Project.file_path == filename, ProxyRendition.status == "ready")
+        .first()
+    )
+    rendition = ProxyRendition(project_id=project_id)
+    if existing is not None:
+        for field in RENDITION_FIELDS:
+            setattr(rendition, field, getattr(existing, field))
+        rendition.status = "ready"
+        add_to_db_session(rendition)
+        return
+    add_to_db_session(rendition)
+    threading.Thread(
+        target=generate_project_proxies,
+        args=(
+            app,
+            rendition.id,
+            os.path.join(app.config["UPLOAD_FOLDER"], filename),
+            os.path.splitext(filename)[0],
+        ),
+        daemon=True,
+    ).start()
+
+
+def serialize_probe(probe):
+    """Describe a project's probed metadata for API responses.
+
+    Args:
+        probe (VideoProbe): The probe, or None.
+
+    Returns:
+        dict: The status, exact frame rate, duration, dimensions, frame count and
+        number of indexed keyframes, or None.
+    """
+    if probe is None:
+        return None
+    if probe.status != "ready":
+        return {"status": probe.status}
+    return {
+        "status": probe.status,
+        "width": probe.width,
+        "height": probe.height,
+        "fps": f"{probe.fps_num}/{probe.fps_den}",
+        "duration_sec": probe.duration_sec,
+        "frame_count": probe.frame_count,
+        "keyframe_count": len(json.loads(probe.keyframe_index)),
+    }
+
+
+def probe_project_video(app, probe_id, file_path):
+    """Probe an uploaded video and record the result.
+
+    Args:
+        app: The Flask application instance.
+        probe_id (int): The ID of the pending VideoProbe.
+        file_path (str): Path to the uploaded video file.
+    """
+    try:
+        result = probe_video(file_path)
+    except Exception as e:
+        print(f"Probing failed for {file_path}: {e}")
+        result = None
+    with app.app_context():
+        probe = db.session.get(VideoProbe, probe_id)
+        if result is None:
+            probe.status = "failed"
+        else:
+            keyframes = result.pop("keyframes")
+            for field, value in result.items():
+                setattr(probe, field, value)
+            probe.keyframe_index = json.dumps(keyframes)
+            probe.status = "ready"
+        db.session.commit()
+
+
+def start_video_probe(app, project_id, filename):
+    """Give a project a probe record, probing the video off the request thread.
+
+    Projects sharing a deduplicated upload copy a probe that is already ready.
+
+    Args:
+        app: The Flask application instance.
+        project_id (int): The ID of the project.
+        filename (str): The stored file name of the project's video.
+    """
+    existing = (
+        VideoProbe.query.join(Project)
+        .filter(Project.file_path == filename, VideoProbe.status == "ready")
+        .first()
+    )
+    probe = VideoProbe(project_id=project_id)
+    if existing is not None:
+        for field in PROBE_FIELDS:
+            setattr(probe, field, getattr(existing, field))
+        probe.status = "ready"
+        add_to_db_session(probe)
+        return
+    add_to_db_session(probe)
+    threading.Thread(
+        target=probe_project_video,
+        args=(app, probe.id, os.path.join(app.config["UPLOAD_FOLDER"], filename)),
+        daemon=True,
+    ).start()
+
+
+def serialize_upload(upload):
+    """Describe a resumable upload for API responses.
+
+    Args:
+        upload (UploadSession): The upload.
+
+    Returns:
+        dict: The upload's ID, size, next offset and status.
+    """
+    return {
+        "upload_id": upload.id,
+        "filename": upload.filename,
+        "size": upload.size,
+        "offset": upload.bytes_received,
+        "chunk_size": UPLOAD_CHUNK_BYTES,
+        "status": upload.status,
+        "sha256": upload.sha256,
+        "project_id": upload.project_id,
+    }
 
 
 def register_project_model_routes(app):
@@ -23,6 +255,8 @@ def register_project_model_routes(app):
                     "description": project.description,
                     "created_at": project.created_at,
                     "file_path": project.file_path,  # Include file path if needed
+                    "proxy": serialize_proxy(project.proxy),
+                    "probe": serialize_probe(project.probe),
                 }
                 for project in projects
             ]
@@ -45,16 +279,9 @@ def register_project_model_routes(app):
 
         new_filename = None
         if file:
-            # Generate a unique ID for the file
-            unique_id = str(uuid.uuid4())
-            original_filename = secure_filename(file.filename)
-            file_extension = os.path.splitext(original_filename)[1]
-            new_filename = f"{unique_id}{file_extension}"
-            file_path = os.path.join(app.config["UPLOAD_FOLDER"], new_filename)
-
-            # Save the file with the new name
-            file.save(file_path)
-            print(f"File saved to {file_path}")
+            # Hashed while it is saved, so render requests can use the digest
+            new_filename, _ = save_upload(app.config["UPLOAD_FOLDER"], file)
+            print(f"File saved as {new_filename}")
 
         # Create a new project entry in the database
         new_project = Project(
@@ -65,9 +292,183 @@ def register_project_model_routes(app):
         )
         add_to_db_session(new_project)
 
+        if new_filename:
+            start_video_probe(app, new_project.id, new_filename)
+            start_proxy_generation(app, new_project.id, new_filename)
+
         return (
             jsonify(
                 {"message": "Project created successfully!", "filename": new_filename}
             ),
             201,
         )
+
+    @app.route("/projects/<int:project_id>/proxy/<kind>", methods=["GET"])
+    @cognito_token_required
+    def get_project_proxy(project_id, kind):
+        field = PROXY_FILES.get(kind)
+        if field is None:
+            return jsonify({"error": "Unknown proxy kind"}), 404
+        project = Project.query.filter_by(id=project_id, user_id=request.user).first()
+        if project is None:
+            return jsonify({"error": "Project not found"}), 404
+        rendition = project.proxy
+        if rendition is None or rendition.status != "ready":
+            return jsonify({"error": "Proxy not available"}), 404
+        return send_from_directory(
+            app.config["UPLOAD_FOLDER"], getattr(rendition, field), max_age=3600
+        )
+
+    def find_upload(upload_id):
+        return UploadSession.query.filter_by(id=upload_id, user_id=request.user).first()
+
+    @app.route("/uploads", methods=["POST"])
+    @cognito_token_required
+    def start_upload():
+        data = request.get_json(silent=True) or {}
+        filename = secure_filename(data.get("filename") or "")
+        try:
+            size = int(data.get("size"))
+        except (TypeError, ValueError):
+            return jsonify({"error": "File size is required"}), 400
+        if not filename or size <= 0:
+            return jsonify({"error": "A file name and a positive size are needed"}), 400
+        if size > MAX_UPLOAD_BYTES:
+            return jsonify({"error": "File is too large"}), 413
+
+        upload = UploadSession(
+            id=str(uuid.uuid4()), user_id=request.user, filename=filename, size=size
+        )
+        try:
+            preallocate(partial_path(app.config["UPLOAD_FOLDER"], upload), size)
+        except OSError as e:
+            print(f"Could not preallocate upload {upload.id}: {e}")
+            return jsonify({"error": "Not enough storage for this file"}), 507
+        add_to_db_session(upload)
+        return jsonify(serialize_upload(upload)), 201
+
+    @app.route("/uploads/<upload_id>", methods=["GET"])
+    @cognito_token_required
+    def get_upload(upload_id):
+        upload = find_upload(upload_id)
+        if upload is None:
+            return jsonify({"error": "Upload not found"}), 404
+        return jsonify(serialize_upload(upload))
+
+    @app.route("/uploads/<upload_id>", methods=["PUT"])
+    @cognito_token_required
+    def put_upload_chunk(upload_id):
+        # The chunk is the raw request body, streamed to disk without buffering
+        upload = find_upload(upload_id)
+        if upload is None:
+            return jsonify({"error": "Upload not found"}), 404
+        offset = request.args.get("offset", request.headers.get("Upload-Offset"))
+        try:
+            offset = int(offset)
+        except (TypeError, ValueError):
+            return jsonify({"error": "The chunk offset is required"}), 400
+        length = request.content_length
+        if length is None:
+            return jsonify({"error": "Content-Length is required"}), 411
+        if length > MAX_UPLOAD_CHUNK_BYTES:
+            return jsonify({"error": "Chunk is too large"}), 413
+
+        if offset + length > upload.size:
+            return jsonify({"error": "Chunk runs past the end of the file"}), 400
+        if not claim_chunk(upload.id, offset):
+            db.session.refresh(upload)
+            if upload.status == "complete":
+                return jsonify({"error": "Upload is already complete"}), 409
+            # Only the next chunk is accepted, and only from one request at a time;
+            # the client resumes from offset
+            return (
+                jsonify(
+                    {
+                        "error": "Unexpected chunk offset",
+                        "offset": upload.bytes_received,
+                    }
+                ),
+                409,
+            )
+        written = 0
+        try:
+            written = write_chunk(
+                partial_path(app.config["UPLOAD_FOLDER"], upload),
+                upload.id,
+                offset,
+                request.stream,
+                length,
+            )
+        finally:
+            release_chunk(upload.id, offset + written)
+        db.session.refresh(upload)
+
+        if written < length:
+            return (
+                jsonify(
+                    {"error": "Chunk was cut short", "offset": upload.bytes_received}
+                ),
+                400,
+            )
+        return jsonify(serialize_upload(upload))
+
+    @app.route("/uploads/<upload_id>/complete", methods=["POST"])
+    @cognito_token_required
+    def complete_upload(upload_id):
+        data = request.get_json(silent=True) or {}
+        name = data.get("name")
+        if not name:
+            return jsonify({"error": "Project name is required"}), 400
+        upload = find_upload(upload_id)
+        if upload is None:
+            return jsonify({"error": "Upload not found"}), 404
+
+        if not claim_completion(upload.id):
+            db.session.refresh(upload)
+            if upload.status == "complete":
+                # A retried request; the project already exists
+                return jsonify(serialize_upload(upload)), 200
+            if upload.status == "completing":
+                return jsonify({"error": "Upload is already being completed"}), 409
+            return (
+                jsonify(
+                    {
+                        "error": "Upload is incomplete",
+                        "offset": upload.bytes_received,
+                    }
+                ),
+                409,
+            )
+        try:
+            db.session.refresh(upload)
+            filename, deduplicated = finish_upload(app.config["UPLOAD_FOLDER"], upload)
+            project = Project(
+                name=name,
+                description=data.get("description") or "",
+                user_id=request.user,
+                file_path=filename,
+            )
+            db.session.add(project)
+            db.session.flush()
+            upload.project_id = project.id
+            upload.status = "complete"
+            db.session.commit()
+        except Exception:
+            release_completion(upload.id)
+            raise
+        print(f"Upload {upload.id} stored as {filename}, deduplicated: {deduplicated}")
+
+        start_video_probe(app, project.id, filename)
+        start_proxy_generation(app, project.id, filename)
+        return (
+            jsonify(
+                {
+                    **serialize_upload(upload),
+                    "message": "Project created successfully!",
+                    # The stored name, not the client's
+                    "filename": filename,
+                    "deduplicated": deduplicated,
+                }
+            ),
+            201,
+        )
@@ -0,0 +1,114 @@
+"""
+This module derives content-addressed keys for render requests, so that a request
+identical to an earlier one can be answered with the earlier result.
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+from .database import StoredFile
+from .video import VIDEO_CODEC
+
+# Bump when a renderer change alters the output for the same inputs
+RENDER_CACHE_VERSION = 3
+
+# The mode of renders that decode once for several overlays
+VARIANTS_MODE = "variants"
+
+_digests = {}
+_digests_lock = threading.Lock()
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """Return the SHA-256 of a file's content.
+
+    Digests are remembered per path, size and modification time, so a file is
+    only hashed again after it changes.
+
+    Args:
+        path (str): Path to the file.
+        chunk_size (int): The number of bytes hashed at a time.
+
+    Returns:
+        str: The hexadecimal digest.
+    """
+    stat = os.stat(path)
+    signature = (stat.st_size, stat.st_mtime_ns)
+    with _digests_lock:
+        cached = _digests.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(chunk_size):
+            digest.update(chunk)
+    with _digests_lock:
+        _digests[path] = (signature, digest.hexdigest())
+    return digest.hexdigest()
+
+
+def video_digest(video_filename, video_path):
+    """Return the SHA-256 of an uploaded video.
+
+    Must be called inside an application context. Uploads are hashed as they
+    are saved, so their stored digest is used; only files stored before digests
+    were recorded are hashed here.
+
+    Args:
+        video_filename (str): The name of the video in the upload folder.
+        video_path (str): Path to the video file.
+
+    Returns:
+        str: The hexadecimal digest.
+    """
+    stored = StoredFile.query.filter_by(filename=video_filename).first()
+    if stored is not None and os.path.getsize(video_path) == stored.size:
+        return stored.sha256
+    return file_digest(video_path)
+
+
+def render_mode(options):
+    """Name the renderer a set of render options selects.
+
+    Chunked renders join separately encoded parts, so their files differ from a
+    single-pass render of the same frames.
+
+    Args:
+        options (dict): The "backend" and "chunk_workers" render settings.
+
+    Returns:
+        str: The render mode.
+    """
+    if options["chunk_workers"] > 1:
+        return f"chunked:{options['chunk_workers']}"
+    return options["backend"]
+
+
+def render_cache_key(video_digest, image_path, placements, mode):
+    """Compute the cache key of a render request.
+
+    The key covers the content of the source video and the overlay, the
+    placements in canonical form, the render mode and the encoder settings, so
+    it does not depend on file names.
+
+    Args:
+        video_digest (str): The SHA-256 of the input video, from video_digest.
+        image_path (str): Path to the overlay image file.
+        placements (list): The Placement objects to apply.
+        mode (str): The render mode, from render_mode or VARIANTS_MODE.
+
+    Returns:
+        str: A hexadecimal SHA-256 key.
+    """
+    description = {
+        "version": RENDER_CACHE_VERSION,
+        "video": video_digest,
+        "overlay": file_digest(image_path),
+        "placements": [placement.describe() for placement in placements],
+        "mode": mode,
+        "encoder": {"codec": VIDEO_CODEC},
+    }
+    encoded = json.dumps(description, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
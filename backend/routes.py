@@ -1,31 +1,92 @@
 """
-This module defines route registration functions for the Flask application, 
+This module defines route registration functions for the Flask application,
 including authentication and React app serving routes.
 """
 
+import base64
+import hashlib
+import io
 import json
 import os
+import tempfile
 import time
 from functools import wraps
 from http import HTTPStatus
 
-import boto3
-import cv2
 import jwt
-import numpy as np
-from flask import Flask, jsonify, request, send_from_directory, session
-from jwt import PyJWKClient
+from flask import (
+    Flask,
+    Response,
+    jsonify,
+    request,
+    send_file,
+    send_from_directory,
+    session,
+    stream_with_context,
+)
 from PIL import Image
 from werkzeug.exceptions import Unauthorized
+from werkzeug.utils import secure_filename
 
 from .auth import (
     authenticate_user,
+    cognito_token_required,
     confirm_user_account,
+    get_cognito_client,
     register_user_with_permanent_password,
+    start_user_confirmation,
+    verify_cognito_token,
+)
+from .database import (
+    Project,
+    ProxyRendition,
+    RenderJob,
+    RenderResult,
+    VideoProbe,
+    db,
 )
 from .environ import extract_environment_variable
-from .exceptions import AuthError
-from .settings import ALLOWED_FIELDS
+from .exceptions import AuthError, RenderRequestError
+from .jobs import PROGRESS_INTERVAL_SEC, RenderQueue, find_user_job, serialize_job
+from .local_identity import get_local_cognito_client
+from .result_cache import (
+    VARIANTS_MODE,
+    render_cache_key,
+    render_mode,
+    video_digest,
+)
+from .scheduler import RenderScheduler, estimate_render_cost
+from .settings import (
+    ALLOWED_FIELDS,
+    IDENTITY_BACKEND,
+    LOCAL_IDENTITY_BACKEND,
+    RENDER_BACKEND,
+    RENDER_CHUNK_WORKERS,
+    RENDER_COST_BUDGET,
+    RENDER_MAX_JOB_COST,
+    RENDER_MAX_QUEUED_PER_USER,
+    RENDER_MAX_SKIPS,
+    RENDER_WORKERS,
+)
+from .video import (
+    overlay_cache,
+    parse_placements,
+    render_preview_clip,
+    render_preview_frames,
+)
+
+# The UI sends points on a view five times smaller than the video
+CLIENT_POINT_SCALE = 5
+# Previews are bounded so that they stay within an interactive latency budget
+MAX_PREVIEW_FRAMES = 8
+MAX_PREVIEW_CLIP_SEC = 3
+# Batch renders are bounded so that one request cannot monopolise the workers
+MAX_BATCH_VARIANTS = 16
+MAX_OVERLAY_BYTES = 20 * 1024 * 1024
+# Where the local identity backend publishes its signing key
+LOCAL_JWKS_PATH = "/local-identity/.well-known/jwks.json"
+# Results never change once rendered, so clients may keep them for a day
+RESULT_MAX_AGE_SEC = 86400
 
 
 def register_react_base(app):
@@ -86,11 +147,8 @@ def register_login_route(app):
 def register_registration_route(app):
     @app.route("/register", methods=["POST"])
     def register_user():
-        print("Received request for user registration")
-
         # Get data from request
         data = request.get_json()
-        print("Received data:", data)
 
         # Extract fields
         birthdate = data.get("birthdate")
@@ -99,36 +157,17 @@ def register_registration_route(app):
         phone_number = data.get("phoneNumber")
         username = data.get("username")
         password = data.get("password")
-
-        print(
-            "Extracted fields - Birthdate:",
-            birthdate,
-            "Email:",
-            email,
-            "Gender:",
-            gender,
-            "Phone Number:",
-            phone_number,
-            "Username:",
-            username,
-        )
+        print("Received registration request for user:", username)
 
         # Format phone number in E.164 format
         if not phone_number.startswith("+"):
             phone_number = "+1" + phone_number
-        print("Formatted phone number:", phone_number)
-
-        aws_region = extract_environment_variable("AWS_REGION")
-        print("AWS Region extracted:", aws_region)
 
         try:
-            session = boto3.Session()  # Use session for reliable credentials handling
-            cognito_client = session.client("cognito-idp", region_name=aws_region)
-            print("Initialized Cognito client")
+            cognito_client = get_cognito_client()
 
-            # Step 1: Register the user and include preferred_username directly
-            print("Attempting to register user with username:", username)
-            response = cognito_client.sign_up(
+            # Register the user and include preferred_username directly
+            cognito_client.sign_up(
                 ClientId=os.getenv("CLIENT_ID"),
                 Username=username,
                 Password=password,
@@ -140,25 +179,10 @@ def register_registration_route(app):
                     {"Name": "preferred_username", "Value": username},
                 ],
             )
-            print("Registration response from Cognito:", response)
 
-            # Step 2: Confirm the user account immediately after sign-up
-            print("Attempting to confirm user account for:", username)
-            confirm_response = cognito_client.admin_confirm_sign_up(
-                UserPoolId=os.getenv("USER_POOL_ID"), Username=username
-            )
-            print("User confirmed successfully:", confirm_response)
-
-            # Step 3: Verify confirmation status
-            user_status = cognito_client.admin_get_user(
-                UserPoolId=os.getenv("USER_POOL_ID"), Username=username
-            )
-            print("User confirmation status:", user_status["UserStatus"])
-
-            return (
-                jsonify({"message": "User registered and confirmed successfully"}),
-                201,
-            )
+            # Confirmation is off the request path; logging in finishes it if needed
+            start_user_confirmation(username)
+            return jsonify({"message": "User registered successfully"}), 201
 
         except cognito_client.exceptions.UsernameExistsException:
             print("Error: Username already exists in Cognito")
@@ -213,27 +237,14 @@ def register_user_validation(app):
         Raises:
             Unauthorized: If the token is expired or invalid.
         """
-        jwks_file = f"{user_pool_id}/.well-known/jwks.json"
-        jwks_domain = f"https://cognito-idp.{aws_region}.amazonaws.com"
-        jwks_url = f"{jwks_domain}/{jwks_file}"
-
         issuer_domain = f"https://cognito-idp.{aws_region}.amazonaws.com"
         issuer_url = f"{issuer_domain}/{user_pool_id}"
 
-        jwks_client = PyJWKClient(jwks_url)
-        signing_key = jwks_client.get_signing_key_from_jwt(id_token)
-
         try:
-            return jwt.decode(
-                id_token,
-                key=signing_key.key,
-                algorithms=["RS256"],
-                audience=client_id,
-                issuer=issuer_url,
-            )
+            return verify_cognito_token(id_token, audience=client_id, issuer=issuer_url)
         except jwt.ExpiredSignatureError as e:
             raise Unauthorized("Token has expired") from e
-        except jwt.InvalidTokenError as e:
+        except (jwt.InvalidTokenError, jwt.PyJWKClientError) as e:
             raise Unauthorized("Invalid token") from e
 
     def require_auth(f):
@@ -308,176 +319,556 @@ def register_user_logout(app):
         return jsonify({"message": "Logged out successfully"}), HTTPStatus.OK
 
 
-def register_video_processing(app):
-    def replace_pixels_in_quadrilateral(
-        video_path, image_path, output_path, points, start_time_sec
-    ):
-        """
-        Replaces pixels in a specific quadrilateral region of each video frame with a resized target image,
-        starting from a specified timestamp.
-
-        Parameters:
-        - video_path: Path to the input video file.
-        - image_path: Path to the target image file.
-        - output_path: Path for saving the output video.
-        - points: A list of four (x, y) tuples representing the vertices of the quadrilateral
-                (top-left, top-right, bottom-right, bottom-left).
-        - start_time_sec: Time in seconds after which the image placement should start.
+def register_local_identity_route(app):
+    """Register the JWKS route of the local identity backend, if it is enabled.
+
+    Clients that verify tokens themselves, such as load-test tools, can fetch
+    the local signing key from LOCAL_JWKS_PATH.
+
+    Args:
+        app: The Flask application instance.
+
+    Returns:
+        None
+    """
+    if IDENTITY_BACKEND != LOCAL_IDENTITY_BACKEND:
+        return
+
+    @app.route(LOCAL_JWKS_PATH)
+    def local_jwks():
+        """Return the JWKS document of the local identity backend.
+
+        Returns:
+            Response: JSON response with the public signing key.
         """
-        # Load the video
-        video_capture = cv2.VideoCapture(video_path)
-        if not video_capture.isOpened():
-            return
-        # Get video properties
-        frame_width = int(video_capture.get(cv2.CAP_PROP_FRAME_WIDTH))
-        frame_height = int(video_capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        fps = int(video_capture.get(cv2.CAP_PROP_FPS))
-        frame_count = int(video_capture.get(cv2.CAP_PROP_FRAME_COUNT))
-        codec = cv2.VideoWriter_fourcc(*"mp4v")  # Codec for .mp4 output
-        # Calculate the frame number to start from based on the start time in seconds
-        # Get video properties
-        frame_width = int(video_capture.get(cv2.CAP_PROP_FRAME_WIDTH))
-        frame_height = int(video_capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
-
-        # Print the dimensions
-        print(f"Video Dimensions: {frame_width} x {frame_height} pixels")
-        start_frame = int(start_time_sec * fps)
-        # Load the image
-        image = cv2.imread(image_path)
-        if image is None:
-            return
-
-        # Define the destination points (target area in the frame)
-        pts_dst = np.array(points, dtype="float32")
-
-        # Calculate the width and height of the bounding box for the target region
-        width = int(
-            max(
-                np.linalg.norm(pts_dst[0] - pts_dst[1]),
-                np.linalg.norm(pts_dst[2] - pts_dst[3]),
-            )
+        return jsonify(get_local_cognito_client().jwks()), HTTPStatus.OK
+
+
+def proxy_scale(video_filename, user_id):
+    """Look up the factors mapping a video's proxy coordinates to source pixels.
+
+    Args:
+        video_filename (str): The stored file name of the uploaded video.
+        user_id (str): The user whose project the video belongs to.
+
+    Returns:
+        tuple: The (scale_x, scale_y) recorded when the proxy was generated.
+
+    Raises:
+        RenderRequestError: If the user's project has no ready proxy.
+    """
+    rendition = (
+        ProxyRendition.query.join(Project)
+        .filter(
+            Project.file_path == video_filename,
+            Project.user_id == user_id,
+            ProxyRendition.status == "ready",
         )
-        height = int(
-            max(
-                np.linalg.norm(pts_dst[0] - pts_dst[3]),
-                np.linalg.norm(pts_dst[1] - pts_dst[2]),
-            )
+        .first()
+    )
+    if rendition is None:
+        raise RenderRequestError(
+            "No proxy is available for this video", HTTPStatus.CONFLICT
         )
+    return rendition.scale_x, rendition.scale_y
 
-        # Resize the image to match the target region dimensions
-        resized_image = cv2.resize(image, (width, height))
 
-        # Define the source points as the corners of the resized image
-        pts_src = np.array(
-            [[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]],
-            dtype="float32",
-        )
+def stored_probe(video_filename, user_id):
+    """Look up the metadata probed when a video was uploaded.
 
-        # Compute the homography matrix
-        matrix = cv2.getPerspectiveTransform(pts_src, pts_dst)
+    Args:
+        video_filename (str): The stored file name of the uploaded video.
+        user_id (str): The user whose project the video belongs to.
 
-        # Create a video writer to save the output
-        video_writer = cv2.VideoWriter(
-            output_path, codec, fps, (frame_width, frame_height)
+    Returns:
+        dict: The probe in the form returned by probe_video, or None if the video
+        has not been probed, in which case the renderers read OpenCV's estimates.
+    """
+    probe = (
+        VideoProbe.query.join(Project)
+        .filter(
+            Project.file_path == video_filename,
+            Project.user_id == user_id,
+            VideoProbe.status == "ready",
         )
+        .first()
+    )
+    if probe is None:
+        return None
+    return {
+        "width": probe.width,
+        "height": probe.height,
+        "fps_num": probe.fps_num,
+        "fps_den": probe.fps_den,
+        "duration_sec": probe.duration_sec,
+        "frame_count": probe.frame_count,
+        "keyframes": json.loads(probe.keyframe_index),
+    }
+
+
+def parse_render_request(upload_folder, overlay=True):
+    """Validate the form fields shared by the render and preview routes.
 
-        frame_number = 0
-        while video_capture.isOpened():
-            ret, frame = video_capture.read()
-            if not ret:
-                break
-
-            # Process only if the current frame number is after the specified start frame
-            if frame_number >= start_frame:
-                # Warp the resized image onto the frame using the homography matrix
-                warped_image = cv2.warpPerspective(
-                    resized_image, matrix, (frame_width, frame_height)
-                )
+    Args:
+        upload_folder (str): The folder uploaded videos are stored in.
+        overlay (bool): Whether the request uses the configured overlay image.
 
-                # Create a mask from the warped image to isolate the region
-                mask = np.zeros((frame_height, frame_width), dtype=np.uint8)
-                cv2.fillConvexPoly(mask, pts_dst.astype(int), 255)
+    Points are in the UI's legacy view coordinates, or in proxy pixels when the
+    coordinate_space field is "proxy". The video must be one of the requesting
+    user's projects.
 
-                # Invert the mask to black out the region in the frame
-                mask_inv = cv2.bitwise_not(mask)
-                frame_bg = cv2.bitwise_and(frame, frame, mask=mask_inv)
+    Returns:
+        tuple: The video filename, video path, overlay image path (None when
+        overlay is False) and the parsed Placement objects.
 
-                # Combine the background frame with the warped image region
-                frame_final = cv2.add(
-                    frame_bg, cv2.bitwise_and(warped_image, warped_image, mask=mask)
-                )
+    Raises:
+        RenderRequestError: If a field is missing or invalid, or a file is missing
+        or not the user's.
+    """
+    video_filename = request.form.get("video_filename")
+    if not video_filename:
+        raise RenderRequestError("No video filename provided", HTTPStatus.BAD_REQUEST)
+    # Stored names are flat, so anything else would reach outside the folder
+    if secure_filename(video_filename) != video_filename:
+        raise RenderRequestError("Invalid video filename", HTTPStatus.BAD_REQUEST)
+
+    project = Project.query.filter_by(
+        file_path=video_filename, user_id=request.user
+    ).first()
+    video_path = os.path.join(upload_folder, video_filename)
+    if project is None or not os.path.exists(video_path):
+        raise RenderRequestError("Video file not found", HTTPStatus.NOT_FOUND)
+
+    timestamps = request.form.get("timestamps")
+    if not timestamps:
+        raise RenderRequestError("No timestamps provided", HTTPStatus.BAD_REQUEST)
+
+    image_path = None
+    if overlay:
+        image_path = extract_environment_variable("OVERLAY_IMAGE")
+        if overlay_cache.get(image_path) is None:
+            raise RenderRequestError("Overlay image not found", HTTPStatus.NOT_FOUND)
+
+    scale = CLIENT_POINT_SCALE
+    if request.form.get("coordinate_space") == "proxy":
+        scale = proxy_scale(video_filename, request.user)
+    try:
+        placements = parse_placements(json.loads(timestamps), scale=scale)
+    except (KeyError, TypeError, ValueError) as e:
+        raise RenderRequestError(
+            f"Invalid timestamps: {e}", HTTPStatus.BAD_REQUEST
+        ) from e
+    return video_filename, video_path, image_path, placements
+
+
+def save_overlays(upload_folder):
+    """Store the overlay images uploaded with a batch render request.
+
+    Overlays are stored under their SHA-256, so re-uploading a creative reuses
+    the same file and the same cached results.
 
-                # Write the modified frame to the output video
-                video_writer.write(frame_final)
-            else:
-                # Write the original frame before the start time
-                video_writer.write(frame)
+    Args:
+        upload_folder (str): The folder uploaded files are stored in.
 
-            frame_number += 1
-            if frame_number % 50 == 0:
-                if frame_number >= start_frame:
-                    print("replacing the frame", end=" ")
-                print(f"Processed {frame_number}/{frame_count} frames")
+    Returns:
+        list: The paths of the overlays, in upload order.
+
+    Raises:
+        RenderRequestError: If there are no overlays, too many, or one is too
+        large or not an image.
+    """
+    files = request.files.getlist("overlays")
+    if not files:
+        raise RenderRequestError("No overlays provided", HTTPStatus.BAD_REQUEST)
+    if len(files) > MAX_BATCH_VARIANTS:
+        raise RenderRequestError(
+            f"At most {MAX_BATCH_VARIANTS} overlays can be rendered together",
+            HTTPStatus.BAD_REQUEST,
+        )
+    overlay_folder = os.path.join(upload_folder, "overlays")
+    os.makedirs(overlay_folder, exist_ok=True)
+    image_paths = []
+    for file in files:
+        data = file.read(MAX_OVERLAY_BYTES + 1)
+        if len(data) > MAX_OVERLAY_BYTES:
+            raise RenderRequestError(
+                "Overlay image is too large", HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+            )
+        extension = os.path.splitext(secure_filename(file.filename or ""))[1]
+        image_path = os.path.join(
+            overlay_folder, f"{hashlib.sha256(data).hexdigest()}{extension}"
+        )
+        if not os.path.exists(image_path):
+            with open(image_path, "wb") as image_file:
+                image_file.write(data)
+        if overlay_cache.get(image_path) is None:
+            os.remove(image_path)
+            raise RenderRequestError(
+                f"{file.filename} is not a readable image", HTTPStatus.BAD_REQUEST
+            )
+        image_paths.append(image_path)
+    return image_paths
 
-        # Release resources
-        video_capture.release()
-        video_writer.release()
-        cv2.destroyAllWindows()
 
+def register_video_processing(app):
     UPLOAD_FOLDER = extract_environment_variable("UPLOAD_FOLDER")
     RESULT_FOLDER = extract_environment_variable("RESULT_FOLDER")
+    render_options = {"backend": RENDER_BACKEND, "chunk_workers": RENDER_CHUNK_WORKERS}
+    render_queue = RenderQueue(
+        app,
+        RENDER_WORKERS,
+        render_options,
+        RenderScheduler(
+            max_running=RENDER_WORKERS,
+            cost_budget=RENDER_COST_BUDGET,
+            max_job_cost=RENDER_MAX_JOB_COST,
+            max_queued_per_user=RENDER_MAX_QUEUED_PER_USER,
+            max_skips=RENDER_MAX_SKIPS,
+        ),
+    )
+
+    @app.route("/jobs/<job_id>", methods=["GET"])
+    @cognito_token_required
+    def get_render_job(job_id):
+        """Report the state and progress of a render job.
+
+        Args:
+            job_id (str): The ID returned by /process_video.
+
+        Returns:
+            Response: JSON description of the job, or 404 if it does not exist
+            or belongs to another user.
+        """
+        job = find_user_job(job_id, request.user)
+        if job is None:
+            return jsonify({"error": "Job not found"}), HTTPStatus.NOT_FOUND
+        return jsonify(serialize_job(job)), HTTPStatus.OK
+
+    @app.route("/jobs/<job_id>/result", methods=["GET"])
+    @cognito_token_required
+    def download_render_result(job_id):
+        """Serve the rendered video of a finished job.
+
+        Range requests are answered with 206 Partial Content so that players can
+        seek without downloading the whole file. The ETag is the content-addressed
+        cache key of the render, so a matching If-None-Match gets 304 Not
+        Modified. The file body is handed to the WSGI server's file wrapper, which
+        uses sendfile where available, or to the fronting server when
+        USE_X_SENDFILE is set.
+
+        Args:
+            job_id (str): The ID returned by /process_video.
+
+        Returns:
+            Response: The video, part of it, or a JSON error; 404 if the job
+            does not exist or belongs to another user.
+        """
+        job = find_user_job(job_id, request.user)
+        if job is None:
+            return jsonify({"error": "Job not found"}), HTTPStatus.NOT_FOUND
+        if job.status != "done":
+            return (
+                jsonify({"error": "The render has not finished", "status": job.status}),
+                HTTPStatus.CONFLICT,
+            )
+        if not os.path.exists(job.result_path):
+            return jsonify({"error": "The result has been deleted"}), HTTPStatus.GONE
+        entry = RenderResult.query.filter_by(job_id=job.id).first()
+        return send_file(
+            job.result_path,
+            conditional=True,
+            etag=entry.cache_key if entry is not None else True,
+            download_name=f"result_{job.video_filename}",
+            max_age=RESULT_MAX_AGE_SEC,
+        )
+
+    @app.route("/jobs/<job_id>/events", methods=["GET"])
+    @cognito_token_required
+    def stream_render_job(job_id):
+        """Stream the state, progress and stage timings of a render job.
+
+        The response is a Server-Sent Events stream. Each event carries the same
+        JSON as /jobs/<job_id> and is sent when the job changes; the stream ends
+        once the job is done or has failed, or with an "error" event if the job
+        is deleted while it is streamed.
+
+        Args:
+            job_id (str): The ID returned by /process_video.
+
+        Returns:
+            Response: A text/event-stream response, or 404 if the job does not
+            exist or belongs to another user.
+        """
+        # Access is checked once, before the stream is opened
+        if find_user_job(job_id, request.user) is None:
+            return jsonify({"error": "Job not found"}), HTTPStatus.NOT_FOUND
+
+        @stream_with_context
+        def events():
+            last = None
+            while True:
+                # End the transaction so the next read sees the workers' updates
+                db.session.rollback()
+                job = db.session.get(RenderJob, job_id)
+                if job is None:
+                    yield 'event: error\ndata: {"error": "Job not found"}\n\n'
+                    return
+                data = app.json.dumps(serialize_job(job))
+                # Comments keep idle connections open and reveal closed clients
+                yield f"data: {data}\n\n" if data != last else ":\n\n"
+                last = data
+                if job.status in ("done", "failed"):
+                    return
+                time.sleep(PROGRESS_INTERVAL_SEC)
+
+        return Response(
+            events(),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
 
     @app.route("/process_video", methods=["POST"])
+    @cognito_token_required
     def process_video():
         try:
-            print("Request form data:", request.form)
-            video_filename = request.form.get("video_filename")
-            if not video_filename:
-                return jsonify({"error": "No video filename provided"}), 400
-
-            video_path = os.path.join(UPLOAD_FOLDER, video_filename)
-            if not os.path.exists(video_path):
-                return jsonify({"error": "Video file not found"}), 404
-
-            timestamps = request.form.get("timestamps")
-            if not timestamps:
-                return jsonify({"error": "No timestamps provided"}), 400
-
-            timestamps = json.loads(timestamps)
-            image_path = extract_environment_variable("OVERLAY_IMAGE")
-            overlay_image = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
-
-            if overlay_image is None:
-                return jsonify({"error": "Overlay image not found"}), 404
-
-            print("details", image_path, timestamps, video_path)
-            start_seconds = float(timestamps[0]["timestamp"])
-            points = timestamps[0]["points"]
-            points = [
-                tuple([float(i) * 5 for i in points[0].values()]),
-                tuple([float(i) * 5 for i in points[1].values()]),
-                tuple([float(i) * 5 for i in points[2].values()]),
-                tuple([float(i) * 5 for i in points[2].values()]),
-            ]
-            print("Points:", points)
-            result_path = os.path.join(RESULT_FOLDER, f"result_{video_filename}")
-            replace_pixels_in_quadrilateral(
-                video_path,
+            video_filename, video_path, image_path, placements = parse_render_request(
+                UPLOAD_FOLDER
+            )
+            cache_key = render_cache_key(
+                video_digest(video_filename, video_path),
                 image_path,
-                result_path,
-                points,
-                start_seconds,
+                placements,
+                render_mode(render_options),
             )
+            job = render_queue.cached(cache_key, user_id=request.user)
+            if job is None:
+                extension = os.path.splitext(video_filename)[1]
+                probe = stored_probe(video_filename, request.user)
+                job = render_queue.submit(
+                    video_filename,
+                    video_path,
+                    image_path,
+                    os.path.join(RESULT_FOLDER, f"result_{cache_key}{extension}"),
+                    placements,
+                    user_id=request.user,
+                    cost=estimate_render_cost(video_path, placements, probe),
+                    cache_key=cache_key,
+                    probe=probe,
+                )
 
+            done = job.status == "done"
+            message = "Video already rendered" if done else "Video queued"
             return (
                 jsonify(
                     {
-                        "message": "Video processed successfully",
-                        "result_path": result_path,
+                        "message": message,
+                        "job_id": job.id,
+                        "status_url": f"/jobs/{job.id}",
+                        "events_url": f"/jobs/{job.id}/events",
+                        "cached": done,
                     }
                 ),
-                500,
+                HTTPStatus.OK if done else HTTPStatus.ACCEPTED,
+            )
+
+        except RenderRequestError as e:
+            return jsonify({"error": str(e)}), e.status_code
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
+    @app.route("/process_video_batch", methods=["POST"])
+    @cognito_token_required
+    def process_video_batch():
+        """Render one video and placement schedule against several overlays.
+
+        Form fields are the same as /process_video, plus one or more "overlays"
+        image files. The video is decoded once for all overlays that are not
+        already rendered.
+
+        Returns:
+            Response: JSON with one job per overlay, in upload order; 200 when
+            every overlay was already rendered, 202 otherwise.
+        """
+        try:
+            video_filename, video_path, _, placements = parse_render_request(
+                UPLOAD_FOLDER, overlay=False
+            )
+            image_paths = save_overlays(UPLOAD_FOLDER)
+            extension = os.path.splitext(video_filename)[1]
+            digest = video_digest(video_filename, video_path)
+            variants = []
+            for image_path in image_paths:
+                cache_key = render_cache_key(
+                    digest, image_path, placements, VARIANTS_MODE
+                )
+                result_name = f"result_{cache_key}{extension}"
+                variants.append(
+                    (image_path, os.path.join(RESULT_FOLDER, result_name), cache_key)
+                )
+            probe = stored_probe(video_filename, request.user)
+            jobs = render_queue.submit_variants(
+                video_filename,
+                video_path,
+                variants,
+                placements,
+                user_id=request.user,
+                cost=estimate_render_cost(video_path, placements, probe)
+                * len(variants),
+                probe=probe,
             )
 
+            done = all(job.status == "done" for job in jobs)
+            message = "Videos already rendered" if done else "Videos queued"
+            return (
+                jsonify(
+                    {
+                        "message": message,
+                        "jobs": [
+                            {
+                                "job_id": job.id,
+                                "status_url": f"/jobs/{job.id}",
+                                "events_url": f"/jobs/{job.id}/events",
+                                "cached": job.status == "done",
+                            }
+                            for job in jobs
+                        ],
+                    }
+                ),
+                HTTPStatus.OK if done else HTTPStatus.ACCEPTED,
+            )
+
+        except RenderRequestError as e:
+            return jsonify({"error": str(e)}), e.status_code
         except Exception as e:
             return jsonify({"error": str(e)}), 500
+
+
+def remove_file(path):
+    """Delete a file, ignoring one that is already gone.
+
+    Args:
+        path (str): Path to the file.
+    """
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def register_preview_route(app):
+    """Register the route that renders quick placement previews.
+
+    Args:
+        app: The Flask application instance.
+
+    Returns:
+        None
+    """
+    UPLOAD_FOLDER = extract_environment_variable("UPLOAD_FOLDER")
+    RESULT_FOLDER = extract_environment_variable("RESULT_FOLDER")
+
+    @app.route("/preview", methods=["POST"])
+    @cognito_token_required
+    def preview():
+        """Render a few composited frames, or a short clip, of a placement.
+
+        Form fields are the same as /process_video, plus:
+            times: A JSON list of times in seconds to render stills at. Defaults to
+                the start of every placement.
+            format: "jpeg" (default) for stills or "clip" for a short video.
+            duration: The length of a clip in seconds.
+            max_width: The maximum width of the output.
+
+        Returns:
+            Response: A JPEG for a single still, JSON with base64 data URLs for
+            several stills, or the MP4 clip.
+        """
+        started = time.perf_counter()
+        try:
+            video_filename, video_path, image_path, placements = parse_render_request(
+                UPLOAD_FOLDER
+            )
+            times = request.form.get("times")
+            if times:
+                times = [float(time_sec) for time_sec in json.loads(times)]
+            else:
+                times = [placement.start_time_sec for placement in placements]
+            max_width = int(request.form.get("max_width", 640))
+            duration = min(float(request.form.get("duration", 2)), MAX_PREVIEW_CLIP_SEC)
+            if not times:
+                raise ValueError("At least one preview time is required")
+            if max_width <= 0:
+                raise ValueError("max_width must be positive")
+            # Also rejects NaN, which min passes through
+            if not duration > 0:
+                raise ValueError("duration must be positive")
+        except RenderRequestError as e:
+            return jsonify({"error": str(e)}), e.status_code
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": str(e)}), HTTPStatus.BAD_REQUEST
+
+        if request.form.get("format") == "clip":
+            # Concurrent previews of the same upload each get their own file
+            with tempfile.NamedTemporaryFile(
+                prefix="preview_", suffix=".mp4", dir=RESULT_FOLDER, delete=False
+            ) as clip_file:
+                clip_path = clip_file.name
+            rendered = render_preview_clip(
+                video_path,
+                image_path,
+                clip_path,
+                placements,
+                min(times),
+                duration,
+                max_width=max_width,
+                probe=stored_probe(video_filename, request.user),
+            )
+            if not rendered:
+                remove_file(clip_path)
+                return (
+                    jsonify({"error": "Preview failed"}),
+                    HTTPStatus.INTERNAL_SERVER_ERROR,
+                )
+            app.logger.debug(
+                "Preview clip rendered in %.3fs", time.perf_counter() - started
+            )
+            # Clips are short and downscaled, so they are sent from memory
+            with open(clip_path, "rb") as clip_file:
+                clip = io.BytesIO(clip_file.read())
+            remove_file(clip_path)
+            return send_file(clip, mimetype="video/mp4", max_age=0)
+
+        stills = render_preview_frames(
+            video_path,
+            image_path,
+            placements,
+            times[:MAX_PREVIEW_FRAMES],
+            max_width=max_width,
+            probe=stored_probe(video_filename, request.user),
+        )
+        if not stills:
+            return (
+                jsonify({"error": "Preview failed"}),
+                HTTPStatus.INTERNAL_SERVER_ERROR,
+            )
+        elapsed_ms = round((time.perf_counter() - started) * 1000)
+        if len(stills) == 1:
+            response = Response(stills[0][1], mimetype="image/jpeg")
+            response.headers["X-Render-Time-Ms"] = str(elapsed_ms)
+            return response
+        return (
+            jsonify(
+                {
+                    "frames": [
+                        {
+                            "time": time_sec,
+                            "image": "data:image/jpeg;base64,"
+                            + base64.b64encode(jpeg).decode("ascii"),
+                        }
+                        for time_sec, jpeg in stills
+                    ],
+                    "elapsed_ms": elapsed_ms,
+                }
+            ),
+            HTTPStatus.OK,
+        )
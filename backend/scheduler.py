@@ -0,0 +1,184 @@
+"""
+This module decides when queued render jobs may start, sharing the render
+workers fairly between users and keeping the total work in flight bounded.
+"""
+
+import threading
+from collections import OrderedDict, deque
+from http import HTTPStatus
+
+from .exceptions import RenderRequestError
+from .video import affected_frame_count, open_capture, probe_properties
+
+
+def estimate_render_cost(video_path, placements, probe=None):
+    """Estimate the cost of a render as width x height x affected frames.
+
+    Args:
+        video_path (str): Path to the input video file.
+        placements (list): The Placement objects to apply.
+        probe (dict, optional): The stored result of probe_video, which saves
+            opening the video.
+
+    Returns:
+        int: The number of pixel-frames the render composites.
+
+    Raises:
+        RenderRequestError: If the video cannot be opened.
+    """
+    if probe is not None:
+        properties = probe_properties(probe)
+    else:
+        # Only the properties are read, so the frame store is not involved
+        video_capture, properties = open_capture(video_path)
+        if video_capture is None:
+            raise RenderRequestError(
+                "Video file could not be read", HTTPStatus.BAD_REQUEST
+            )
+        video_capture.release()
+    fps, frame_count = properties["fps"], properties["frame_count"]
+    frames = affected_frame_count(placements, fps, frame_count)
+    return properties["width"] * properties["height"] * frames
+
+
+class RenderScheduler:
+    """
+    A cost-aware, per-user round-robin scheduler with admission control.
+
+    Each user has a FIFO of pending jobs. Whenever a worker frees up, users are
+    visited in round-robin order and the first one whose next job fits within
+    the global cost budget is started, so a user with a stack of large renders
+    cannot hold back everyone else's small ones. A job larger than the whole
+    budget may still start when nothing else is running. Once a user's next job
+    has been passed over max_skips times, the budget is held for it: nothing else
+    starts until it fits, so a stream of small jobs cannot starve a large one.
+
+    Attributes:
+    -----------
+    running : int
+        The number of jobs currently started.
+    cost_in_flight : int
+        The summed cost of the running jobs.
+    """
+
+    def __init__(
+        self,
+        max_running,
+        cost_budget,
+        max_job_cost=0,
+        max_queued_per_user=10,
+        max_skips=4,
+    ):
+        """
+        Args:
+            max_running (int): The maximum number of jobs running at once.
+            cost_budget (int): The maximum summed cost of the running jobs.
+            max_job_cost (int): Jobs costing more than this are rejected; 0 disables
+                the limit.
+            max_queued_per_user (int): The maximum number of jobs a user may have
+                waiting.
+            max_skips (int): How often a user's next job may be passed over by
+                smaller ones before the budget is held for it.
+        """
+        self.max_running = max_running
+        self.cost_budget = cost_budget
+        self.max_job_cost = max_job_cost
+        self.max_queued_per_user = max_queued_per_user
+        self.max_skips = max_skips
+        # Insertion order is the round-robin order; served users move to the end
+        self.queues = OrderedDict()
+        # How often each user's next job has been passed over
+        self.skips = {}
+        self.running = 0
+        self.cost_in_flight = 0
+        self.lock = threading.Lock()
+
+    def submit(self, user_id, cost, start):
+        """Admit a job and queue it. Call dispatch afterwards to start jobs.
+
+        Args:
+            user_id (str): The user the job belongs to.
+            cost (int): The estimated cost of the job.
+            start (callable): Starts the job and returns a Future for it.
+
+        Raises:
+            RenderRequestError: If the job is too large or the user already has
+            too many jobs waiting.
+        """
+        if self.max_job_cost and cost > self.max_job_cost:
+            raise RenderRequestError(
+                "This render is larger than the service accepts",
+                HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+            )
+        with self.lock:
+            if len(self.queues.get(user_id, ())) >= self.max_queued_per_user:
+                raise RenderRequestError(
+                    "Too many renders are already waiting",
+                    HTTPStatus.TOO_MANY_REQUESTS,
+                )
+            self.queues.setdefault(user_id, deque()).append((cost, start))
+
+    def dispatch(self):
+        """Start every queued job that fits within the limits."""
+        with self.lock:
+            ready = self._take_ready()
+        for cost, start in ready:
+            try:
+                future = start()
+            except Exception as e:
+                print(f"Failed to start a render: {e}")
+                self._release(cost)
+                continue
+            future.add_done_callback(lambda _, cost=cost: self._release(cost))
+
+    def _take_ready(self):
+        ready = []
+        while self.running < self.max_running:
+            starved = [
+                user_id
+                for user_id in self.queues
+                if self.skips.get(user_id, 0) >= self.max_skips
+            ]
+            picked, passed = None, []
+            for user_id in starved[:1] or self.queues:
+                cost = self.queues[user_id][0][0]
+                idle = self.cost_in_flight == 0
+                if idle or self.cost_in_flight + cost <= self.cost_budget:
+                    picked = user_id
+                    break
+                passed.append(user_id)
+            if picked is None:
+                break
+            for user_id in passed:
+                self.skips[user_id] = self.skips.get(user_id, 0) + 1
+            self.skips.pop(picked, None)
+            queue = self.queues.pop(picked)
+            cost, start = queue.popleft()
+            if queue:
+                self.queues[picked] = queue
+            self.running += 1
+            self.cost_in_flight += cost
+            ready.append((cost, start))
+        return ready
+
+    def _release(self, cost):
+        with self.lock:
+            self.running -= 1
+            self.cost_in_flight -= cost
+        self.dispatch()
+
+    def stats(self):
+        """Return the current load of the scheduler.
+
+        Returns:
+            dict: The running job count, cost in flight and waiting jobs per user.
+        """
+        with self.lock:
+            return {
+                "running": self.running,
+                "cost_in_flight": self.cost_in_flight,
+                "cost_budget": self.cost_budget,
+                "queued": {
+                    user_id: len(queue) for user_id, queue in self.queues.items()
+                },
+            }
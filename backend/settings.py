@@ -21,3 +21,67 @@ DEBUG = extract_environment_variable("DEBUG", "false").lower() == "true"
 ALLOWED_CORS_ORIGINS = ["http://localhost:3000", "http://localhost:5000"]
 TEMPLATE_FOLDER = extract_environment_variable("TEMPLATE_FOLDER")
 STATIC_FOLDER = extract_environment_variable("STATIC_FOLDER")
+# Let a fronting server (nginx, Apache) send files named in an X-Sendfile header
+USE_X_SENDFILE = (
+    extract_environment_variable("USE_X_SENDFILE", "false").lower() == "true"
+)
+# Number of processes used to render one video in chunks; 0 or 1 renders in one pass
+RENDER_CHUNK_WORKERS = int(extract_environment_variable("RENDER_CHUNK_WORKERS", "0"))
+# Compositing backend: "frame" for the per-frame ROI path, "batch" for the NumPy kernel
+RENDER_BACKEND = extract_environment_variable("RENDER_BACKEND", "frame")
+# Number of worker processes that run queued render jobs
+RENDER_WORKERS = int(extract_environment_variable("RENDER_WORKERS", "2"))
+# Render admission control; costs are in pixel-frames (width x height x frames)
+RENDER_COST_BUDGET = int(
+    extract_environment_variable("RENDER_COST_BUDGET", "50000000000")
+)
+RENDER_MAX_JOB_COST = int(extract_environment_variable("RENDER_MAX_JOB_COST", "0"))
+RENDER_MAX_QUEUED_PER_USER = int(
+    extract_environment_variable("RENDER_MAX_QUEUED_PER_USER", "10")
+)
+# How often a queued render may be passed over by smaller ones before it goes next
+RENDER_MAX_SKIPS = int(extract_environment_variable("RENDER_MAX_SKIPS", "4"))
+# Resumable uploads: the suggested chunk size, and the largest chunk and file accepted
+UPLOAD_CHUNK_BYTES = int(extract_environment_variable("UPLOAD_CHUNK_BYTES", "8388608"))
+MAX_UPLOAD_CHUNK_BYTES = int(
+    extract_environment_variable("MAX_UPLOAD_CHUNK_BYTES", "67108864")
+)
+MAX_UPLOAD_BYTES = int(extract_environment_variable("MAX_UPLOAD_BYTES", "10737418240"))
+# A chunk write that has not finished after this long is taken to be abandoned
+UPLOAD_WRITE_TIMEOUT_SEC = float(
+    extract_environment_variable("UPLOAD_WRITE_TIMEOUT_SEC", "600")
+)
+# Cognito signing keys are cached for JWKS_TTL_SEC; an unknown key ID refetches them
+# at most every JWKS_MIN_REFETCH_SEC
+JWKS_TTL_SEC = float(extract_environment_variable("JWKS_TTL_SEC", "3600"))
+JWKS_MIN_REFETCH_SEC = float(extract_environment_variable("JWKS_MIN_REFETCH_SEC", "30"))
+JWKS_TIMEOUT_SEC = float(extract_environment_variable("JWKS_TIMEOUT_SEC", "5"))
+# Number of verified tokens remembered until they expire
+VERIFIED_TOKEN_CACHE_SIZE = int(
+    extract_environment_variable("VERIFIED_TOKEN_CACHE_SIZE", "10000")
+)
+# The shared Cognito client: its connection pool, retry policy and timeouts
+COGNITO_MAX_POOL_CONNECTIONS = int(
+    extract_environment_variable("COGNITO_MAX_POOL_CONNECTIONS", "50")
+)
+COGNITO_RETRY_MODE = extract_environment_variable("COGNITO_RETRY_MODE", "standard")
+COGNITO_MAX_ATTEMPTS = int(extract_environment_variable("COGNITO_MAX_ATTEMPTS", "3"))
+COGNITO_CONNECT_TIMEOUT_SEC = float(
+    extract_environment_variable("COGNITO_CONNECT_TIMEOUT_SEC", "2")
+)
+COGNITO_READ_TIMEOUT_SEC = float(
+    extract_environment_variable("COGNITO_READ_TIMEOUT_SEC", "5")
+)
+# Accounts are confirmed after /register returns, retrying with exponential backoff;
+# VERIFY_CONFIRMATION also reads back and logs the confirmed user's status
+CONFIRMATION_ATTEMPTS = int(extract_environment_variable("CONFIRMATION_ATTEMPTS", "5"))
+CONFIRMATION_BACKOFF_SEC = float(
+    extract_environment_variable("CONFIRMATION_BACKOFF_SEC", "0.5")
+)
+VERIFY_CONFIRMATION = (
+    extract_environment_variable("VERIFY_CONFIRMATION", "false").lower() == "true"
+)
+# "cognito" for the AWS user pool, or "local" for the in-memory stand-in that issues
+# its own tokens, for running and load-testing the auth paths offline
+LOCAL_IDENTITY_BACKEND = "local"
+IDENTITY_BACKEND = extract_environment_variable("IDENTITY_BACKEND", "cognito")
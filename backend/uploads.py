@@ -0,0 +1,348 @@
+"""
+This module implements resumable uploads: a file is preallocated when an upload
+starts, chunks are written into it at their offsets straight from the request
+stream, and the SHA-256 of the content is computed as the chunks arrive.
+"""
+
+import hashlib
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from werkzeug.exceptions import ClientDisconnected
+from werkzeug.utils import secure_filename
+
+from .database import StoredFile, UploadSession, db
+from .settings import UPLOAD_WRITE_TIMEOUT_SEC
+
+PARTIAL_FOLDER = "partial"
+BLOCK_SIZE = 1 << 20
+
+# Running digests of in-progress uploads, keyed by upload ID. Each entry is the
+# number of bytes hashed so far, the hash object and when it was last used.
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _claim(upload_id, status, condition, now):
+    """Move an upload into a busy status with one conditional UPDATE.
+
+    A claim in the same status that is older than UPLOAD_WRITE_TIMEOUT_SEC is
+    taken over, since its process has died.
+    """
+    stale_before = now - timedelta(seconds=UPLOAD_WRITE_TIMEOUT_SEC)
+    sessions = UploadSession.__table__
+    result = db.session.execute(
+        sessions.update()
+        .where(
+            sessions.c.id == upload_id,
+            condition,
+            or_(
+                sessions.c.status == "uploading",
+                and_(
+                    sessions.c.status == status,
+                    sessions.c.updated_at < stale_before,
+                ),
+            ),
+        )
+        .values(status=status, updated_at=now)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def claim_chunk(upload_id, offset, now=None):
+    """Take the exclusive right to write the chunk that starts at an offset.
+
+    The claim is a single conditional UPDATE, so it holds across server
+    processes: it succeeds only while the upload has received exactly offset
+    bytes and no other request is writing to it. A claim older than
+    UPLOAD_WRITE_TIMEOUT_SEC is taken over, since its process has died.
+
+    Must be called inside an application context.
+
+    Args:
+        upload_id (str): The ID of the upload.
+        offset (int): The offset the chunk starts at.
+        now (datetime, optional): The current naive UTC time.
+
+    Returns:
+        bool: True if the caller may write the chunk; it must then call
+        release_chunk.
+    """
+    sessions = UploadSession.__table__
+    return _claim(
+        upload_id, "writing", sessions.c.bytes_received == offset, now or _utcnow()
+    )
+
+
+def release_chunk(upload_id, bytes_received):
+    """Record the bytes a claimed chunk wrote and let the next chunk in.
+
+    Must be called inside an application context.
+
+    Args:
+        upload_id (str): The ID of the upload.
+        bytes_received (int): The number of bytes received including the chunk.
+    """
+    sessions = UploadSession.__table__
+    db.session.execute(
+        sessions.update()
+        .where(sessions.c.id == upload_id, sessions.c.status == "writing")
+        .values(status="uploading", bytes_received=bytes_received)
+    )
+    db.session.commit()
+
+
+def claim_completion(upload_id, now=None):
+    """Take the exclusive right to complete a fully received upload.
+
+    Like claim_chunk, this holds across server processes, so an upload is only
+    ever moved into place and turned into a project once.
+
+    Must be called inside an application context.
+
+    Args:
+        upload_id (str): The ID of the upload.
+        now (datetime, optional): The current naive UTC time.
+
+    Returns:
+        bool: True if the caller may complete the upload; if completing fails it
+        must call release_completion.
+    """
+    sessions = UploadSession.__table__
+    return _claim(
+        upload_id,
+        "completing",
+        sessions.c.bytes_received == sessions.c.size,
+        now or _utcnow(),
+    )
+
+
+def release_completion(upload_id):
+    """Give up a completion claim so that the client can retry.
+
+    Must be called inside an application context.
+
+    Args:
+        upload_id (str): The ID of the upload.
+    """
+    db.session.rollback()
+    sessions = UploadSession.__table__
+    db.session.execute(
+        sessions.update()
+        .where(sessions.c.id == upload_id, sessions.c.status == "completing")
+        .values(status="uploading")
+    )
+    db.session.commit()
+
+
+def discard_hasher(upload_id):
+    """Forget the running digest of an upload.
+
+    Args:
+        upload_id (str): The ID of the upload.
+    """
+    with _hashers_lock:
+        _hashers.pop(upload_id, None)
+
+
+def prune_hashers(now=None):
+    """Forget the running digests of uploads that have been idle too long.
+
+    An abandoned upload would otherwise keep its hash object forever. A resumed
+    upload rebuilds its digest from the bytes on disk.
+
+    Args:
+        now (float, optional): The current time.monotonic() value.
+    """
+    idle_before = (now or time.monotonic()) - UPLOAD_WRITE_TIMEOUT_SEC
+    with _hashers_lock:
+        for upload_id, (_, _, used_at) in list(_hashers.items()):
+            if used_at < idle_before:
+                del _hashers[upload_id]
+
+
+def partial_path(upload_folder, upload):
+    """Return the path an upload is assembled at.
+
+    Args:
+        upload_folder (str): The folder uploads are stored in.
+        upload (UploadSession): The upload.
+
+    Returns:
+        str: The path of the preallocated file.
+    """
+    extension = os.path.splitext(upload.filename)[1]
+    return os.path.join(upload_folder, PARTIAL_FOLDER, f"{upload.id}{extension}")
+
+
+def preallocate(path, size):
+    """Create a file of a given size for chunks to be written into.
+
+    Disk space is reserved up front where the filesystem supports it, so a full
+    disk is reported when the upload starts instead of halfway through.
+
+    Args:
+        path (str): The path of the file.
+        size (int): The final size of the file in bytes.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as file:
+        if size and hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(file.fileno(), 0, size)
+                return
+            except OSError:
+                pass  # Not supported by this filesystem; fall back to a sparse file
+        file.truncate(size)
+
+
+def _hasher_at(path, upload_id, offset):
+    """Return the running digest of an upload, hashed up to an offset.
+
+    After a server restart the digest is rebuilt from the bytes already on disk.
+    """
+    with _hashers_lock:
+        hashed, hasher, _ = _hashers.get(upload_id, (0, None, 0.0))
+    if hasher is None or hashed != offset:
+        hasher = hashlib.sha256()
+        with open(path, "rb") as file:
+            remaining = offset
+            while remaining > 0:
+                block = file.read(min(BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                hasher.update(block)
+                remaining -= len(block)
+    return hasher
+
+
+def write_chunk(path, upload_id, offset, stream, length):
+    """Copy a chunk from a request stream into an upload at an offset.
+
+    Chunks must arrive in order, so the digest can be updated as they are
+    written. If the stream ends early or the client disconnects, the bytes
+    received so far are kept and the upload can resume after them.
+
+    Args:
+        path (str): The path of the preallocated file.
+        upload_id (str): The ID of the upload.
+        offset (int): The offset the chunk starts at, which must be the number of
+            bytes already received.
+        stream: A file-like object to read the chunk from.
+        length (int): The number of bytes to copy.
+
+    Returns:
+        int: The number of bytes written.
+    """
+    prune_hashers()
+    hasher = _hasher_at(path, upload_id, offset)
+    written = 0
+    try:
+        with open(path, "r+b") as file:
+            file.seek(offset)
+            while written < length:
+                try:
+                    block = stream.read(min(BLOCK_SIZE, length - written))
+                except (OSError, ClientDisconnected):
+                    break  # The client went away; keep what has arrived
+                if not block:
+                    break
+                file.write(block)
+                hasher.update(block)
+                written += len(block)
+    finally:
+        with _hashers_lock:
+            _hashers[upload_id] = (offset + written, hasher, time.monotonic())
+    return written
+
+
+def save_upload(upload_folder, file):
+    """Store a file uploaded in one request, hashing it as it is written.
+
+    Args:
+        upload_folder (str): The folder uploads are stored in.
+        file (FileStorage): The uploaded file.
+
+    Returns:
+        tuple: The stored file name in the upload folder and whether the same
+        content was already stored.
+    """
+    extension = os.path.splitext(secure_filename(file.filename or ""))[1]
+    os.makedirs(os.path.join(upload_folder, PARTIAL_FOLDER), exist_ok=True)
+    path = os.path.join(upload_folder, PARTIAL_FOLDER, f"{uuid.uuid4()}{extension}")
+    hasher = hashlib.sha256()
+    size = 0
+    with open(path, "wb") as output:
+        while block := file.stream.read(BLOCK_SIZE):
+            output.write(block)
+            hasher.update(block)
+            size += len(block)
+    return store_file(upload_folder, path, hasher.hexdigest(), size, extension)
+
+
+def finish_upload(upload_folder, upload):
+    """Move a fully received upload into place, reusing identical content.
+
+    Args:
+        upload_folder (str): The folder uploads are stored in.
+        upload (UploadSession): The upload, with every byte received.
+
+    Returns:
+        tuple: The stored file name in the upload folder and whether it already
+        existed.
+    """
+    path = partial_path(upload_folder, upload)
+    digest = _hasher_at(path, upload.id, upload.bytes_received).hexdigest()
+    discard_hasher(upload.id)
+    upload.sha256 = digest
+    extension = os.path.splitext(upload.filename)[1]
+    return store_file(upload_folder, path, digest, upload.size, extension)
+
+
+def store_file(upload_folder, path, digest, size, extension):
+    """Move a received file into the upload folder under a new name.
+
+    The file is recorded as a StoredFile in the current session. Content that
+    is already stored shares the existing file, and the new copy is discarded.
+
+    Args:
+        upload_folder (str): The folder uploads are stored in.
+        path (str): The path of the received file.
+        digest (str): The SHA-256 of its content.
+        size (int): Its size in bytes.
+        extension (str): The extension of the stored name.
+
+    Returns:
+        tuple: The stored file name in the upload folder and whether it already
+        existed.
+    """
+    stored = db.session.get(StoredFile, digest)
+    if stored is not None and os.path.exists(
+        os.path.join(upload_folder, stored.filename)
+    ):
+        os.remove(path)
+        return stored.filename, True
+
+    filename = f"{uuid.uuid4()}{extension}"
+    os.replace(path, os.path.join(upload_folder, filename))
+    if stored is not None:
+        stored.filename = filename
+        return filename, False
+    try:
+        with db.session.begin_nested():
+            db.session.add(StoredFile(sha256=digest, filename=filename, size=size))
+    except IntegrityError:
+        # The same content was stored by a concurrent upload; share its file
+        os.remove(os.path.join(upload_folder, filename))
+        return db.session.get(StoredFile, digest).filename, True
+    return filename, False
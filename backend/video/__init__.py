@@ -0,0 +1,40 @@
+from .assets import OverlayCache, load_overlay, overlay_cache
+from .chunked import (
+    concatenate_videos,
+    render_chunk,
+    render_placements_chunked,
+    split_frame_ranges,
+)
+from .compositor import QuadCompositor
+from .frame_store import FrameStore, SpillingCapture, StoredFrames, frame_store
+from .keyframes import (
+    KeyframedCompositor,
+    interpolate_quads,
+    perspective_transforms,
+)
+from .pipeline import FrameRing, RenderPipeline
+from .preview import render_preview_clip, render_preview_frames
+from .probe import keyframe_before, probe_properties, probe_video
+from .proxy import generate_proxies, proxy_size
+from .render import (
+    BATCH_BACKEND,
+    FRAME_BACKEND,
+    VIDEO_CODEC,
+    create_video_writer,
+    open_capture,
+    open_video,
+    render_batched,
+    render_placements,
+    render_serial,
+    replace_pixels_in_quadrilateral,
+)
+from .schedule import (
+    Placement,
+    PlacementSchedule,
+    affected_frame_count,
+    parse_placements,
+    parse_points,
+)
+from .telemetry import STAGES, RenderTelemetry
+from .tracking import PlanarTracker, TrackedCompositor, TrackedQuads
+from .variants import VariantEncoder, render_variants
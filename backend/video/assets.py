@@ -0,0 +1,154 @@
+"""
+This module loads overlay images and keeps a process-wide cache of the decoded
+images and their resized variants.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from ..environ import extract_environment_variable
+
+
+def load_overlay(image_path):
+    """Read an overlay image, keeping its alpha channel if it has one.
+
+    Args:
+        image_path (str): Path to the overlay image file.
+
+    Returns:
+        np.ndarray: An 8-bit BGR or BGRA image, or None if it cannot be read.
+    """
+    image = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        return None
+    if image.dtype != np.uint8:
+        image = cv2.convertScaleAbs(image, alpha=255 / np.iinfo(image.dtype).max)
+    if image.ndim == 2:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    return image
+
+
+class OverlayCache:
+    """
+    A thread-safe LRU cache of decoded overlays and their resized variants.
+
+    Entries are keyed by path and modification time, so replacing a creative on
+    disk invalidates it. Cached arrays are read-only because they are shared by
+    every render in the process.
+
+    Attributes:
+    -----------
+    max_bytes : int
+        The memory budget; least recently used entries are evicted beyond it.
+    hits, misses, evictions : int
+        Counters for monitoring the cache.
+    """
+
+    def __init__(self, max_bytes):
+        """
+        Args:
+            max_bytes (int): The memory budget of the cache in bytes.
+        """
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, image_path):
+        """Return a decoded overlay.
+
+        Args:
+            image_path (str): Path to the overlay image file.
+
+        Returns:
+            np.ndarray: The read-only BGR or BGRA image, or None if it cannot be
+            read.
+        """
+        try:
+            mtime = os.stat(image_path).st_mtime_ns
+        except OSError:
+            return None
+        return self._lookup(("decoded", image_path, mtime), load_overlay, image_path)
+
+    def get_resized(self, image_path, size, interpolation=cv2.INTER_LINEAR):
+        """Return an overlay resized to a target size.
+
+        Args:
+            image_path (str): Path to the overlay image file.
+            size (tuple): The (width, height) to resize to.
+            interpolation (int): The OpenCV interpolation flag.
+
+        Returns:
+            np.ndarray: The read-only resized image, or None if it cannot be read.
+        """
+        try:
+            mtime = os.stat(image_path).st_mtime_ns
+        except OSError:
+            return None
+
+        def resize(path):
+            image = self.get(path)
+            if image is None:
+                return None
+            return cv2.resize(image, size, interpolation=interpolation)
+
+        key = ("resized", image_path, mtime, tuple(size), interpolation)
+        return self._lookup(key, resize, image_path)
+
+    def _lookup(self, key, loader, image_path):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+        # Decode outside the lock so a slow read does not block other renders
+        image = loader(image_path)
+        if image is None:
+            return None
+        image.flags.writeable = False
+        with self.lock:
+            if key not in self.entries:
+                self.entries[key] = image
+                self.size += image.nbytes
+                self._evict()
+        return image
+
+    def _evict(self):
+        while self.size > self.max_bytes and len(self.entries) > 1:
+            _, image = self.entries.popitem(last=False)
+            self.size -= image.nbytes
+            self.evictions += 1
+
+    def stats(self):
+        """Return the cache counters.
+
+        Returns:
+            dict: The entry count, size in bytes, hits, misses and evictions.
+        """
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def clear(self):
+        """Drop every cached overlay."""
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+overlay_cache = OverlayCache(
+    int(extract_environment_variable("OVERLAY_CACHE_BYTES", str(256 * 1024 * 1024)))
+)
@@ -0,0 +1,227 @@
+"""
+This module renders a video in frame-range chunks across a pool of processes and
+joins the partial outputs into a single result file.
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+from .assets import overlay_cache
+from .probe import keyframe_before
+from .render import create_video_writer, open_capture, open_video, render_placements
+from .schedule import PlacementSchedule
+from .telemetry import RenderTelemetry
+
+# Chunks shorter than this are not worth the cost of an extra process and seek
+MIN_CHUNK_FRAMES = 250
+
+
+def split_frame_ranges(frame_count, chunks, keyframes=()):
+    """Split a video into contiguous, non-overlapping frame ranges.
+
+    Args:
+        frame_count (int): The number of frames in the video.
+        chunks (int): The number of ranges to produce.
+        keyframes (list): Increasing keyframe frame numbers, if known. Range
+            boundaries are moved back to keyframes so that every chunk starts with
+            a precise seek; ranges that collapse are dropped.
+
+    Returns:
+        list: Half-open (start, stop) ranges. The stop of the last range is None so
+        that it renders until the end of the stream, whatever the container claims.
+    """
+    chunks = max(min(chunks, frame_count), 1)
+    bounds = [frame_count * index // chunks for index in range(chunks + 1)]
+    if keyframes:
+        inner = {keyframe_before(keyframes, bound) or 0 for bound in bounds[1:-1]}
+        bounds = sorted(inner | {0, frame_count})
+    ranges = [(start, stop) for start, stop in zip(bounds, bounds[1:]) if stop > start]
+    ranges[-1] = (ranges[-1][0], None)
+    return ranges
+
+
+def render_chunk(
+    video_path, image_path, output_path, placements, start, stop, probe=None
+):
+    """Render one frame range of a video to its own file.
+
+    Args:
+        video_path (str): Path to the input video file.
+        image_path (str): Path to the overlay image file.
+        output_path (str): Path for saving the partial output video.
+        placements (list): The Placement objects to apply.
+        start (int): The first frame of the range.
+        stop (int or None): The frame after the last one, or None for the end of
+            the video.
+        probe (dict, optional): The stored result of probe_video.
+
+    Returns:
+        tuple: The number of frames written and the seconds spent in each render
+        stage.
+
+    Raises:
+        RuntimeError: If the overlay image cannot be read.
+    """
+    telemetry = RenderTelemetry()
+    video_capture, properties = open_capture(video_path, probe)
+    if video_capture is None:
+        return 0, telemetry.stage_sec
+    image = overlay_cache.get(image_path)
+    if image is None:
+        video_capture.release()
+        raise RuntimeError(f"Overlay image {image_path} could not be read")
+    schedule = PlacementSchedule.build(
+        placements, image, properties, image_path=image_path
+    )
+    video_writer = create_video_writer(output_path, properties)
+    video_capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+    telemetry.start(properties["frame_count"], schedule)
+
+    frame_number = start
+    try:
+        while stop is None or frame_number < stop:
+            with telemetry.stage("decode"):
+                ret, frame = video_capture.read()
+            if not ret:
+                break
+            with telemetry.composite():
+                schedule.apply(frame, frame_number)
+            with telemetry.stage("encode"):
+                video_writer.write(frame)
+            frame_number += 1
+    finally:
+        video_capture.release()
+        video_writer.release()
+    return frame_number - start, telemetry.stage_sec
+
+
+def concatenate_videos(part_paths, output_path):
+    """Join partial renders into one video.
+
+    The parts are stream-copied with ffmpeg's concat demuxer, so joining them
+    never re-encodes a frame.
+
+    Args:
+        part_paths (list): Paths of the partial videos, in order.
+        output_path (str): Path for saving the joined video.
+
+    Raises:
+        RuntimeError: If ffmpeg is not installed.
+    """
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        raise RuntimeError("ffmpeg is required to join chunked renders")
+    list_path = f"{output_path}.parts.txt"
+    with open(list_path, "w", encoding="utf-8") as list_file:
+        for part_path in part_paths:
+            list_file.write(f"file '{os.path.abspath(part_path)}'\n")
+    try:
+        subprocess.run(
+            [ffmpeg, "-v", "error", "-y", "-f", "concat", "-safe", "0"]
+            + ["-i", list_path, "-c", "copy", output_path],
+            check=True,
+        )
+    finally:
+        os.remove(list_path)
+
+
+def render_placements_chunked(
+    video_path,
+    image_path,
+    output_path,
+    placements,
+    workers=None,
+    telemetry=None,
+    probe=None,
+):
+    """Render a video in parallel chunks and concatenate the results.
+
+    Each worker process seeks to the start of its own frame range, so the frames
+    and their numbering match a single-pass render exactly. Videos too short to
+    split, videos with tracked placements, and hosts without ffmpeg to join the
+    parts losslessly fall back to render_placements.
+
+    Args:
+        video_path (str): Path to the input video file.
+        image_path (str): Path to the overlay image file.
+        output_path (str): Path for saving the output video.
+        placements (list): The Placement objects to apply.
+        workers (int, optional): The number of processes. Defaults to the number
+            of CPUs.
+        telemetry (RenderTelemetry, optional): Receives progress as chunks finish,
+            and the stage times of every chunk. Concatenation counts as encoding.
+        probe (dict, optional): The stored result of probe_video. Its keyframes
+            are used as chunk boundaries.
+
+    Returns:
+        bool: True if the video was rendered, False if the video or the overlay
+        could not be read.
+    """
+    video_capture, properties = open_video(video_path, probe)
+    if video_capture is None:
+        return False
+    video_capture.release()
+    if not os.path.exists(image_path):
+        return False
+
+    workers = workers or os.cpu_count() or 1
+    chunks = min(workers, properties["frame_count"] // MIN_CHUNK_FRAMES)
+    # Tracking carries state from frame to frame, so it cannot start mid-video
+    if (
+        chunks < 2
+        or any(placement.tracked for placement in placements)
+        or not shutil.which("ffmpeg")
+    ):
+        return render_placements(
+            video_path,
+            image_path,
+            output_path,
+            placements,
+            telemetry=telemetry,
+            probe=probe,
+        )
+
+    telemetry = telemetry or RenderTelemetry()
+    telemetry.start(properties["frame_count"])
+    ranges = split_frame_ranges(
+        properties["frame_count"], chunks, properties["keyframes"]
+    )
+    part_dir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(output_path)))
+    part_paths = [
+        os.path.join(part_dir, f"part_{index:04d}.mp4") for index in range(len(ranges))
+    ]
+    try:
+        with ProcessPoolExecutor(max_workers=chunks) as executor:
+            futures = [
+                executor.submit(
+                    render_chunk,
+                    video_path,
+                    image_path,
+                    part_path,
+                    placements,
+                    start,
+                    stop,
+                    probe,
+                )
+                for part_path, (start, stop) in zip(part_paths, ranges)
+            ]
+            frames_done = 0
+            for (start, stop), future in zip(ranges, futures):
+                frames_written, stage_sec = future.result()
+                if stop is not None and frames_written != stop - start:
+                    raise RuntimeError(
+                        f"Chunk {start}-{stop} wrote {frames_written} frames"
+                    )
+                frames_done += frames_written
+                telemetry.merge(stage_sec)
+                telemetry.report(frames_done)
+        with telemetry.stage("encode"):
+            concatenate_videos(part_paths, output_path)
+    finally:
+        shutil.rmtree(part_dir, ignore_errors=True)
+    return True
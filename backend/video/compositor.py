@@ -0,0 +1,264 @@
+"""
+This module provides the compositing engine that places an overlay image into a
+quadrilateral region of video frames.
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+from .assets import overlay_cache
+
+
+def quad_dimensions(pts_dst):
+    """Calculate the size the overlay should be resized to for a quadrilateral.
+
+    Args:
+        pts_dst (np.ndarray): The four (x, y) vertices of the quadrilateral
+            (top-left, top-right, bottom-right, bottom-left).
+
+    Returns:
+        tuple: The (width, height) of the target region in pixels.
+    """
+    width = int(
+        max(
+            np.linalg.norm(pts_dst[0] - pts_dst[1]),
+            np.linalg.norm(pts_dst[2] - pts_dst[3]),
+        )
+    )
+    height = int(
+        max(
+            np.linalg.norm(pts_dst[0] - pts_dst[3]),
+            np.linalg.norm(pts_dst[1] - pts_dst[2]),
+        )
+    )
+    return max(width, 1), max(height, 1)
+
+
+def overlay_corners(width, height):
+    """Return the corners of a resized overlay in the same order as the quad points.
+
+    Args:
+        width (int): The width of the resized overlay.
+        height (int): The height of the resized overlay.
+
+    Returns:
+        np.ndarray: A (4, 2) float32 array of source points.
+    """
+    return np.array(
+        [[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]],
+        dtype="float32",
+    )
+
+
+def quad_roi(pts_dst, frame_size):
+    """Compute the bounding box of a quadrilateral clipped to the frame.
+
+    The box has a one pixel margin so that it also covers the anti-aliased edge.
+
+    Args:
+        pts_dst (np.ndarray): The four (x, y) vertices of the quadrilateral.
+        frame_size (tuple): The (width, height) of the video frames.
+
+    Returns:
+        tuple: The (x, y, width, height) of the region of interest, or None if the
+        quadrilateral lies entirely outside the frame.
+    """
+    frame_width, frame_height = frame_size
+    x0, y0 = np.floor(pts_dst.min(axis=0)).astype(int) - 1
+    x1, y1 = np.ceil(pts_dst.max(axis=0)).astype(int) + 2
+    x0, y0 = max(x0, 0), max(y0, 0)
+    x1, y1 = min(x1, frame_width), min(y1, frame_height)
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return int(x0), int(y0), int(x1 - x0), int(y1 - y0)
+
+
+def warp_into_roi(resized_image, matrix, pts_dst, roi):
+    """Warp an overlay and compute its coverage for a region of interest only.
+
+    Args:
+        resized_image (np.ndarray): The BGR or BGRA overlay, resized to the quad.
+        matrix (np.ndarray): The 3x3 homography from overlay to frame coordinates.
+        pts_dst (np.ndarray): The four (x, y) vertices of the quadrilateral.
+        roi (tuple): The (x, y, width, height) region returned by quad_roi.
+
+    Returns:
+        tuple: The warped BGR overlay and its uint8 alpha, both the size of the
+        ROI. The alpha combines the overlay's own alpha channel with the
+        anti-aliased coverage of the quad.
+    """
+    x, y, width, height = roi
+    # Shift the homography so that the ROI origin becomes (0, 0)
+    translation = np.array([[1, 0, -x], [0, 1, -y], [0, 0, 1]], dtype=np.float64)
+    # Edge pixels sample outside the overlay; replicating its border keeps them
+    # from blending towards black, since the coverage already fades the edge
+    warped = cv2.warpPerspective(
+        resized_image,
+        translation @ matrix,
+        (width, height),
+        borderMode=cv2.BORDER_REPLICATE,
+    )
+    # Rasterise with 4 bits of sub-pixel precision so the edge coverage is smooth
+    coverage = np.zeros((height, width), dtype=np.uint8)
+    vertices = np.round((pts_dst - np.array([x, y])) * 16).astype(np.int32)
+    cv2.fillConvexPoly(coverage, vertices, 255, lineType=cv2.LINE_AA, shift=4)
+    if warped.shape[2] == 4:
+        alpha = warped[..., 3].astype(np.uint16) * coverage
+        coverage = ((alpha + 127) // 255).astype(np.uint8)
+        warped = np.ascontiguousarray(warped[..., :3])
+    return warped, coverage
+
+
+def blend_weights(foreground, alpha):
+    """Precompute the 8-bit fixed-point terms of an alpha blend.
+
+    With w = alpha + (alpha >> 7), which maps 0..255 onto 0..256, a blended pixel
+    is (foreground * w + background * (256 - w)) >> 8, computed in uint16.
+
+    Args:
+        foreground (np.ndarray): The (K, 3) overlay pixels.
+        alpha (np.ndarray): The (K,) uint8 alpha of those pixels.
+
+    Returns:
+        tuple: The (K, 3) premultiplied foreground and the (K, 1) background
+        weight, both uint16.
+    """
+    weight = alpha.astype(np.uint16)[:, np.newaxis]
+    weight += weight >> 7
+    return foreground.astype(np.uint16) * weight, 256 - weight
+
+
+class QuadCompositor:
+    """
+    Blend an overlay into a quadrilateral region of video frames.
+
+    The warp, the alpha and the region of interest are computed once when the
+    compositor is built, and again only when set_quad moves it. Fully opaque
+    pixels are copied and only the partially transparent ones (the anti-aliased
+    edge and any translucent parts of the overlay) go through an integer blend,
+    all within the quad's bounding box.
+
+    Attributes:
+    -----------
+    warp_sec : float
+        The total time set_quad has spent re-warping the overlay.
+    """
+
+    def __init__(self, image, points, frame_size, image_path=None):
+        """
+        Args:
+            image (np.ndarray): The BGR or BGRA overlay image to place.
+            points (list): Four (x, y) tuples representing the vertices of the
+                quadrilateral (top-left, top-right, bottom-right, bottom-left).
+            frame_size (tuple): The (width, height) of the video frames.
+            image_path (str, optional): The path the image was loaded from. When
+                given, the resized overlay is shared through the overlay cache.
+        """
+        pts_dst = np.array(points, dtype="float32")
+        width, height = quad_dimensions(pts_dst)
+        self.resized_image = None
+        if image_path is not None:
+            self.resized_image = overlay_cache.get_resized(image_path, (width, height))
+        if self.resized_image is None:
+            self.resized_image = cv2.resize(image, (width, height))
+        self.corners = overlay_corners(width, height)
+        self.frame_size = frame_size
+        self.warp_sec = 0.0
+        self.set_quad(pts_dst)
+
+    def set_quad(self, points, matrix=None):
+        """Move the overlay to a new quadrilateral.
+
+        Only the ROI of the new quad is warped, so this is cheap enough to call on
+        every frame when the placement moves.
+
+        Args:
+            points (np.ndarray): The four (x, y) vertices of the new quadrilateral.
+            matrix (np.ndarray, optional): The 3x3 homography from the resized
+                overlay to the quad, if it has already been computed.
+        """
+        started = time.perf_counter()
+        self._warp(points, matrix)
+        self.warp_sec += time.perf_counter() - started
+
+    def _warp(self, points, matrix):
+        pts_dst = np.asarray(points, dtype="float32")
+        if matrix is None:
+            matrix = cv2.getPerspectiveTransform(self.corners, pts_dst)
+        self.flat_terms = None
+        self.roi = quad_roi(pts_dst, self.frame_size)
+        if self.roi is None:
+            return
+        x, y, roi_width, roi_height = self.roi
+        self.slices = (slice(y, y + roi_height), slice(x, x + roi_width))
+        self.warped, self.alpha = warp_into_roi(
+            self.resized_image, matrix, pts_dst, self.roi
+        )
+        self.where = (self.alpha == 255)[..., np.newaxis]
+        self.blend_rows, self.blend_cols = np.nonzero(
+            (self.alpha > 0) & (self.alpha < 255)
+        )
+        self.blend_foreground, self.blend_inverse = blend_weights(
+            self.warped[self.blend_rows, self.blend_cols],
+            self.alpha[self.blend_rows, self.blend_cols],
+        )
+
+    def _flat_terms(self):
+        """Flat pixel indices and values of the quad, for compositing whole batches."""
+        if self.flat_terms is None:
+            x, y, _, _ = self.roi
+            frame_width = self.frame_size[0]
+            rows, cols = np.nonzero(self.alpha == 255)
+            self.flat_terms = (
+                (rows + y) * frame_width + (cols + x),
+                self.warped[rows, cols],
+                (self.blend_rows + y) * frame_width + (self.blend_cols + x),
+            )
+        return self.flat_terms
+
+    def apply(self, frame, frame_number=None):
+        """Composite the overlay into a frame in place.
+
+        Args:
+            frame (np.ndarray): A decoded BGR frame.
+            frame_number (int, optional): Unused; the quad does not move by itself.
+
+        Returns:
+            np.ndarray: The same frame, with the overlay applied.
+        """
+        if self.roi is None:
+            return frame
+        roi = frame[self.slices]
+        np.copyto(roi, self.warped, where=self.where)
+        if len(self.blend_rows):
+            background = roi[self.blend_rows, self.blend_cols].astype(np.uint16)
+            background *= self.blend_inverse
+            background += self.blend_foreground
+            background >>= 8
+            roi[self.blend_rows, self.blend_cols] = background
+        return frame
+
+    def apply_batch(self, frames, first_frame_number=None):
+        """Composite the overlay into a stack of frames in place.
+
+        Args:
+            frames (np.ndarray): A contiguous (N, height, width, 3) array of frames.
+            first_frame_number (int, optional): Unused; see apply.
+
+        Returns:
+            np.ndarray: The same array, with the overlay applied to every frame.
+        """
+        if self.roi is None:
+            return frames
+        flat_index, flat_values, blend_index = self._flat_terms()
+        flat = frames.reshape(frames.shape[0], -1, frames.shape[-1])
+        flat[:, flat_index] = flat_values
+        if len(blend_index):
+            background = flat[:, blend_index].astype(np.uint16)
+            background *= self.blend_inverse
+            background += self.blend_foreground
+            background >>= 8
+            flat[:, blend_index] = background
+        return frames
@@ -0,0 +1,363 @@
+"""
+This module keeps the decoded frames of recently rendered sources on disk, so
+that rendering the same upload again maps its frames instead of decoding them.
+
+A source is spilled into the store the first time it is read from start to end.
+Each entry is a raw file of BGR frames with a JSON sidecar holding its
+properties; entries are shared by every process and evicted least recently used
+first once they exceed the disk budget.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+import cv2
+import numpy as np
+
+from ..environ import extract_environment_variable
+
+FRAMES_SUFFIX = ".frames"
+PROPERTIES_SUFFIX = ".json"
+
+
+class StoredFrames:
+    """
+    A read-only stand-in for cv2.VideoCapture over frames in the store.
+
+    Frames are read from a memory map, so a read costs a copy from the page
+    cache instead of a decode. Seeking is exact at every frame.
+
+    Attributes:
+    -----------
+    frames : np.memmap
+        The (frame_count, height, width, 3) frames, or None once released.
+    position : int
+        The frame number the next read returns.
+    """
+
+    def __init__(self, frames, properties):
+        """
+        Args:
+            frames (np.memmap): The mapped frames.
+            properties (dict): The properties stored with the frames.
+        """
+        self.frames = frames
+        self.properties = properties
+        self.position = 0
+
+    def isOpened(self):
+        return self.frames is not None
+
+    def grab(self):
+        if self.frames is None or self.position >= len(self.frames):
+            return False
+        self.position += 1
+        return True
+
+    def read(self, image=None):
+        """Read the next frame, into image if one is given."""
+        if self.frames is None or self.position >= len(self.frames):
+            return False, None
+        frame = self.frames[self.position]
+        self.position += 1
+        # Renderers composite in place, so the mapped pages are never handed out
+        if image is None:
+            return True, np.array(frame)
+        np.copyto(image, frame)
+        return True, image
+
+    def set(self, prop, value):
+        if prop != cv2.CAP_PROP_POS_FRAMES:
+            return False
+        self.position = max(int(value), 0)
+        return True
+
+    def get(self, prop):
+        values = {
+            cv2.CAP_PROP_FRAME_WIDTH: self.properties["width"],
+            cv2.CAP_PROP_FRAME_HEIGHT: self.properties["height"],
+            cv2.CAP_PROP_FPS: self.properties["fps"],
+            cv2.CAP_PROP_FRAME_COUNT: self.properties["frame_count"],
+            cv2.CAP_PROP_POS_FRAMES: self.position,
+        }
+        return float(values.get(prop, 0))
+
+    def release(self):
+        self.frames = None
+
+
+class SpillingCapture:
+    """
+    A cv2.VideoCapture wrapper that copies every decoded frame into the store.
+
+    The entry is only committed when the whole video has been read in order;
+    seeking elsewhere, or releasing the capture early, discards it.
+    """
+
+    def __init__(self, store, key, video_capture, properties):
+        """
+        Args:
+            store (FrameStore): The store to commit the frames to.
+            key (str): The entry key of the source.
+            video_capture (cv2.VideoCapture): The opened source video.
+            properties (dict): The properties returned by open_video.
+        """
+        self.store = store
+        self.key = key
+        self.video_capture = video_capture
+        self.properties = properties
+        self.shape = (properties["height"], properties["width"], 3)
+        self.file = None
+        self.temp_path = None
+        self.frames_written = 0
+        self.spilling = True
+
+    def __getattr__(self, name):
+        return getattr(self.video_capture, name)
+
+    def read(self, image=None):
+        """Read the next frame, into image if one is given, and spill it."""
+        if image is None:
+            ret, frame = self.video_capture.read()
+        else:
+            ret, frame = self.video_capture.read(image)
+        if self.spilling:
+            try:
+                if ret:
+                    self._write(frame)
+                else:
+                    self._commit()
+            except OSError as e:
+                print(f"Could not store the frames of {self.key}: {e}")
+                self._discard()
+        return ret, frame
+
+    def grab(self):
+        self._discard()
+        return self.video_capture.grab()
+
+    def set(self, prop, value):
+        if prop != cv2.CAP_PROP_POS_FRAMES or int(value) != self.frames_written:
+            self._discard()
+        return self.video_capture.set(prop, value)
+
+    def release(self):
+        self._discard()
+        self.video_capture.release()
+
+    def _write(self, frame):
+        if frame.shape != self.shape:
+            self._discard()
+            return
+        if (self.frames_written + 1) * frame.nbytes > self.store.max_bytes:
+            self._discard()
+            return
+        if self.file is None:
+            os.makedirs(self.store.folder, exist_ok=True)
+            descriptor, self.temp_path = tempfile.mkstemp(
+                suffix=".partial", dir=self.store.folder
+            )
+            self.file = os.fdopen(descriptor, "wb")
+        self.file.write(np.ascontiguousarray(frame).data)
+        self.frames_written += 1
+
+    def _commit(self):
+        if self.file is None:
+            self._discard()
+            return
+        self.file.close()
+        self.file = None
+        properties = dict(self.properties, frame_count=self.frames_written)
+        self.store.commit(self.key, self.temp_path, properties)
+        self.temp_path = None
+        self.spilling = False
+
+    def _discard(self):
+        self.spilling = False
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if self.temp_path is not None:
+            try:
+                os.remove(self.temp_path)
+            except OSError:
+                pass
+            self.temp_path = None
+
+
+class FrameStore:
+    """
+    A disk-backed LRU store of decoded source frames.
+
+    Entries are keyed by path, size and modification time, so a replaced upload
+    is never served stale frames. Recency is the modification time of the frames
+    file, which is refreshed on every hit, so it is shared across processes.
+
+    Attributes:
+    -----------
+    folder : str
+        The folder entries are written to.
+    max_bytes : int
+        The disk budget of the store. The store is disabled when zero.
+    hits, misses, evictions : int
+        Counters for monitoring the store in this process.
+    """
+
+    def __init__(self, folder, max_bytes):
+        """
+        Args:
+            folder (str): The folder entries are written to.
+            max_bytes (int): The disk budget of the store in bytes.
+        """
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def key(self, video_path):
+        """Return the entry key of a source video.
+
+        Args:
+            video_path (str): Path to the video file.
+
+        Returns:
+            str: The key, or None if the file cannot be read.
+        """
+        try:
+            stat = os.stat(video_path)
+        except OSError:
+            return None
+        signature = f"{os.path.abspath(video_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+        return hashlib.sha256(signature.encode("utf-8")).hexdigest()
+
+    def _paths(self, key):
+        base = os.path.join(self.folder, key)
+        return base + FRAMES_SUFFIX, base + PROPERTIES_SUFFIX
+
+    def open(self, video_path):
+        """Open the stored frames of a source video.
+
+        Args:
+            video_path (str): Path to the video file.
+
+        Returns:
+            tuple: A StoredFrames capture and its properties, or (None, None) if
+            the source is not in the store.
+        """
+        key = self.key(video_path) if self.enabled else None
+        if key is None:
+            return None, None
+        frames_path, properties_path = self._paths(key)
+        try:
+            with open(properties_path, encoding="utf-8") as properties_file:
+                properties = json.load(properties_file)
+            shape = (
+                properties["frame_count"],
+                properties["height"],
+                properties["width"],
+                3,
+            )
+            frames = np.memmap(frames_path, dtype=np.uint8, mode="r", shape=shape)
+            os.utime(frames_path)
+        except (OSError, ValueError, KeyError):
+            with self.lock:
+                self.misses += 1
+            return None, None
+        with self.lock:
+            self.hits += 1
+        return StoredFrames(frames, properties), properties
+
+    def spill(self, video_path, video_capture, properties):
+        """Wrap a capture so that reading the whole video stores its frames.
+
+        Args:
+            video_path (str): Path to the video file.
+            video_capture (cv2.VideoCapture): The opened video.
+            properties (dict): The properties returned by open_video.
+
+        Returns:
+            The wrapped capture, or video_capture itself if the store is disabled
+            or the video is larger than the whole budget.
+        """
+        frame_bytes = properties["width"] * properties["height"] * 3
+        key = self.key(video_path) if self.enabled else None
+        if key is None or properties["frame_count"] * frame_bytes > self.max_bytes:
+            return video_capture
+        return SpillingCapture(self, key, video_capture, properties)
+
+    def commit(self, key, temp_path, properties):
+        """Move fully written frames into the store and enforce the budget.
+
+        Args:
+            key (str): The entry key of the source.
+            temp_path (str): The file the frames were written to.
+            properties (dict): The properties of the frames.
+        """
+        frames_path, properties_path = self._paths(key)
+        # Readers need the sidecar before the frames file appears
+        with open(properties_path, "w", encoding="utf-8") as properties_file:
+            json.dump(properties, properties_file)
+        os.replace(temp_path, frames_path)
+        self.evict(keep=frames_path)
+
+    def evict(self, keep=None):
+        """Remove least recently used entries until the store fits its budget.
+
+        Files still mapped by a render stay readable until it releases them.
+
+        Args:
+            keep (str, optional): A frames file that must not be evicted.
+        """
+        entries = []
+        for name in os.listdir(self.folder):
+            if not name.endswith(FRAMES_SUFFIX):
+                continue
+            path = os.path.join(self.folder, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        size = sum(entry_size for _, entry_size, _ in entries)
+        for _, entry_size, path in entries:
+            if size <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            for stale in (path, path[: -len(FRAMES_SUFFIX)] + PROPERTIES_SUFFIX):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+            size -= entry_size
+            with self.lock:
+                self.evictions += 1
+
+    def stats(self):
+        """Return the store counters.
+
+        Returns:
+            dict: The hits, misses and evictions of this process.
+        """
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+frame_store = FrameStore(
+    extract_environment_variable("FRAME_STORE_FOLDER", "frame_store"),
+    int(extract_environment_variable("FRAME_STORE_BYTES", "0")),
+)
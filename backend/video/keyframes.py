@@ -0,0 +1,152 @@
+"""
+This module interpolates a placement between keyframed quads, so that slowly
+moving surfaces can be covered without running a tracker.
+
+The corner points and homographies for every frame are computed up front as
+vectorised arrays, so the render loop does no solving of its own.
+"""
+
+import numpy as np
+
+from .compositor import QuadCompositor
+
+
+def interpolate_quads(keyframe_numbers, keyframe_quads, frame_numbers):
+    """Linearly interpolate quad corners between keyframes.
+
+    Args:
+        keyframe_numbers (np.ndarray): The (K,) non-decreasing frame numbers of
+            the keyframes.
+        keyframe_quads (np.ndarray): The (K, 4, 2) quads at those frames. Of
+            several keyframes on one frame, the last one is used.
+        frame_numbers (np.ndarray): The (F,) frame numbers to interpolate at.
+            Frames outside the keyframes are clamped to the first or last quad.
+
+    Returns:
+        np.ndarray: The (F, 4, 2) float32 quads.
+    """
+    keyframe_numbers = np.asarray(keyframe_numbers, dtype=np.float64)
+    keyframe_quads = np.asarray(keyframe_quads, dtype=np.float64)
+    # Keyframes whose times round to the same frame would give a zero span
+    last = np.append(keyframe_numbers[1:] != keyframe_numbers[:-1], True)
+    keyframe_numbers, keyframe_quads = keyframe_numbers[last], keyframe_quads[last]
+    if len(keyframe_numbers) == 1:
+        return np.repeat(keyframe_quads, len(frame_numbers), axis=0).astype(np.float32)
+    frame_numbers = np.clip(frame_numbers, keyframe_numbers[0], keyframe_numbers[-1])
+    upper = np.clip(
+        np.searchsorted(keyframe_numbers, frame_numbers, side="right"),
+        1,
+        len(keyframe_numbers) - 1,
+    )
+    lower = upper - 1
+    span = keyframe_numbers[upper] - keyframe_numbers[lower]
+    weight = ((frame_numbers - keyframe_numbers[lower]) / span)[:, None, None]
+    quads = keyframe_quads[lower] * (1 - weight) + keyframe_quads[upper] * weight
+    return quads.astype(np.float32)
+
+
+def perspective_transforms(source, quads):
+    """Solve the homographies from one source quad to many destination quads.
+
+    This is the batched equivalent of calling cv2.getPerspectiveTransform once per
+    destination quad.
+
+    Args:
+        source (np.ndarray): The (4, 2) source corners.
+        quads (np.ndarray): The (F, 4, 2) destination quads.
+
+    Returns:
+        np.ndarray: The (F, 3, 3) homographies.
+    """
+    source = np.asarray(source, dtype=np.float64)
+    quads = np.asarray(quads, dtype=np.float64)
+    count = len(quads)
+    x, y = source[:, 0], source[:, 1]
+    u, v = quads[..., 0], quads[..., 1]
+
+    system = np.zeros((count, 8, 8))
+    system[:, 0::2, 0] = x
+    system[:, 0::2, 1] = y
+    system[:, 0::2, 2] = 1
+    system[:, 1::2, 3] = x
+    system[:, 1::2, 4] = y
+    system[:, 1::2, 5] = 1
+    system[:, 0::2, 6] = -u * x
+    system[:, 0::2, 7] = -u * y
+    system[:, 1::2, 6] = -v * x
+    system[:, 1::2, 7] = -v * y
+    target = np.empty((count, 8))
+    target[:, 0::2] = u
+    target[:, 1::2] = v
+
+    solution = np.linalg.solve(system, target[..., None])[..., 0]
+    return np.concatenate([solution, np.ones((count, 1))], axis=1).reshape(-1, 3, 3)
+
+
+class KeyframedCompositor:
+    """
+    A compositor that moves its quad between keyframes.
+
+    The interpolated quads and their homographies are precomputed for every frame
+    between the first and the last keyframe; each frame only re-warps the ROI.
+    """
+
+    def __init__(self, image, keyframes, frame_size, image_path=None):
+        """
+        Args:
+            image (np.ndarray): The BGR or BGRA overlay image to place.
+            keyframes (list): (frame_number, points) pairs ordered by frame number,
+                where points are four (x, y) tuples.
+            frame_size (tuple): The (width, height) of the video frames.
+            image_path (str, optional): The path the image was loaded from.
+        """
+        keyframe_numbers = [frame_number for frame_number, _ in keyframes]
+        keyframe_quads = np.array([points for _, points in keyframes], dtype=np.float32)
+        self.first_frame = keyframe_numbers[0]
+        self.quads = interpolate_quads(
+            keyframe_numbers,
+            keyframe_quads,
+            np.arange(keyframe_numbers[0], keyframe_numbers[-1] + 1),
+        )
+        # Start at the interpolated first quad, which is the last of several
+        # keyframes on the first frame
+        self.compositor = QuadCompositor(
+            image, self.quads[0], frame_size, image_path=image_path
+        )
+        self.matrices = perspective_transforms(self.compositor.corners, self.quads)
+        self.current = 0
+
+    @property
+    def warp_sec(self):
+        """The total time spent moving the quad."""
+        return self.compositor.warp_sec
+
+    def apply(self, frame, frame_number=None):
+        """Move the quad to a frame's position and composite the overlay in place.
+
+        Args:
+            frame (np.ndarray): A decoded BGR frame.
+            frame_number (int): The zero-based frame number.
+
+        Returns:
+            np.ndarray: The same frame, with the overlay applied.
+        """
+        index = min(max(frame_number - self.first_frame, 0), len(self.quads) - 1)
+        if index != self.current:
+            self.compositor.set_quad(self.quads[index], self.matrices[index])
+            self.current = index
+        return self.compositor.apply(frame)
+
+    def apply_batch(self, frames, first_frame_number=None):
+        """Composite a stack of consecutive frames in place.
+
+        Args:
+            frames (np.ndarray): A (N, height, width, 3) array of frames.
+            first_frame_number (int): The frame number of frames[0].
+
+        Returns:
+            np.ndarray: The same array, with the overlay applied to every frame.
+        """
+        for offset, frame in enumerate(frames):
+            self.apply(frame, first_frame_number + offset)
+        return frames
@@ -0,0 +1,159 @@
+"""
+This module runs the decode, composite and encode stages of a render on separate
+threads connected by bounded queues.
+
+OpenCV releases the GIL while decoding, warping and encoding, so the three stages
+overlap on multi-core machines. Frames are decoded into a fixed ring of reusable
+buffers, which keeps memory flat for the whole render.
+"""
+
+import queue
+import threading
+
+import numpy as np
+
+from .telemetry import RenderTelemetry
+
+_STOP = object()
+
+
+class FrameRing:
+    """
+    A fixed pool of preallocated frame buffers.
+
+    Buffers are handed to the decoder with acquire and returned by the encoder
+    with release once the frame has been written, so the ring size bounds the
+    number of frames in flight.
+    """
+
+    def __init__(self, shape, size):
+        """
+        Args:
+            shape (tuple): The (height, width, channels) of a decoded frame.
+            size (int): The number of buffers in the ring.
+        """
+        self.free = queue.Queue()
+        for _ in range(size):
+            self.free.put(np.empty(shape, dtype=np.uint8))
+
+    def acquire(self):
+        """Take a free buffer, blocking until one is released."""
+        return self.free.get()
+
+    def release(self, buffer):
+        """Return a buffer to the ring."""
+        self.free.put(buffer)
+
+
+class RenderPipeline:
+    """
+    A decoder, compositor and encoder running as three worker threads.
+
+    Attributes:
+    -----------
+    frames_written : int
+        The number of frames the encoder has written so far.
+    """
+
+    def __init__(
+        self,
+        video_capture,
+        video_writer,
+        schedule,
+        properties,
+        ring_size=8,
+        telemetry=None,
+    ):
+        """
+        Args:
+            video_capture (cv2.VideoCapture): The opened source video.
+            video_writer (cv2.VideoWriter): The writer for the output video.
+            schedule (PlacementSchedule): The placements to apply.
+            properties (dict): The video properties returned by open_video.
+            ring_size (int): The number of reusable frame buffers.
+            telemetry (RenderTelemetry, optional): Receives progress and stage
+                times; the encoder reports every frame it writes.
+        """
+        self.video_capture = video_capture
+        self.video_writer = video_writer
+        self.schedule = schedule
+        self.properties = properties
+        self.ring = FrameRing((properties["height"], properties["width"], 3), ring_size)
+        # Half the ring per queue leaves buffers free for the decoder to work ahead
+        depth = max(ring_size // 2, 1)
+        self.decoded = queue.Queue(maxsize=depth)
+        self.composited = queue.Queue(maxsize=depth)
+        self.failed = threading.Event()
+        self.errors = []
+        self.frames_written = 0
+        self.telemetry = telemetry or RenderTelemetry()
+
+    def run(self):
+        """Render the whole video and wait for every stage to finish.
+
+        Raises:
+            Exception: The first error raised by any of the stages.
+        """
+        self.telemetry.start(self.properties["frame_count"], self.schedule)
+        workers = [
+            threading.Thread(target=self._decode, name="render-decoder"),
+            threading.Thread(target=self._composite, name="render-compositor"),
+            threading.Thread(target=self._encode, name="render-encoder"),
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        if self.errors:
+            raise self.errors[0]
+
+    def _fail(self, error):
+        self.errors.append(error)
+        self.failed.set()
+
+    def _decode(self):
+        frame_number = 0
+        try:
+            while not self.failed.is_set():
+                buffer = self.ring.acquire()
+                with self.telemetry.stage("decode"):
+                    ret, frame = self.video_capture.read(buffer)
+                if not ret:
+                    self.ring.release(buffer)
+                    break
+                self.decoded.put((frame_number, frame, buffer))
+                frame_number += 1
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self.decoded.put(_STOP)
+
+    def _composite(self):
+        while (item := self.decoded.get()) is not _STOP:
+            frame_number, frame, buffer = item
+            if self.failed.is_set():
+                # Keep draining so the decoder gets its buffers back
+                self.ring.release(buffer)
+                continue
+            try:
+                with self.telemetry.composite():
+                    self.schedule.apply(frame, frame_number)
+                self.composited.put(item)
+            except Exception as e:
+                self.ring.release(buffer)
+                self._fail(e)
+        self.composited.put(_STOP)
+
+    def _encode(self):
+        while (item := self.composited.get()) is not _STOP:
+            _, frame, buffer = item
+            try:
+                if not self.failed.is_set():
+                    with self.telemetry.stage("encode"):
+                        self.video_writer.write(frame)
+                    self.frames_written += 1
+                    self.telemetry.report(self.frames_written)
+            except Exception as e:
+                self._fail(e)
+            finally:
+                self.ring.release(buffer)
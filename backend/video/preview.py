@@ -0,0 +1,199 @@
+"""
+This module renders quick placement previews by seeking straight to the requested
+times instead of decoding the whole video.
+"""
+
+import cv2
+
+from .assets import overlay_cache
+from .probe import keyframe_before
+from .render import open_video
+from .schedule import Placement, PlacementSchedule
+
+# Reading forward is cheaper than a seek when the target is this close
+MAX_READ_AHEAD_FRAMES = 30
+
+
+def static_placements(placements):
+    """Return copies of placements with tracking turned off.
+
+    Previews only see a few isolated frames, so a tracker has nothing to follow;
+    tracked placements are shown at the quad the user drew.
+
+    Args:
+        placements (list): The Placement objects of the request.
+
+    Returns:
+        list: Placements that can be applied to any frame in any order.
+    """
+    return [
+        Placement(
+            placement.points,
+            placement.start_time_sec,
+            placement.end_time_sec,
+            keyframes=placement.keyframes,
+        )
+        for placement in placements
+    ]
+
+
+def downscale(frame, max_width):
+    """Shrink a frame to a maximum width, keeping its aspect ratio.
+
+    Args:
+        frame (np.ndarray): The frame to shrink.
+        max_width (int): The maximum width in pixels.
+
+    Returns:
+        np.ndarray: The resized frame, or the same frame if it is narrow enough.
+    """
+    height, width = frame.shape[:2]
+    if width <= max_width:
+        return frame
+    size = (max_width, max(int(round(height * max_width / width)), 1))
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+
+def seek(video_capture, position, target, keyframes=()):
+    """Move a capture so that the next read returns a given frame.
+
+    When the keyframes are known, the capture is moved to the last keyframe
+    before the target and the frames in between are skipped with grab, since
+    backends only seek precisely to keyframes.
+
+    Args:
+        video_capture (cv2.VideoCapture): The opened video.
+        position (int): The frame number the next read would currently return.
+        target (int): The frame number to read next.
+        keyframes (list): Increasing keyframe frame numbers, if known.
+    """
+    keyframe = keyframe_before(keyframes, target)
+    if 0 <= target - position <= MAX_READ_AHEAD_FRAMES:
+        start = position
+    elif keyframe is None:
+        video_capture.set(cv2.CAP_PROP_POS_FRAMES, target)
+        return
+    elif keyframe <= position <= target:
+        # Decoding on from here is no slower than from the keyframe
+        start = position
+    else:
+        video_capture.set(cv2.CAP_PROP_POS_FRAMES, keyframe)
+        start = keyframe
+    for _ in range(target - start):
+        video_capture.grab()
+
+
+def render_preview_frames(
+    video_path, image_path, placements, times, max_width=640, quality=80, probe=None
+):
+    """Composite the placements into a few frames and encode them as JPEG.
+
+    Args:
+        video_path (str): Path to the input video file.
+        image_path (str): Path to the overlay image file.
+        placements (list): The Placement objects to apply.
+        times (list): The times in seconds of the frames to render.
+        max_width (int): The maximum width of the stills.
+        quality (int): The JPEG quality, from 0 to 100.
+        probe (dict, optional): The stored result of probe_video.
+
+    Returns:
+        list: (time_sec, jpeg_bytes) pairs ordered by time, or None if the video or
+        the overlay could not be read. Times past the end of the video are skipped.
+    """
+    video_capture, properties = open_video(video_path, probe, spill=False)
+    if video_capture is None:
+        return None
+    image = overlay_cache.get(image_path)
+    if image is None:
+        video_capture.release()
+        return None
+    schedule = PlacementSchedule.build(
+        static_placements(placements), image, properties, image_path=image_path
+    )
+
+    stills = []
+    position = 0
+    try:
+        for time_sec in sorted(times):
+            frame_number = int(time_sec * properties["fps"])
+            seek(video_capture, position, frame_number, properties["keyframes"])
+            ret, frame = video_capture.read()
+            if not ret:
+                break
+            position = frame_number + 1
+            schedule.apply(frame, frame_number)
+            ok, encoded = cv2.imencode(
+                ".jpg",
+                downscale(frame, max_width),
+                [cv2.IMWRITE_JPEG_QUALITY, quality],
+            )
+            if ok:
+                stills.append((time_sec, encoded.tobytes()))
+    finally:
+        video_capture.release()
+    return stills
+
+
+def render_preview_clip(
+    video_path,
+    image_path,
+    output_path,
+    placements,
+    start_time_sec,
+    duration_sec,
+    max_width=480,
+    probe=None,
+):
+    """Render a short, low-resolution clip starting at a given time.
+
+    Args:
+        video_path (str): Path to the input video file.
+        image_path (str): Path to the overlay image file.
+        output_path (str): Path for saving the clip.
+        placements (list): The Placement objects to apply.
+        start_time_sec (float): The time in seconds the clip starts at.
+        duration_sec (float): The length of the clip in seconds.
+        max_width (int): The maximum width of the clip.
+        probe (dict, optional): The stored result of probe_video.
+
+    Returns:
+        bool: True if a clip was written, False if the video or the overlay could
+        not be read.
+    """
+    video_capture, properties = open_video(video_path, probe, spill=False)
+    if video_capture is None:
+        return False
+    image = overlay_cache.get(image_path)
+    if image is None:
+        video_capture.release()
+        return False
+    schedule = PlacementSchedule.build(
+        static_placements(placements), image, properties, image_path=image_path
+    )
+
+    fps = properties["fps"]
+    start_frame = int(start_time_sec * fps)
+    stop_frame = start_frame + max(int(duration_sec * fps), 1)
+    scale = min(max_width / properties["width"], 1)
+    size = (
+        max(int(round(properties["width"] * scale)), 1),
+        max(int(round(properties["height"] * scale)), 1),
+    )
+    video_writer = cv2.VideoWriter(
+        output_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size
+    )
+    seek(video_capture, 0, start_frame, properties["keyframes"])
+    try:
+        for frame_number in range(start_frame, stop_frame):
+            ret, frame = video_capture.read()
+            if not ret:
+                break
+            schedule.apply(frame, frame_number)
+            if size != (properties["width"], properties["height"]):
+                frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+            video_writer.write(frame)
+    finally:
+        video_capture.release()
+        video_writer.release()
+    return True
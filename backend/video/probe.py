@@ -0,0 +1,175 @@
+"""
+This module probes a video once for the metadata the renderers need: exact
+rational frame rate, duration, dimensions, frame count and the positions of its
+keyframes.
+
+ffprobe is used when it is installed, since it reads the container without
+decoding. Otherwise OpenCV's estimates are used and no keyframes are indexed.
+"""
+
+import json
+import shutil
+import subprocess
+from bisect import bisect_right
+from fractions import Fraction
+
+import cv2
+
+
+def parse_rate(rate):
+    """Parse an ffprobe frame rate such as "30000/1001".
+
+    Args:
+        rate (str): The rate reported by ffprobe.
+
+    Returns:
+        Fraction: The rate, or None if it is missing or zero.
+    """
+    try:
+        value = Fraction(rate)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    return value or None
+
+
+def probe_with_ffprobe(ffprobe, video_path):
+    """Probe a video's first video stream with ffprobe.
+
+    Packets are listed without being decoded; ordering their timestamps gives
+    each keyframe's frame number in presentation order.
+
+    Args:
+        ffprobe (str): Path to the ffprobe executable.
+        video_path (str): Path to the video file.
+
+    Returns:
+        dict: See probe_video, or None if ffprobe fails.
+    """
+    result = subprocess.run(
+        [ffprobe, "-v", "error", "-select_streams", "v:0", "-of", "json"]
+        + [
+            "-show_entries",
+            "stream=width,height,r_frame_rate,avg_frame_rate"
+            ":format=duration:packet=pts_time,flags",
+            video_path,
+        ],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        return None
+    output = json.loads(result.stdout)
+    if not output.get("streams"):
+        return None
+    stream = output["streams"][0]
+    fps = parse_rate(stream.get("avg_frame_rate")) or parse_rate(
+        stream.get("r_frame_rate")
+    )
+    packets = [
+        (float(packet["pts_time"]), "K" in packet.get("flags", ""))
+        for packet in output.get("packets", [])
+        if packet.get("pts_time") not in (None, "N/A")
+    ]
+    packets.sort()
+    if fps is None or not packets:
+        return None
+    first_time = packets[0][0]
+    duration = output.get("format", {}).get("duration")
+    return {
+        "width": int(stream["width"]),
+        "height": int(stream["height"]),
+        "fps_num": fps.numerator,
+        "fps_den": fps.denominator,
+        "duration_sec": float(duration) if duration else len(packets) / float(fps),
+        "frame_count": len(packets),
+        "keyframes": [
+            [frame_number, round(time_sec - first_time, 6)]
+            for frame_number, (time_sec, keyframe) in enumerate(packets)
+            if keyframe
+        ],
+    }
+
+
+def probe_with_opencv(video_path):
+    """Probe a video with OpenCV's container estimates.
+
+    Args:
+        video_path (str): Path to the video file.
+
+    Returns:
+        dict: See probe_video, without keyframes, or None if the video cannot be
+        opened.
+    """
+    video_capture = cv2.VideoCapture(video_path)
+    if not video_capture.isOpened():
+        return None
+    try:
+        # OpenCV reports 29.97 as a float; NTSC rates have a denominator of 1001
+        fps = Fraction(video_capture.get(cv2.CAP_PROP_FPS)).limit_denominator(1001)
+        frame_count = int(video_capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        return {
+            "width": int(video_capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(video_capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "fps_num": fps.numerator,
+            "fps_den": fps.denominator,
+            "duration_sec": frame_count / float(fps) if fps else 0.0,
+            "frame_count": frame_count,
+            "keyframes": [],
+        }
+    finally:
+        video_capture.release()
+
+
+def probe_video(video_path):
+    """Probe a video's metadata and keyframe index.
+
+    Args:
+        video_path (str): Path to the video file.
+
+    Returns:
+        dict: width, height, fps_num and fps_den, duration_sec, frame_count and
+        keyframes, a list of [frame_number, time_sec] pairs in frame order, or
+        None if the video cannot be read.
+    """
+    ffprobe = shutil.which("ffprobe")
+    if ffprobe:
+        try:
+            probe = probe_with_ffprobe(ffprobe, video_path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"ffprobe failed for {video_path}: {e}")
+            probe = None
+        if probe is not None:
+            return probe
+    return probe_with_opencv(video_path)
+
+
+def probe_properties(probe):
+    """Convert a probe into the video properties used by the renderers.
+
+    Args:
+        probe (dict): The result of probe_video.
+
+    Returns:
+        dict: The width, height, exact fps, frame count and keyframe numbers.
+    """
+    return {
+        "width": probe["width"],
+        "height": probe["height"],
+        "fps": probe["fps_num"] / probe["fps_den"],
+        "frame_count": probe["frame_count"],
+        "keyframes": [frame_number for frame_number, _ in probe["keyframes"]],
+    }
+
+
+def keyframe_before(keyframes, frame_number):
+    """Find the last keyframe at or before a frame.
+
+    Args:
+        keyframes (list): Increasing keyframe frame numbers.
+        frame_number (int): The target frame.
+
+    Returns:
+        int: The keyframe's frame number, or None if there is none.
+    """
+    index = bisect_right(keyframes, frame_number) - 1
+    return keyframes[index] if index >= 0 else None
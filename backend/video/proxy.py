@@ -0,0 +1,122 @@
+"""
+This module generates lightweight derivatives of an uploaded video: a
+low-resolution proxy, a thumbnail strip and a poster frame.
+
+All three come out of a single decode pass over the source.
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+from .render import open_video
+
+
+def proxy_size(width, height, max_width):
+    """Compute the proxy dimensions for a source video.
+
+    Args:
+        width (int): The source width.
+        height (int): The source height.
+        max_width (int): The maximum proxy width.
+
+    Returns:
+        tuple: The (width, height) of the proxy, both even as most codecs require.
+    """
+    scale = min(max_width / width, 1)
+    proxy_width = max(int(round(width * scale / 2)) * 2, 2)
+    proxy_height = max(int(round(height * scale / 2)) * 2, 2)
+    return proxy_width, proxy_height
+
+
+def generate_proxies(
+    video_path,
+    output_folder,
+    basename,
+    max_width=640,
+    thumbnail_count=10,
+    thumbnail_height=90,
+    poster_position=0.1,
+):
+    """Create the proxy video, thumbnail strip and poster frame of an upload.
+
+    Args:
+        video_path (str): Path to the uploaded video file.
+        output_folder (str): The folder to write the derivatives to.
+        basename (str): The file name prefix of the derivatives.
+        max_width (int): The maximum width of the proxy video.
+        thumbnail_count (int): The number of evenly spaced thumbnails in the strip.
+        thumbnail_height (int): The height of each thumbnail.
+        poster_position (float): Where the poster frame is taken, as a fraction of
+            the video's length.
+
+    Returns:
+        dict: The derivative file names, the source and proxy dimensions and the
+        exact scale factors mapping proxy coordinates to source pixels, or None
+        if the video cannot be read.
+    """
+    video_capture, properties = open_video(video_path)
+    if video_capture is None:
+        return None
+    width, height = properties["width"], properties["height"]
+    frame_count = max(properties["frame_count"], 1)
+    size = proxy_size(width, height, max_width)
+    thumbnail_size = (
+        max(int(round(width * thumbnail_height / height)), 1),
+        thumbnail_height,
+    )
+    thumbnail_frames = {
+        frame_count * index // thumbnail_count: index
+        for index in range(thumbnail_count)
+    }
+    poster_frame = int(frame_count * poster_position)
+
+    names = {
+        "proxy_path": f"{basename}_proxy.mp4",
+        "thumbnails_path": f"{basename}_thumbnails.jpg",
+        "poster_path": f"{basename}_poster.jpg",
+    }
+    video_writer = cv2.VideoWriter(
+        os.path.join(output_folder, names["proxy_path"]),
+        cv2.VideoWriter_fourcc(*"mp4v"),
+        properties["fps"],
+        size,
+    )
+    strip = np.zeros(
+        (thumbnail_height, thumbnail_size[0] * thumbnail_count, 3), dtype=np.uint8
+    )
+    poster = None
+
+    frame_number = 0
+    try:
+        while True:
+            ret, frame = video_capture.read()
+            if not ret:
+                break
+            video_writer.write(cv2.resize(frame, size, interpolation=cv2.INTER_AREA))
+            if frame_number in thumbnail_frames:
+                offset = thumbnail_frames[frame_number] * thumbnail_size[0]
+                strip[:, offset : offset + thumbnail_size[0]] = cv2.resize(
+                    frame, thumbnail_size, interpolation=cv2.INTER_AREA
+                )
+            if frame_number <= poster_frame:
+                # read() allocates a new frame every time, so no copy is needed
+                poster = frame
+            frame_number += 1
+    finally:
+        video_capture.release()
+        video_writer.release()
+
+    if poster is not None:
+        cv2.imwrite(os.path.join(output_folder, names["poster_path"]), poster)
+    cv2.imwrite(os.path.join(output_folder, names["thumbnails_path"]), strip)
+    return {
+        **names,
+        "source_width": width,
+        "source_height": height,
+        "proxy_width": size[0],
+        "proxy_height": size[1],
+        "scale_x": width / size[0],
+        "scale_y": height / size[1],
+    }
@@ -0,0 +1,264 @@
+"""
+This module renders videos by running decoded frames through a compositor.
+"""
+
+import cv2
+import numpy as np
+
+from .assets import overlay_cache
+from .frame_store import frame_store
+from .pipeline import RenderPipeline
+from .probe import probe_properties
+from .schedule import Placement, PlacementSchedule
+from .telemetry import RenderTelemetry
+
+FRAME_BACKEND = "frame"
+BATCH_BACKEND = "batch"
+VIDEO_CODEC = "mp4v"
+
+
+def open_video(video_path, probe=None, spill=True):
+    """Open a video and read its basic properties.
+
+    When the frame store holds the decoded frames of the video, they are read
+    from there instead. Otherwise the capture stores the frames as they are
+    decoded, provided the whole video is read.
+
+    Args:
+        video_path (str): Path to the input video file.
+        probe (dict, optional): The stored result of probe_video. Its exact frame
+            rate, frame count and keyframes replace OpenCV's estimates; the frame
+            size is always the decoder's.
+        spill (bool): Whether a miss stores the decoded frames. Readers that seek
+            or stop early pass False, since they could never complete the entry.
+
+    Returns:
+        tuple: The opened cv2.VideoCapture, or a capture over stored frames, and a
+        dict with the frame width, height, fps, frame count and keyframe numbers
+        (empty when the video has not been probed), or (None, None) if the video
+        cannot be opened.
+    """
+    video_capture, properties = frame_store.open(video_path)
+    if video_capture is not None:
+        if probe is not None:
+            # Keep the exact rate, but the stored frames are the ones to count
+            properties = dict(
+                probe_properties(probe),
+                width=properties["width"],
+                height=properties["height"],
+                frame_count=properties["frame_count"],
+            )
+        return video_capture, properties
+
+    video_capture, properties = open_capture(video_path, probe)
+    if video_capture is None or not spill:
+        return video_capture, properties
+    return frame_store.spill(video_path, video_capture, properties), properties
+
+
+def open_capture(video_path, probe=None):
+    """Open a video with OpenCV alone, bypassing the frame store.
+
+    Readers of part of a video use this, since they could never complete an
+    entry in the store.
+
+    Args:
+        video_path (str): Path to the input video file.
+        probe (dict, optional): The stored result of probe_video.
+
+    Returns:
+        tuple: The opened cv2.VideoCapture and the same properties as open_video,
+        or (None, None) if the video cannot be opened.
+    """
+    video_capture = cv2.VideoCapture(video_path)
+    if not video_capture.isOpened():
+        return None, None
+    properties = {
+        "width": int(video_capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        "height": int(video_capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        "fps": video_capture.get(cv2.CAP_PROP_FPS),
+        "frame_count": int(video_capture.get(cv2.CAP_PROP_FRAME_COUNT)),
+        "keyframes": [],
+    }
+    if probe is not None:
+        # The frame size is the decoder's, which applies rotation and cropping
+        # that the stream header does not
+        properties = dict(
+            probe_properties(probe),
+            width=properties["width"],
+            height=properties["height"],
+        )
+    return video_capture, properties
+
+
+def create_video_writer(output_path, properties):
+    """Create a video writer matching the properties of a source video.
+
+    Args:
+        output_path (str): Path for saving the output video.
+        properties (dict): The properties returned by open_video.
+
+    Returns:
+        cv2.VideoWriter: The writer for the output video.
+    """
+    codec = cv2.VideoWriter_fourcc(*VIDEO_CODEC)  # Codec for .mp4 output
+    return cv2.VideoWriter(
+        output_path,
+        codec,
+        properties["fps"],
+        (properties["width"], properties["height"]),
+    )
+
+
+def render_serial(video_capture, video_writer, schedule, properties, telemetry=None):
+    """Decode, composite and encode every frame on the calling thread.
+
+    Args:
+        video_capture (cv2.VideoCapture): The opened source video.
+        video_writer (cv2.VideoWriter): The writer for the output video.
+        schedule (PlacementSchedule): The placements to apply.
+        properties (dict): The video properties returned by open_video.
+        telemetry (RenderTelemetry, optional): Receives progress and stage times.
+    """
+    telemetry = telemetry or RenderTelemetry()
+    telemetry.start(properties["frame_count"], schedule)
+    frame_number = 0
+    while video_capture.isOpened():
+        with telemetry.stage("decode"):
+            ret, frame = video_capture.read()
+        if not ret:
+            break
+
+        with telemetry.composite():
+            schedule.apply(frame, frame_number)
+        with telemetry.stage("encode"):
+            video_writer.write(frame)
+
+        frame_number += 1
+        telemetry.report(frame_number)
+
+
+def render_batched(
+    video_capture, video_writer, schedule, properties, batch_size=16, telemetry=None
+):
+    """Decode frames into a contiguous batch and composite the whole batch at once.
+
+    Args:
+        video_capture (cv2.VideoCapture): The opened source video.
+        video_writer (cv2.VideoWriter): The writer for the output video.
+        schedule (PlacementSchedule): The placements to apply.
+        properties (dict): The video properties returned by open_video.
+        batch_size (int): The number of frames composited together.
+        telemetry (RenderTelemetry, optional): Receives progress and stage times.
+    """
+    telemetry = telemetry or RenderTelemetry()
+    telemetry.start(properties["frame_count"], schedule)
+    batch = np.empty(
+        (batch_size, properties["height"], properties["width"], 3), dtype=np.uint8
+    )
+    frame_number = 0
+    while True:
+        decoded = 0
+        with telemetry.stage("decode"):
+            while decoded < batch_size:
+                ret, frame = video_capture.read(batch[decoded])
+                if not ret:
+                    break
+                if not np.shares_memory(frame, batch):
+                    batch[decoded] = frame
+                decoded += 1
+        if decoded == 0:
+            break
+
+        with telemetry.composite():
+            schedule.apply_batch(batch[:decoded], frame_number)
+        with telemetry.stage("encode"):
+            for index in range(decoded):
+                video_writer.write(batch[index])
+
+        frame_number += decoded
+        telemetry.report(frame_number)
+        if decoded < batch_size:
+            break
+
+
+def render_placements(
+    video_path,
+    image_path,
+    output_path,
+    placements,
+    pipelined=True,
+    backend=FRAME_BACKEND,
+    telemetry=None,
+    probe=None,
+):
+    """Render every placement of a schedule in a single decode/encode pass.
+
+    Args:
+        video_path (str): Path to the input video file.
+        image_path (str): Path to the overlay image file.
+        output_path (str): Path for saving the output video.
+        placements (list): The Placement objects to apply.
+        pipelined (bool): Whether to run decoding, compositing and encoding on
+            separate threads instead of serially. Only used by the frame backend.
+        backend (str): FRAME_BACKEND to composite frame by frame over the ROI, or
+            BATCH_BACKEND to composite stacks of frames with one NumPy kernel.
+        telemetry (RenderTelemetry, optional): Receives progress and stage times
+            as frames are written.
+        probe (dict, optional): The stored result of probe_video.
+
+    Returns:
+        bool: True if the video was rendered, False if the video or the overlay
+        could not be read.
+    """
+    video_capture, properties = open_video(video_path, probe)
+    if video_capture is None:
+        return False
+    image = overlay_cache.get(image_path)
+    if image is None:
+        video_capture.release()
+        return False
+
+    # The warps and masks never change, so they are computed once for the job
+    schedule = PlacementSchedule.build(
+        placements, image, properties, image_path=image_path
+    )
+    video_writer = create_video_writer(output_path, properties)
+    try:
+        if backend == BATCH_BACKEND:
+            render_batched(
+                video_capture, video_writer, schedule, properties, telemetry=telemetry
+            )
+        elif pipelined:
+            RenderPipeline(
+                video_capture, video_writer, schedule, properties, telemetry=telemetry
+            ).run()
+        else:
+            render_serial(
+                video_capture, video_writer, schedule, properties, telemetry=telemetry
+            )
+    finally:
+        # Release resources
+        video_capture.release()
+        video_writer.release()
+    return True
+
+
+def replace_pixels_in_quadrilateral(
+    video_path, image_path, output_path, points, start_time_sec
+):
+    """
+    Replaces pixels in a specific quadrilateral region of each video frame with a resized target image,
+    starting from a specified timestamp.
+
+    Parameters:
+    - video_path: Path to the input video file.
+    - image_path: Path to the target image file.
+    - output_path: Path for saving the output video.
+    - points: A list of four (x, y) tuples representing the vertices of the quadrilateral
+            (top-left, top-right, bottom-right, bottom-left).
+    - start_time_sec: Time in seconds after which the image placement should start.
+    """
+    render_placements(
+        video_path, image_path, output_path, [Placement(points, start_time_sec)]
+    )
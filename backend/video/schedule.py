@@ -0,0 +1,346 @@
+"""
+This module defines placement schedules, which decide which overlays are applied to
+each frame of a video.
+"""
+
+from bisect import bisect_right
+
+from .compositor import QuadCompositor
+from .keyframes import KeyframedCompositor
+from .tracking import TrackedCompositor, TrackedQuads
+
+
+class Placement:
+    """
+    A quadrilateral placement that is active between two timestamps.
+
+    Attributes:
+    -----------
+    points : list
+        Four (x, y) tuples representing the vertices of the quadrilateral
+        (top-left, top-right, bottom-right, bottom-left).
+    start_time_sec : float
+        Time in seconds at which the placement starts.
+    end_time_sec : float or None
+        Time in seconds at which the placement stops, or None to run until the
+        end of the video.
+    tracked : bool
+        Whether the quad follows the surface with optical flow instead of staying
+        fixed.
+    keyframes : list or None
+        (time_sec, points) pairs to interpolate the quad between, or None for a
+        quad that does not move.
+    """
+
+    def __init__(
+        self, points, start_time_sec, end_time_sec=None, tracked=False, keyframes=None
+    ):
+        self.points = points
+        self.start_time_sec = start_time_sec
+        self.end_time_sec = end_time_sec
+        self.tracked = tracked
+        self.keyframes = keyframes
+
+    def create_compositor(self, image, frame_size, fps, image_path=None, track=None):
+        """Build the compositor that renders this placement.
+
+        Args:
+            image (np.ndarray): The overlay image.
+            frame_size (tuple): The (width, height) of the video frames.
+            fps (float): The frame rate of the video.
+            image_path (str, optional): The path the image was loaded from, used to
+                share resized overlays through the overlay cache.
+            track (TrackedQuads, optional): The quads of a tracked placement,
+                shared with the compositors of other overlays.
+
+        Returns:
+            The compositor for this placement.
+        """
+        if self.keyframes:
+            return KeyframedCompositor(
+                image,
+                [(int(time_sec * fps), points) for time_sec, points in self.keyframes],
+                frame_size,
+                image_path=image_path,
+            )
+        if self.tracked:
+            return TrackedCompositor(
+                image, self.points, frame_size, image_path=image_path, track=track
+            )
+        return QuadCompositor(image, self.points, frame_size, image_path=image_path)
+
+    def describe(self):
+        """Return a canonical, JSON-serializable description of the placement.
+
+        Coordinates are rounded to a thousandth of a pixel and times to a
+        microsecond, so equivalent requests describe the same way.
+
+        Returns:
+            dict: The points, times, tracking flag and keyframes.
+        """
+
+        def rounded(points):
+            return [[round(float(x), 3), round(float(y), 3)] for x, y in points]
+
+        return {
+            "points": rounded(self.points),
+            "start": round(self.start_time_sec, 6),
+            "end": None if self.end_time_sec is None else round(self.end_time_sec, 6),
+            "tracked": self.tracked,
+            "keyframes": [
+                [round(time_sec, 6), rounded(points)]
+                for time_sec, points in self.keyframes or ()
+            ],
+        }
+
+    def frame_range(self, fps):
+        """Convert the placement times to a half-open range of frame numbers.
+
+        Args:
+            fps (float): The frame rate of the video.
+
+        Returns:
+            tuple: The (start_frame, end_frame) range; end_frame is None when the
+            placement runs until the end of the video.
+        """
+        start_frame = int(self.start_time_sec * fps)
+        if self.end_time_sec is None:
+            return start_frame, None
+        return start_frame, int(self.end_time_sec * fps)
+
+
+def parse_points(points, scale=1):
+    """Convert the points sent by the client into (x, y) tuples.
+
+    Args:
+        points (list): Four {"x": ..., "y": ...} dicts.
+        scale (float or tuple): The factor mapping client coordinates to video
+            pixels, or a (scale_x, scale_y) pair.
+
+    Returns:
+        list: Four (x, y) tuples in video pixel coordinates.
+    """
+    scale_x, scale_y = scale if isinstance(scale, tuple) else (scale, scale)
+    return [
+        (float(point["x"]) * scale_x, float(point["y"]) * scale_y) for point in points
+    ]
+
+
+def parse_placements(timestamps, scale=1):
+    """Build placements from the `timestamps` payload of a render request.
+
+    Each entry has a "timestamp", four "points", an optional "end_timestamp" and
+    optional flags: "track" follows the surface across frames, and "interpolate"
+    moves the quad linearly into the next entry's quad. An entry without an end
+    runs until the next entry starts, and the last one runs until the end of the
+    video.
+
+    Args:
+        timestamps (list): The decoded `timestamps` JSON array.
+        scale (float or tuple): The factor mapping client coordinates to video
+            pixels, or a (scale_x, scale_y) pair.
+
+    Returns:
+        list: The Placement objects, ordered by start time.
+
+    Raises:
+        ValueError: If an entry does not have exactly four points, or ends before
+            it starts, as an entry without an end does when the next entry
+            starts at the same time.
+    """
+    entries = sorted(timestamps, key=lambda entry: float(entry["timestamp"]))
+    if any(len(entry["points"]) != 4 for entry in entries):
+        raise ValueError("Each placement needs exactly four points")
+    placements = []
+    for index, entry in enumerate(entries):
+        start_time = float(entry["timestamp"])
+        points = parse_points(entry["points"], scale)
+        next_entry = entries[index + 1] if index + 1 < len(entries) else None
+        end_time = entry.get("end_timestamp")
+        if end_time is not None:
+            end_time = float(end_time)
+        elif next_entry is not None:
+            end_time = float(next_entry["timestamp"])
+
+        keyframes = None
+        if entry.get("interpolate") and next_entry is not None:
+            end_time = float(next_entry["timestamp"])
+            keyframes = [
+                (start_time, points),
+                (end_time, parse_points(next_entry["points"], scale)),
+            ]
+        if end_time is not None and end_time <= start_time:
+            raise ValueError(
+                f"The placement at {start_time}s ends before it starts; entries "
+                "sharing a timestamp need an end_timestamp"
+            )
+        placements.append(
+            Placement(
+                points,
+                start_time,
+                end_time,
+                tracked=bool(entry.get("track", False)),
+                keyframes=keyframes,
+            )
+        )
+    return placements
+
+
+def affected_frame_count(placements, fps, frame_count):
+    """Count the frames that at least one placement is applied to.
+
+    Args:
+        placements (list): The Placement objects of a render.
+        fps (float): The frame rate of the video.
+        frame_count (int): The number of frames in the video.
+
+    Returns:
+        int: The size of the union of the placements' frame ranges.
+    """
+    ranges = sorted(
+        (start, frame_count if end is None else min(end, frame_count))
+        for start, end in (placement.frame_range(fps) for placement in placements)
+    )
+    count, covered_until = 0, 0
+    for start, end in ranges:
+        start = max(start, covered_until)
+        if end > start:
+            count += end - start
+            covered_until = end
+    return count
+
+
+class PlacementSchedule:
+    """
+    An interval index over frame ranges, each mapped to a compositor.
+
+    The frame axis is split into elementary intervals at every segment boundary
+    and the set of active compositors is precomputed for each of them, so
+    looking up the placements for a frame is a single binary search.
+    """
+
+    def __init__(self, segments):
+        """
+        Args:
+            segments (list): (start_frame, end_frame, compositor) tuples. The range
+                is half-open and end_frame may be None for an open-ended segment.
+        """
+        self.segments = [
+            (start, end, compositor)
+            for start, end, compositor in segments
+            if end is None or end > start
+        ]
+        boundaries = {start for start, _, _ in self.segments}
+        boundaries.update(end for _, end, _ in self.segments if end is not None)
+        self.boundaries = sorted(boundaries)
+        self.active_sets = [
+            tuple(
+                compositor
+                for start, end, compositor in self.segments
+                if start <= boundary and (end is None or boundary < end)
+            )
+            for boundary in self.boundaries
+        ]
+
+    @classmethod
+    def build(cls, placements, image, properties, image_path=None, tracks=None):
+        """Create a schedule with one compositor per placement.
+
+        Args:
+            placements (list): The Placement objects to render.
+            image (np.ndarray): The overlay image.
+            properties (dict): The video properties returned by open_video.
+            image_path (str, optional): The path the image was loaded from.
+            tracks (list, optional): One TrackedQuads, or None, per placement, to
+                share the tracking of placements between schedules. Build it with
+                create_tracks.
+
+        Returns:
+            PlacementSchedule: The schedule for the video.
+        """
+        frame_size = (properties["width"], properties["height"])
+        tracks = tracks or [None] * len(placements)
+        return cls(
+            [
+                (
+                    *placement.frame_range(properties["fps"]),
+                    placement.create_compositor(
+                        image,
+                        frame_size,
+                        properties["fps"],
+                        image_path=image_path,
+                        track=track,
+                    ),
+                )
+                for placement, track in zip(placements, tracks)
+            ]
+        )
+
+    @staticmethod
+    def create_tracks(placements):
+        """Create the shared tracking state of the tracked placements.
+
+        Args:
+            placements (list): The Placement objects to render.
+
+        Returns:
+            list: A TrackedQuads for every tracked placement and None for the
+            others, to pass to build.
+        """
+        return [
+            TrackedQuads(placement.points) if placement.tracked else None
+            for placement in placements
+        ]
+
+    @property
+    def warp_sec(self):
+        """The total time the compositors have spent moving their quads."""
+        return sum(compositor.warp_sec for _, _, compositor in self.segments)
+
+    def active(self, frame_number):
+        """Return the compositors to apply to a frame.
+
+        Args:
+            frame_number (int): The zero-based frame number.
+
+        Returns:
+            tuple: The active compositors, in placement order.
+        """
+        index = bisect_right(self.boundaries, frame_number) - 1
+        if index < 0:
+            return ()
+        return self.active_sets[index]
+
+    def apply(self, frame, frame_number):
+        """Apply every placement active at a frame in place.
+
+        Args:
+            frame (np.ndarray): A decoded BGR frame.
+            frame_number (int): The zero-based frame number.
+
+        Returns:
+            np.ndarray: The same frame, with the overlays applied.
+        """
+        for compositor in self.active(frame_number):
+            compositor.apply(frame, frame_number)
+        return frame
+
+    def apply_batch(self, frames, first_frame_number):
+        """Apply the placements to a batch of consecutive frames in place.
+
+        Args:
+            frames (np.ndarray): A contiguous (N, height, width, 3) array of frames.
+            first_frame_number (int): The frame number of frames[0].
+
+        Returns:
+            np.ndarray: The same array, with the overlays applied.
+        """
+        last_frame_number = first_frame_number + len(frames)
+        for start, end, compositor in self.segments:
+            lo = max(start, first_frame_number)
+            hi = last_frame_number if end is None else min(end, last_frame_number)
+            if lo < hi:
+                compositor.apply_batch(
+                    frames[lo - first_frame_number : hi - first_frame_number], lo
+                )
+        return frames
@@ -0,0 +1,152 @@
+"""
+This module collects the progress and per-stage timings of a render.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+STAGES = ("decode", "warp", "blend", "encode")
+
+# The current frame rate is measured over windows of at least this length
+FPS_WINDOW_SEC = 1.0
+
+
+class RenderTelemetry:
+    """
+    Thread-safe progress and timing counters for one render.
+
+    Stage times are cumulative. The pipelined renderer runs its stages on
+    separate threads, so their sum can exceed the wall-clock time of the render.
+    Warp covers everything that moves a quad (tracking, keyframe interpolation and
+    re-warping the overlay); blend is the rest of the compositing time.
+
+    Attributes:
+    -----------
+    frames_done : int
+        The number of frames written so far.
+    frame_count : int or None
+        The number of frames in the video, if known.
+    stage_sec : dict
+        The seconds spent in each of STAGES.
+    """
+
+    def __init__(self, listener=None):
+        """
+        Args:
+            listener (callable, optional): Called with this object every time
+                frames are reported as written.
+        """
+        self.listener = listener
+        self.frame_count = None
+        self.frames_done = 0
+        self.stage_sec = dict.fromkeys(STAGES, 0.0)
+        self.schedules = ()
+        self.warp_seen = 0.0
+        self.started_at = time.monotonic()
+        self.window = (self.started_at, 0)
+        self.fps = 0.0
+        self.lock = threading.Lock()
+
+    def start(self, frame_count, *schedules):
+        """Reset the clock at the start of the render loop.
+
+        Args:
+            frame_count (int): The number of frames in the video.
+            *schedules (PlacementSchedule): The schedules being rendered, whose
+                compositors report the time they spend warping.
+        """
+        self.frame_count = frame_count
+        self.schedules = schedules
+        self.warp_seen = self._warp_sec()
+        self.started_at = time.monotonic()
+        self.window = (self.started_at, self.frames_done)
+
+    def _warp_sec(self):
+        return sum(schedule.warp_sec for schedule in self.schedules)
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block of code and add it to a stage.
+
+        Args:
+            name (str): One of STAGES.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name, seconds):
+        """Add time to a stage.
+
+        Args:
+            name (str): One of STAGES.
+            seconds (float): The time to add.
+        """
+        with self.lock:
+            self.stage_sec[name] += seconds
+
+    def merge(self, stage_sec):
+        """Add the stage times of another render, such as a chunk.
+
+        Args:
+            stage_sec (dict): Seconds per stage.
+        """
+        with self.lock:
+            for name, seconds in stage_sec.items():
+                self.stage_sec[name] += seconds
+
+    @contextmanager
+    def composite(self):
+        """Time a compositing call and split it into warp and blend time."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            warp_sec = self._warp_sec()
+            warp, self.warp_seen = warp_sec - self.warp_seen, warp_sec
+            with self.lock:
+                self.stage_sec["warp"] += warp
+                self.stage_sec["blend"] += max(seconds - warp, 0.0)
+
+    def report(self, frames_done):
+        """Record how many frames have been written and notify the listener.
+
+        Args:
+            frames_done (int): The number of frames written so far.
+        """
+        now = time.monotonic()
+        window_start, window_frames = self.window
+        if now - window_start >= FPS_WINDOW_SEC:
+            self.fps = (frames_done - window_frames) / (now - window_start)
+            self.window = (now, frames_done)
+        self.frames_done = frames_done
+        if self.listener is not None:
+            self.listener(self)
+
+    def snapshot(self):
+        """Return the current state of the render.
+
+        Returns:
+            dict: frames_done, frame_count, fps, eta_sec (None until a rate is
+            known) and stage_sec.
+        """
+        fps = self.fps
+        if not fps:
+            elapsed = time.monotonic() - self.started_at
+            fps = self.frames_done / elapsed if elapsed > 0 else 0.0
+        eta_sec = None
+        if fps > 0 and self.frame_count:
+            eta_sec = max(self.frame_count - self.frames_done, 0) / fps
+        with self.lock:
+            stage_sec = dict(self.stage_sec)
+        return {
+            "frames_done": self.frames_done,
+            "frame_count": self.frame_count,
+            "fps": fps,
+            "eta_sec": eta_sec,
+            "stage_sec": stage_sec,
+        }
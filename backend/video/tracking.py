@@ -0,0 +1,313 @@
+"""
+This module tracks a planar placement surface from frame to frame so that the
+overlay follows camera motion.
+
+Tracking only ever looks at a downscaled window around the current quad: features
+are followed with pyramidal Lucas-Kanade optical flow and the frame-to-frame
+homography is fitted with RANSAC. Features are re-detected at keyframes or when
+too few of them survive, instead of on every frame.
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+from .compositor import QuadCompositor
+
+# Windows are snapped to this grid so that small motions reuse the same crop
+WINDOW_GRID = 16
+
+
+class PlanarTracker:
+    """
+    Follow a quadrilateral on a planar surface with ROI-local optical flow.
+
+    Attributes:
+    -----------
+    quad : np.ndarray
+        The current (4, 2) quad in frame coordinates.
+    confidence : float
+        The RANSAC inlier ratio of the last update, between 0 and 1.
+    """
+
+    def __init__(
+        self,
+        points,
+        scale=0.5,
+        margin=0.5,
+        keyframe_interval=30,
+        max_features=200,
+        min_features=12,
+        min_confidence=0.6,
+    ):
+        """
+        Args:
+            points (list): Four (x, y) tuples of the quad in the first frame.
+            scale (float): The downscale factor applied to the tracking window.
+            margin (float): How far the window extends around the quad, as a
+                fraction of the quad's size.
+            keyframe_interval (int): Re-detect features at least this often.
+            max_features (int): The maximum number of features to track.
+            min_features (int): Re-detect when fewer inliers than this survive.
+            min_confidence (float): Re-detect when the inlier ratio drops below this.
+        """
+        self.quad = np.array(points, dtype=np.float32)
+        self.scale = scale
+        self.margin = margin
+        self.keyframe_interval = keyframe_interval
+        self.max_features = max_features
+        self.min_features = min_features
+        self.min_confidence = min_confidence
+        self.confidence = 1.0
+        self.features = None
+        self.window = None
+        self.previous = None
+        self.frames_since_keyframe = 0
+
+    def _window_for(self, frame_shape):
+        """Compute a grid-aligned tracking window around the current quad."""
+        frame_height, frame_width = frame_shape[:2]
+        low, high = self.quad.min(axis=0), self.quad.max(axis=0)
+        pad = (high - low) * self.margin + WINDOW_GRID
+        x0, y0 = (np.floor((low - pad) / WINDOW_GRID) * WINDOW_GRID).astype(int)
+        x1, y1 = (np.ceil((high + pad) / WINDOW_GRID) * WINDOW_GRID).astype(int)
+        x0, y0 = max(int(x0), 0), max(int(y0), 0)
+        x1, y1 = min(int(x1), frame_width), min(int(y1), frame_height)
+        if x1 - x0 < 8 or y1 - y0 < 8:
+            return None
+        return x0, y0, x1, y1
+
+    def _crop(self, frame, window):
+        """Return the downscaled grayscale crop of a frame inside a window."""
+        x0, y0, x1, y1 = window
+        gray = cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2GRAY)
+        if self.scale == 1:
+            return gray
+        return cv2.resize(
+            gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA
+        )
+
+    def _to_window(self, points, window):
+        return (points - np.array(window[:2], dtype=np.float32)) * self.scale
+
+    def _to_frame(self, points, window):
+        return points / self.scale + np.array(window[:2], dtype=np.float32)
+
+    def _detect(self, gray, window):
+        """Detect features on the surface inside the current quad."""
+        mask = np.zeros(gray.shape, dtype=np.uint8)
+        cv2.fillConvexPoly(
+            mask, np.round(self._to_window(self.quad, window)).astype(np.int32), 255
+        )
+        features = cv2.goodFeaturesToTrack(
+            gray,
+            maxCorners=self.max_features,
+            qualityLevel=0.01,
+            minDistance=5,
+            mask=mask,
+        )
+        self.frames_since_keyframe = 0
+        if features is None:
+            return None
+        return self._to_frame(features.reshape(-1, 2), window)
+
+    def _prepare_next(self, frame, gray, window, redetect):
+        """Crop the frame for the next update, re-detecting features if asked to."""
+        next_window = self._window_for(frame.shape)
+        if next_window is None:
+            self.window, self.previous, self.features = None, None, None
+            return
+        if next_window != window or gray is None:
+            gray = self._crop(frame, next_window)
+        if redetect or self.features is None:
+            self.features = self._detect(gray, next_window)
+        self.window, self.previous = next_window, gray
+
+    def start(self, frame):
+        """Detect the initial features on the first frame of the placement.
+
+        Args:
+            frame (np.ndarray): The BGR frame the user's quad was drawn on.
+
+        Returns:
+            np.ndarray: The (4, 2) quad for this frame.
+        """
+        self._prepare_next(frame, None, None, redetect=True)
+        return self.quad
+
+    def update(self, frame):
+        """Track the quad into the next frame.
+
+        Args:
+            frame (np.ndarray): The next BGR frame.
+
+        Returns:
+            np.ndarray: The (4, 2) quad for this frame. If tracking fails the last
+            known quad is returned and features are re-detected.
+        """
+        if self.window is None:
+            return self.quad
+        window = self.window
+        gray = self._crop(frame, window)
+        redetect = True
+        if self.features is not None and len(self.features) >= 4:
+            tracked = self._track(self.previous, gray, window)
+            if tracked is not None:
+                matrix, inliers = tracked
+                quad = cv2.perspectiveTransform(
+                    self._to_window(self.quad, window).reshape(-1, 1, 2), matrix
+                )
+                self.quad = self._to_frame(quad.reshape(-1, 2), window)
+                self.features = inliers
+                self.frames_since_keyframe += 1
+                redetect = (
+                    len(inliers) < self.min_features
+                    or self.confidence < self.min_confidence
+                    or self.frames_since_keyframe >= self.keyframe_interval
+                )
+        self._prepare_next(frame, gray, window, redetect)
+        return self.quad
+
+    def _track(self, previous, gray, window):
+        """Follow the features with LK flow and fit a homography to them.
+
+        Returns:
+            tuple: The 3x3 homography in window coordinates and the inlier features
+            in frame coordinates, or None if no homography could be fitted.
+        """
+        points = self._to_window(self.features, window).reshape(-1, 1, 2)
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(
+            previous, gray, points, None, winSize=(21, 21), maxLevel=3
+        )
+        if moved is None:
+            return None
+        found = status.reshape(-1) == 1
+        if found.sum() < 4:
+            self.confidence = 0.0
+            return None
+        matrix, inlier_mask = cv2.findHomography(
+            points[found], moved[found], cv2.RANSAC, 3.0 * self.scale
+        )
+        if matrix is None:
+            self.confidence = 0.0
+            return None
+        inlier_mask = inlier_mask.reshape(-1) == 1
+        self.confidence = inlier_mask.sum() / len(points)
+        inliers = moved[found][inlier_mask].reshape(-1, 2)
+        return matrix, self._to_frame(inliers, window)
+
+
+class TrackedQuads:
+    """
+    The quads of a tracked surface, one per frame, shared by every compositor
+    that places an overlay on it.
+
+    The tracker runs once per frame, on the frame of whichever compositor asks
+    first; the others reuse its quad. Compositors must ask for the frames in
+    order, starting with the frame the quad was drawn on.
+
+    Attributes:
+    -----------
+    tracker : PlanarTracker
+        The tracker following the surface.
+    index : int
+        The number of frames tracked so far.
+    quad : np.ndarray
+        The (4, 2) quad of the last tracked frame.
+    """
+
+    def __init__(self, points, **tracker_options):
+        """
+        Args:
+            points (list): Four (x, y) tuples of the quad in the first frame.
+            **tracker_options: Keyword arguments for PlanarTracker.
+        """
+        self.tracker = PlanarTracker(points, **tracker_options)
+        self.index = 0
+        self.quad = None
+
+    def quad_at(self, index, frame):
+        """Return the quad of the index-th frame of the placement.
+
+        Args:
+            index (int): The number of frames of the placement before this one.
+            frame (np.ndarray): The BGR frame, used if it has not been tracked yet.
+
+        Returns:
+            np.ndarray: The (4, 2) quad for this frame.
+        """
+        if index == self.index:
+            if index == 0:
+                self.quad = self.tracker.start(frame)
+            else:
+                self.quad = self.tracker.update(frame)
+            self.index += 1
+        return self.quad
+
+
+class TrackedCompositor:
+    """
+    A compositor whose quad is updated from a PlanarTracker on every frame.
+
+    Frames must be applied in order, starting with the frame the quad was drawn
+    on.
+    """
+
+    def __init__(
+        self, image, points, frame_size, image_path=None, track=None, **tracker_options
+    ):
+        """
+        Args:
+            image (np.ndarray): The BGR or BGRA overlay image to place.
+            points (list): Four (x, y) tuples of the quad in the first frame.
+            frame_size (tuple): The (width, height) of the video frames.
+            image_path (str, optional): The path the image was loaded from.
+            track (TrackedQuads, optional): The tracked quads to follow, when
+                several compositors place overlays on the same surface.
+            **tracker_options: Keyword arguments for PlanarTracker, used when no
+                track is given.
+        """
+        self.compositor = QuadCompositor(
+            image, points, frame_size, image_path=image_path
+        )
+        self.track = track or TrackedQuads(points, **tracker_options)
+        self.frames_applied = 0
+        self.tracking_sec = 0.0
+
+    @property
+    def warp_sec(self):
+        """The total time spent tracking the surface and moving the quad."""
+        return self.tracking_sec + self.compositor.warp_sec
+
+    def apply(self, frame, frame_number=None):
+        """Track the surface into a frame and composite the overlay in place.
+
+        Args:
+            frame (np.ndarray): The next decoded BGR frame.
+            frame_number (int, optional): Unused; frames must arrive in order.
+
+        Returns:
+            np.ndarray: The same frame, with the overlay applied.
+        """
+        started = time.perf_counter()
+        points = self.track.quad_at(self.frames_applied, frame)
+        self.tracking_sec += time.perf_counter() - started
+        if self.frames_applied:
+            self.compositor.set_quad(points)
+        self.frames_applied += 1
+        return self.compositor.apply(frame)
+
+    def apply_batch(self, frames, first_frame_number=None):
+        """Track and composite a stack of consecutive frames in place.
+
+        Args:
+            frames (np.ndarray): A (N, height, width, 3) array of frames.
+            first_frame_number (int, optional): Unused; see apply.
+
+        Returns:
+            np.ndarray: The same array, with the overlay applied to every frame.
+        """
+        for frame in frames:
+            self.apply(frame)
+        return frames
@@ -0,0 +1,147 @@
+"""
+This module renders one source video against several overlays in a single pass.
+
+Every frame is decoded once and fanned out to one compositor and one encoder per
+overlay. Each variant composites into a buffer from its own ring and hands it to
+its own encoder thread; OpenCV releases the GIL while encoding, so the encoders
+run in parallel with each other and with the decoder.
+"""
+
+import queue
+import threading
+
+import numpy as np
+
+from .assets import overlay_cache
+from .pipeline import FrameRing
+from .render import create_video_writer, open_video
+from .schedule import PlacementSchedule
+from .telemetry import RenderTelemetry
+
+_STOP = object()
+
+
+class VariantEncoder:
+    """
+    An encoder thread writing the frames of one variant.
+
+    Attributes:
+    -----------
+    ring : FrameRing
+        The buffers frames are composited into before they are queued.
+    """
+
+    def __init__(self, video_writer, shape, ring_size, telemetry, fail):
+        """
+        Args:
+            video_writer (cv2.VideoWriter): The writer for the variant's output.
+            shape (tuple): The (height, width, channels) of a frame.
+            ring_size (int): The number of reusable frame buffers.
+            telemetry (RenderTelemetry): Receives the encoding time.
+            fail (callable): Called with any error raised while encoding.
+        """
+        self.video_writer = video_writer
+        self.ring = FrameRing(shape, ring_size)
+        self.frames = queue.Queue(maxsize=ring_size)
+        self.telemetry = telemetry
+        self.fail = fail
+        self.thread = threading.Thread(target=self._encode, name="variant-encoder")
+        self.thread.start()
+
+    def put(self, buffer):
+        """Queue a composited buffer taken from the ring."""
+        self.frames.put(buffer)
+
+    def close(self):
+        """Write the remaining frames and wait for the thread to finish."""
+        self.frames.put(_STOP)
+        self.thread.join()
+
+    def _encode(self):
+        while (buffer := self.frames.get()) is not _STOP:
+            try:
+                with self.telemetry.stage("encode"):
+                    self.video_writer.write(buffer)
+            except Exception as e:
+                self.fail(e)
+            finally:
+                self.ring.release(buffer)
+
+
+def render_variants(
+    video_path, variants, placements, ring_size=4, telemetry=None, probe=None
+):
+    """Render the same placements with several overlays from one decode pass.
+
+    Args:
+        video_path (str): Path to the input video file.
+        variants (list): (image_path, output_path) pairs, one per overlay.
+        placements (list): The Placement objects to apply.
+        ring_size (int): The number of reusable frame buffers per variant.
+        telemetry (RenderTelemetry, optional): Receives progress and stage times.
+            Compositing and encoding times add up over all variants.
+        probe (dict, optional): The stored result of probe_video.
+
+    Returns:
+        bool: True if every variant was rendered, False if the video or one of
+        the overlays could not be read.
+
+    Raises:
+        Exception: The first error raised by an encoder.
+    """
+    video_capture, properties = open_video(video_path, probe)
+    if video_capture is None:
+        return False
+    images = [overlay_cache.get(image_path) for image_path, _ in variants]
+    if any(image is None for image in images):
+        video_capture.release()
+        return False
+
+    # Placements are shared, so the quads and warps only differ in their pixels;
+    # tracked surfaces are followed once for all variants
+    tracks = PlacementSchedule.create_tracks(placements)
+    schedules = [
+        PlacementSchedule.build(
+            placements, image, properties, image_path=image_path, tracks=tracks
+        )
+        for image, (image_path, _) in zip(images, variants)
+    ]
+    telemetry = telemetry or RenderTelemetry()
+    telemetry.start(properties["frame_count"], *schedules)
+    errors = []
+    shape = (properties["height"], properties["width"], 3)
+    encoders = [
+        VariantEncoder(
+            create_video_writer(output_path, properties),
+            shape,
+            ring_size,
+            telemetry,
+            errors.append,
+        )
+        for _, output_path in variants
+    ]
+    source = np.empty(shape, dtype=np.uint8)
+
+    frame_number = 0
+    try:
+        while not errors:
+            with telemetry.stage("decode"):
+                ret, frame = video_capture.read(source)
+            if not ret:
+                break
+            for schedule, encoder in zip(schedules, encoders):
+                buffer = encoder.ring.acquire()
+                np.copyto(buffer, frame)
+                with telemetry.composite():
+                    schedule.apply(buffer, frame_number)
+                encoder.put(buffer)
+            frame_number += 1
+            telemetry.report(frame_number)
+    finally:
+        video_capture.release()
+        for encoder in encoders:
+            encoder.close()
+            encoder.video_writer.release()
+    if errors:
+        raise errors[0]
+    return True
@@ -0,0 +1,528 @@
+"""
+This module drives the application with concurrent virtual users and reports the
+throughput and latency percentiles of each route.
+
+Requests go either through Flask's test client in this process, or over HTTP to
+a running server. Each virtual user registers and logs in once, then sends a
+weighted mix of requests until the run ends. A report can be saved as a
+baseline, and later runs compared against it to catch latency regressions.
+
+In-process runs use the local identity backend unless IDENTITY_BACKEND is set in
+the environment, so no AWS access is needed:
+
+    python loadtest.py --concurrency 8 --requests 2000 --save-baseline
+    python loadtest.py --concurrency 8 --requests 2000 --compare
+    python loadtest.py --target http://localhost:5000 --duration 60
+"""
+
+import argparse
+import io
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from http.cookies import SimpleCookie
+
+import requests
+
+DEFAULT_MIX = "login=1,list_projects=4,create_project=1,user_info=4"
+# Kept in the application's instance folder rather than wherever the test runs
+DEFAULT_BASELINE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "instance", "loadtest_baseline.json"
+)
+# A run is a regression when a route's p95 or p99 grows by more than this fraction
+DEFAULT_TOLERANCE = 0.2
+PERCENTILES = (50, 95, 99)
+# A placement small enough to keep render admission cheap
+PLACEMENTS = [
+    {
+        "timestamp": 0,
+        "end_timestamp": 1,
+        "points": [
+            {"x": 10, "y": 10},
+            {"x": 40, "y": 10},
+            {"x": 40, "y": 30},
+            {"x": 10, "y": 30},
+        ],
+    }
+]
+
+
+class TestClientTransport:
+    """
+    Sends requests through the Flask test client of an application.
+
+    Cookies are not kept, so that sessions are handled the same way as over
+    HTTP. Requests use https, since the session cookie is marked secure.
+    """
+
+    def __init__(self, app):
+        """
+        Args:
+            app: The Flask application instance.
+        """
+        self.client = app.test_client(use_cookies=False)
+
+    def request(self, method, path, headers=None, json=None, form=None, files=None):
+        """Send a request.
+
+        Args:
+            method (str): The HTTP method.
+            path (str): The path of the route.
+            headers (dict, optional): The request headers.
+            json (dict, optional): A JSON body.
+            form (dict, optional): Form fields.
+            files (dict, optional): Files as (filename, bytes) pairs by field.
+
+        Returns:
+            tuple: The status code, the decoded JSON body (None if it is not
+            JSON) and the Set-Cookie headers.
+        """
+        data = dict(form or {})
+        for field, (filename, content) in (files or {}).items():
+            data[field] = (io.BytesIO(content), filename)
+        response = self.client.open(
+            path,
+            method=method,
+            headers=headers,
+            json=json,
+            data=data or None,
+            base_url="https://localhost",
+        )
+        return (
+            response.status_code,
+            response.get_json(silent=True),
+            response.headers.getlist("Set-Cookie"),
+        )
+
+
+class HTTPTransport:
+    """
+    Sends requests to a running server with one connection pool per thread.
+    """
+
+    def __init__(self, base_url, timeout_sec=30):
+        """
+        Args:
+            base_url (str): The URL of the server, such as http://localhost:5000.
+            timeout_sec (float): The timeout of each request.
+        """
+        self.base_url = base_url.rstrip("/")
+        self.timeout_sec = timeout_sec
+        self.local = threading.local()
+
+    def request(self, method, path, headers=None, json=None, form=None, files=None):
+        """Send a request. See TestClientTransport.request."""
+        if not hasattr(self.local, "session"):
+            self.local.session = requests.Session()
+        response = self.local.session.request(
+            method,
+            self.base_url + path,
+            headers=headers,
+            json=json,
+            data=form,
+            files=files,
+            timeout=self.timeout_sec,
+        )
+        # Secure cookies are not kept over plain HTTP, so they are sent by hand
+        self.local.session.cookies.clear()
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        set_cookies = response.raw.headers.getlist("Set-Cookie")
+        return response.status_code, body, set_cookies
+
+
+def session_cookie(set_cookies):
+    """Turn the cookies set by a response into a Cookie header value."""
+    cookie = SimpleCookie()
+    for header in set_cookies:
+        cookie.load(header)
+    return "; ".join(f"{name}={morsel.value}" for name, morsel in cookie.items())
+
+
+class VirtualUser:
+    """
+    One simulated user: an account, its tokens and the requests it can send.
+
+    Attributes:
+    -----------
+    username : str
+        The user name the virtual user registered with.
+    video_filename : str or None
+        The stored name of the video uploaded for render requests.
+    """
+
+    def __init__(self, transport, username, password):
+        """
+        Args:
+            transport: The TestClientTransport or HTTPTransport to send with.
+            username (str): The user name to register.
+            password (str): The password to register.
+        """
+        self.transport = transport
+        self.username = username
+        self.password = password
+        self.access_token = None
+        self.cookie = ""
+        self.video_filename = None
+
+    def setup(self, video_path=None):
+        """Register, log in and optionally upload the video for render requests.
+
+        Raises:
+            RuntimeError: If the account cannot be created or logged in.
+        """
+        status, body, _ = self.transport.request(
+            "POST",
+            "/register",
+            json={
+                "username": self.username,
+                "password": self.password,
+                "email": f"{self.username}@example.com",
+                "birthdate": "1990-01-01",
+                "gender": "unspecified",
+                "phoneNumber": "+15550100",
+            },
+        )
+        if status not in (201, 409):
+            raise RuntimeError(f"Registration failed with {status}: {body}")
+        status = self.login()
+        if status != 200:
+            raise RuntimeError(f"Login failed with {status}")
+        if video_path:
+            with open(video_path, "rb") as video_file:
+                content = video_file.read()
+            status, body, _ = self.transport.request(
+                "POST",
+                "/projects",
+                headers=self.auth_headers(),
+                form={"name": "Load test", "description": ""},
+                files={"file": (os.path.basename(video_path), content)},
+            )
+            if status != 201:
+                raise RuntimeError(f"Upload failed with {status}: {body}")
+            self.video_filename = body["filename"]
+
+    def auth_headers(self):
+        return {"Authorization": f"Bearer {self.access_token}"}
+
+    def login(self):
+        status, body, set_cookies = self.transport.request(
+            "POST",
+            "/login",
+            json={"username": self.username, "password": self.password},
+        )
+        if status == 200:
+            self.access_token = body["AccessToken"]
+            self.cookie = session_cookie(set_cookies)
+        return status
+
+    def list_projects(self):
+        return self.transport.request("GET", "/projects", headers=self.auth_headers())[
+            0
+        ]
+
+    def create_project(self):
+        return self.transport.request(
+            "POST",
+            "/projects",
+            headers=self.auth_headers(),
+            form={"name": f"Project {uuid.uuid4().hex[:8]}", "description": ""},
+        )[0]
+
+    def user_info(self):
+        return self.transport.request(
+            "POST",
+            "/user-info",
+            headers={"Cookie": self.cookie},
+            json={"fields": ["email", "preferred_username", "cognito:username"]},
+        )[0]
+
+    def process_video(self):
+        return self.transport.request(
+            "POST",
+            "/process_video",
+            headers=self.auth_headers(),
+            form={
+                "video_filename": self.video_filename,
+                "timestamps": json.dumps(PLACEMENTS),
+            },
+        )[0]
+
+
+# The operations of the mix, by name: the route they are reported under and the
+# VirtualUser method that sends them
+OPERATIONS = {
+    "login": ("POST /login", VirtualUser.login),
+    "list_projects": ("GET /projects", VirtualUser.list_projects),
+    "create_project": ("POST /projects", VirtualUser.create_project),
+    "user_info": ("POST /user-info", VirtualUser.user_info),
+    "process_video": ("POST /process_video", VirtualUser.process_video),
+}
+
+
+def parse_mix(mix):
+    """Parse a request mix such as "login=1,list_projects=4".
+
+    Args:
+        mix (str): Comma-separated operation=weight pairs.
+
+    Returns:
+        dict: The positive weights by operation name.
+
+    Raises:
+        ValueError: If an operation is unknown or no weight is positive.
+    """
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.strip().partition("=")
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation {name}; use {', '.join(OPERATIONS)}")
+        weights[name] = float(weight or 1)
+    weights = {name: weight for name, weight in weights.items() if weight > 0}
+    if not weights:
+        raise ValueError("The mix needs at least one operation with a weight")
+    return weights
+
+
+def percentile(sorted_values, percent):
+    """Return the nearest-rank percentile of sorted values."""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(percent / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(samples, elapsed_sec):
+    """Compute the report of a run.
+
+    Args:
+        samples (list): (route, latency_sec, status) tuples.
+        elapsed_sec (float): The wall-clock length of the run.
+
+    Returns:
+        dict: The total throughput and, per route, the request and error
+        counts, the throughput and the latency percentiles in milliseconds.
+    """
+    by_route = {}
+    for route, latency, status in samples:
+        by_route.setdefault(route, []).append((latency, status))
+    routes = {}
+    for route, results in sorted(by_route.items()):
+        latencies = sorted(latency * 1000 for latency, _ in results)
+        routes[route] = {
+            "requests": len(results),
+            "errors": sum(1 for _, status in results if status >= 400),
+            "throughput": len(results) / elapsed_sec,
+            **{
+                f"p{percent}_ms": percentile(latencies, percent)
+                for percent in PERCENTILES
+            },
+        }
+    return {
+        "elapsed_sec": elapsed_sec,
+        "requests": len(samples),
+        "throughput": len(samples) / elapsed_sec if elapsed_sec else 0.0,
+        "routes": routes,
+    }
+
+
+def run_load(
+    transport,
+    weights,
+    concurrency,
+    total_requests=None,
+    duration_sec=None,
+    video_path=None,
+    seed=0,
+):
+    """Run virtual users against the application and summarize the results.
+
+    Args:
+        transport: The TestClientTransport or HTTPTransport to send with.
+        weights (dict): The weights of the operations in the mix.
+        concurrency (int): The number of virtual users sending at once.
+        total_requests (int, optional): Stop after this many requests.
+        duration_sec (float, optional): Stop after this many seconds.
+        video_path (str, optional): A video each user uploads, needed by
+            process_video.
+        seed (int): The seed the operations are drawn with.
+
+    Returns:
+        dict: See summarize.
+    """
+    run_id = uuid.uuid4().hex[:8]
+    users = [
+        VirtualUser(transport, f"loadtest-{run_id}-{index}", f"Lt-{uuid.uuid4()}!")
+        for index in range(concurrency)
+    ]
+    for user in users:
+        user.setup(video_path)
+
+    names = list(weights)
+    samples = []
+    samples_lock = threading.Lock()
+    remaining = [total_requests]
+    started = time.perf_counter()
+    deadline = started + duration_sec if duration_sec else None
+
+    def take_turn():
+        if deadline is not None and time.perf_counter() >= deadline:
+            return False
+        with samples_lock:
+            if remaining[0] is None:
+                return True
+            if remaining[0] <= 0:
+                return False
+            remaining[0] -= 1
+            return True
+
+    def drive(index, user):
+        draw = random.Random(seed + index)
+        results = []
+        while take_turn():
+            name = draw.choices(names, [weights[name] for name in names])[0]
+            route, operation = OPERATIONS[name]
+            sent = time.perf_counter()
+            try:
+                status = operation(user)
+            except requests.RequestException:
+                status = 599
+            results.append((route, time.perf_counter() - sent, status))
+        with samples_lock:
+            samples.extend(results)
+
+    threads = [
+        threading.Thread(target=drive, args=(index, user), name=f"loadtest-{index}")
+        for index, user in enumerate(users)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(samples, time.perf_counter() - started)
+
+
+def print_report(report):
+    """Print a report as a table."""
+    print(
+        f"{report['requests']} requests in {report['elapsed_sec']:.1f}s "
+        f"({report['throughput']:.1f} req/s)"
+    )
+    print(
+        f"{'route':<22}{'requests':>9}{'errors':>8}{'req/s':>9}"
+        + "".join(f"{f'p{percent} ms':>10}" for percent in PERCENTILES)
+    )
+    for route, stats in report["routes"].items():
+        print(
+            f"{route:<22}{stats['requests']:>9}{stats['errors']:>8}"
+            f"{stats['throughput']:>9.1f}"
+            + "".join(f"{stats[f'p{percent}_ms']:>10.1f}" for percent in PERCENTILES)
+        )
+
+
+def compare_reports(baseline, report, tolerance=DEFAULT_TOLERANCE):
+    """Find the routes whose tail latency regressed against a baseline.
+
+    Args:
+        baseline (dict): The saved report to compare against.
+        report (dict): The report of this run.
+        tolerance (float): The fraction p95 or p99 may grow by.
+
+    Returns:
+        list: A description of each regression.
+    """
+    regressions = []
+    for route, stats in report["routes"].items():
+        before = baseline["routes"].get(route)
+        if before is None:
+            continue
+        for key in ("p95_ms", "p99_ms"):
+            if before[key] and stats[key] > before[key] * (1 + tolerance):
+                regressions.append(
+                    f"{route} {key} rose from {before[key]:.1f} to {stats[key]:.1f}"
+                )
+    return regressions
+
+
+def build_transport(target):
+    """Return the transport for a target: a server URL, or "app" for the test client.
+
+    Args:
+        target (str): The --target argument.
+
+    Returns:
+        TestClientTransport or HTTPTransport: The transport.
+    """
+    if target != "app":
+        return HTTPTransport(target)
+    os.environ.setdefault("IDENTITY_BACKEND", "local")
+    from main import app  # Imported late so the identity backend is chosen first
+
+    return TestClientTransport(app)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--target",
+        default="app",
+        help='A server URL, or "app" to use the test client in this process',
+    )
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=None)
+    parser.add_argument("--duration", type=float, default=None)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument(
+        "--video", default=None, help="A video to upload, needed by process_video"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    weights = parse_mix(args.mix)
+    if "process_video" in weights and not args.video:
+        parser.error("process_video needs --video")
+    if args.requests is None and args.duration is None:
+        args.requests = 1000
+
+    report = run_load(
+        build_transport(args.target),
+        weights,
+        args.concurrency,
+        total_requests=args.requests,
+        duration_sec=args.duration,
+        video_path=args.video,
+        seed=args.seed,
+    )
+    print_report(report)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as baseline_file:
+            json.dump(report, baseline_file, indent=2)
+        print(f"Saved the baseline to {args.baseline}")
+    if args.compare:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            regressions = compare_reports(
+                json.load(baseline_file), report, args.tolerance
+            )
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            return 1
+        print("No latency regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,11 +12,14 @@ from backend import (
     DEBUG,
     STATIC_FOLDER,
     TEMPLATE_FOLDER,
+    USE_X_SENDFILE,
     create_db_tables,
     create_flask_app,
     extract_environment_variable,
     initialize_database,
+    register_local_identity_route,
     register_login_route,
+    register_preview_route,
     register_project_model_routes,
     register_react_base,
     register_registration_route,
@@ -39,16 +42,19 @@ app.config.update(
         "SESSION_COOKIE_SECURE": True,  # Requires HTTPS
         "UPLOAD_FOLDER": extract_environment_variable("UPLOAD_FOLDER"),
         "RESULT_FOLDER": extract_environment_variable("RESULT_FOLDER"),
+        "USE_X_SENDFILE": USE_X_SENDFILE,
     }
 )
 
 register_react_base(app)
 register_login_route(app)
+register_local_identity_route(app)
 register_registration_route(app)
 register_user_validation(app)
 register_user_logout(app)
 register_project_model_routes(app)
 register_video_processing(app)
+register_preview_route(app)
 safe_create_upload_folder(app)
 safe_create_results_folder(app)
 initialize_database(app)
@@ -0,0 +1,164 @@
+"""
+Shared fixtures. The settings are read when the backend package is imported, so
+the environment is prepared before anything from it is imported.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import uuid
+
+_root = tempfile.mkdtemp(prefix="gyrus-tests-")
+for name in ("uploads", "results", "static", "templates"):
+    os.makedirs(os.path.join(_root, name), exist_ok=True)
+for variable, value in {
+    "SECRET_KEY": "test-secret",
+    "TEMPLATE_FOLDER": os.path.join(_root, "templates"),
+    "STATIC_FOLDER": os.path.join(_root, "static"),
+    "UPLOAD_FOLDER": os.path.join(_root, "uploads"),
+    "RESULT_FOLDER": os.path.join(_root, "results"),
+    "AWS_REGION": "us-east-1",
+    "USER_POOL_ID": "us-east-1_test",
+    "CLIENT_ID": "test-client",
+    "IDENTITY_BACKEND": "local",
+    "RENDER_WORKERS": "1",
+}.items():
+    os.environ[variable] = value
+
+import cv2  # noqa: E402
+import numpy as np  # noqa: E402
+import pytest  # noqa: E402
+
+# A small quad in client coordinates, as the UI sends it
+POINTS = [{"x": 2, "y": 2}, {"x": 14, "y": 2}, {"x": 14, "y": 10}, {"x": 2, "y": 10}]
+
+
+def write_video(path, frame_count=60, size=(96, 64), fps=30):
+    """Write a small video whose frames all differ."""
+    width, height = size
+    video_writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    for index in range(frame_count):
+        frame = np.full((height, width, 3), (index * 3) % 256, dtype=np.uint8)
+        frame[:, index % width : index % width + 8] = (40, 200, 90)
+        video_writer.write(frame)
+    video_writer.release()
+    return path
+
+
+@pytest.fixture
+def video_path(tmp_path):
+    return write_video(str(tmp_path / "source.mp4"))
+
+
+@pytest.fixture
+def overlay_path(tmp_path):
+    path = str(tmp_path / "overlay.png")
+    image = np.zeros((20, 30, 3), dtype=np.uint8)
+    image[:, :15] = (0, 0, 255)
+    image[:, 15:] = (255, 0, 0)
+    cv2.imwrite(path, image)
+    return path
+
+
+@pytest.fixture
+def app(tmp_path):
+    from backend import (
+        create_db_tables,
+        create_flask_app,
+        register_local_identity_route,
+        register_login_route,
+        register_preview_route,
+        register_project_model_routes,
+        register_registration_route,
+        register_user_validation,
+        register_video_processing,
+        update_configuration,
+    )
+    from backend.database import db
+
+    app = create_flask_app(
+        "gyrus-tests",
+        template_folder=os.environ["TEMPLATE_FOLDER"],
+        static_folder=os.environ["STATIC_FOLDER"],
+        instance_path=str(tmp_path / "instance"),
+    )
+    update_configuration(app)
+    app.config.update(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'app.db'}",
+            "UPLOAD_FOLDER": os.environ["UPLOAD_FOLDER"],
+            "RESULT_FOLDER": os.environ["RESULT_FOLDER"],
+        }
+    )
+    db.init_app(app)
+    register_login_route(app)
+    register_local_identity_route(app)
+    register_registration_route(app)
+    register_user_validation(app)
+    register_project_model_routes(app)
+    register_video_processing(app)
+    register_preview_route(app)
+    create_db_tables(app)
+    return app
+
+
+@pytest.fixture
+def login(app):
+    """Return a function that signs a new local user up and logs them in.
+
+    The function returns the Authorization headers of the user and their ID.
+    """
+    import jwt
+
+    client = app.test_client()
+
+    def login(username="user"):
+        username = f"{username}-{uuid.uuid4().hex[:8]}"
+        credentials = {"username": username, "password": "Password-1"}
+        response = client.post(
+            "/register",
+            json=dict(
+                credentials,
+                email=f"{username}@example.com",
+                birthdate="1990-01-01",
+                gender="other",
+                phoneNumber="5555550100",
+            ),
+        )
+        assert response.status_code == 201, response.get_json()
+        response = client.post("/login", json=credentials)
+        assert response.status_code == 200, response.get_json()
+        token = response.get_json()["AccessToken"]
+        user_id = jwt.decode(token, options={"verify_signature": False})["sub"]
+        return {"Authorization": f"Bearer {token}"}, user_id
+
+    return login
+
+
+@pytest.fixture
+def render_form(request, app, login, monkeypatch, video_path, overlay_path):
+    """Give a new user a project over a stored video and return a render form.
+
+    The fixture returns the user's Authorization headers and the form fields
+    shared by /preview, /process_video and /process_video_batch. Parametrize it
+    indirectly with a dict to change fields. Render jobs stay queued, so nothing
+    is rendered.
+    """
+    from backend.database import Project, db
+    from backend.jobs import RenderQueue
+
+    monkeypatch.setenv("OVERLAY_IMAGE", overlay_path)
+    monkeypatch.setattr(RenderQueue, "_schedule", lambda self, *args: None)
+    headers, user_id = login()
+    video_filename = f"video-{uuid.uuid4().hex}.mp4"
+    shutil.copy(video_path, os.path.join(os.environ["UPLOAD_FOLDER"], video_filename))
+    with app.app_context():
+        db.session.add(Project(name="video", user_id=user_id, file_path=video_filename))
+        db.session.commit()
+    form = {
+        "video_filename": video_filename,
+        "timestamps": json.dumps([{"timestamp": 0.2, "points": POINTS}]),
+    }
+    return headers, dict(form, **getattr(request, "param", {}))
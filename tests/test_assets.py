@@ -0,0 +1,80 @@
+import os
+import shutil
+
+import cv2
+import numpy as np
+
+from backend.video.assets import OverlayCache
+
+# The overlay fixture is 30 x 20 BGR
+OVERLAY_BYTES = 30 * 20 * 3
+
+
+def test_hits_and_misses_are_counted(overlay_path):
+    cache = OverlayCache(10**6)
+
+    first = cache.get(overlay_path)
+    again = cache.get(overlay_path)
+
+    assert again is first
+    assert not first.flags.writeable
+    assert cache.get(overlay_path + ".missing") is None
+    assert cache.stats() == {
+        "entries": 1,
+        "bytes": OVERLAY_BYTES,
+        "hits": 1,
+        "misses": 1,
+        "evictions": 0,
+    }
+
+
+def test_resized_entries_are_keyed_by_size_and_interpolation(overlay_path):
+    cache = OverlayCache(10**6)
+
+    small = cache.get_resized(overlay_path, (10, 8))
+    assert cache.get_resized(overlay_path, (10, 8)) is small
+    wide = cache.get_resized(overlay_path, (40, 8))
+    nearest = cache.get_resized(overlay_path, (10, 8), cv2.INTER_NEAREST)
+
+    assert small.shape == (8, 10, 3)
+    assert wide.shape == (8, 40, 3)
+    assert nearest is not small
+    # The decoded overlay and three resized variants
+    assert cache.stats()["entries"] == 4
+
+
+def test_replaced_overlays_are_read_again(overlay_path):
+    cache = OverlayCache(10**6)
+    original = cache.get(overlay_path)
+
+    cv2.imwrite(overlay_path, np.full((20, 30, 3), 128, dtype=np.uint8))
+    stat = os.stat(overlay_path)
+    os.utime(overlay_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    replaced = cache.get(overlay_path)
+
+    assert not np.array_equal(replaced, original)
+    assert (replaced == 128).all()
+    assert cache.stats()["misses"] == 2
+
+
+def test_least_recently_used_overlays_are_evicted(overlay_path, tmp_path):
+    cache = OverlayCache(2 * OVERLAY_BYTES)
+    paths = []
+    for name in ("a.png", "b.png", "c.png"):
+        paths.append(str(tmp_path / name))
+        shutil.copy(overlay_path, paths[-1])
+    a, b, c = paths
+
+    cache.get(a)
+    cache.get(b)
+    cache.get(a)
+    cache.get(c)
+
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == 2 * OVERLAY_BYTES
+    hits = cache.stats()["hits"]
+    cache.get(a)
+    cache.get(c)
+    assert cache.stats()["hits"] == hits + 2
+    cache.get(b)
+    assert cache.stats()["misses"] == 4
@@ -0,0 +1,136 @@
+import threading
+import time
+
+import jwt
+import pytest
+
+from backend import auth
+from backend.local_identity import (
+    LocalCognitoClient,
+    get_local_cognito_client,
+    load_signing_key,
+)
+
+
+def test_local_tokens_verify(app, login):
+    headers, user_id = login()
+    token = headers["Authorization"].split(" ")[1]
+
+    assert auth.verify_cognito_token(token)["sub"] == user_id
+    response = app.test_client().get("/projects", headers=headers)
+    assert response.status_code == 200
+
+
+def test_tokens_signed_with_another_key_are_rejected(app, login):
+    headers, _ = login()
+    claims = jwt.decode(
+        headers["Authorization"].split(" ")[1], options={"verify_signature": False}
+    )
+    forged = jwt.encode(
+        claims,
+        load_signing_key(),
+        algorithm="RS256",
+        headers={"kid": get_local_cognito_client().key_id},
+    )
+
+    with pytest.raises(jwt.InvalidTokenError):
+        auth.verify_cognito_token(forged)
+    response = app.test_client().get(
+        "/projects", headers={"Authorization": f"Bearer {forged}"}
+    )
+    assert response.status_code == 401
+
+
+def test_forked_process_keeps_the_local_backend(monkeypatch):
+    monkeypatch.setattr(auth, "_cognito_client", None)
+    assert isinstance(auth.get_cognito_client(), LocalCognitoClient)
+    # A process forked after the client was created sees another pid
+    monkeypatch.setattr(auth, "_cognito_client_pid", -1)
+    assert auth.get_cognito_client() is get_local_cognito_client()
+
+
+class Loader:
+    """Serves a JWKS with the given key IDs and counts the fetches."""
+
+    def __init__(self, *kids, delay=0.0):
+        self.jwks = get_local_cognito_client().jwks()
+        self.kids = kids
+        self.delay = delay
+        self.calls = 0
+        self.released = threading.Event()
+        self.released.set()
+
+    def __call__(self):
+        self.calls += 1
+        self.released.wait()
+        time.sleep(self.delay)
+        [key] = self.jwks["keys"]
+        return {"keys": [dict(key, kid=kid) for kid in self.kids]}
+
+
+def test_concurrent_first_requests_fetch_the_jwks_once():
+    loader = Loader("a", delay=0.1)
+    cache = auth.JWKSCache("https://example.com/jwks.json", 60, loader=loader)
+    keys = []
+    threads = [
+        threading.Thread(target=lambda: keys.append(cache.get_signing_key("a")))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert loader.calls == 1
+    assert [key.key_id for key in keys] == ["a"] * 8
+
+
+def test_expired_keys_are_served_while_refreshed_in_the_background():
+    loader = Loader("a")
+    cache = auth.JWKSCache("https://example.com/jwks.json", 60, loader=loader)
+    cache.get_signing_key("a")
+    loader.kids = ("b",)
+    loader.released.clear()
+    cache.fetched_at -= 61
+
+    # The refresh is blocked, so the expired set is still served
+    assert cache.get_signing_key("a").key_id == "a"
+    assert cache.get_signing_key("a").key_id == "a"
+    loader.released.set()
+    while cache.refreshing:
+        time.sleep(0.01)
+
+    assert loader.calls == 2
+    assert cache.get_signing_key("b").key_id == "b"
+    assert loader.calls == 2
+
+
+def test_unknown_kids_refetch_at_most_once_per_interval(monkeypatch):
+    monkeypatch.setattr(auth, "JWKS_MIN_REFETCH_SEC", 60)
+    loader = Loader("a")
+    cache = auth.JWKSCache("https://example.com/jwks.json", 600, loader=loader)
+    cache.get_signing_key("a")
+    loader.kids = ("a", "rotated")
+    cache.refetched_at -= 61
+
+    assert cache.get_signing_key("rotated").key_id == "rotated"
+    assert loader.calls == 2
+    for _ in range(3):
+        with pytest.raises(jwt.PyJWKClientError):
+            cache.get_signing_key("forged")
+    assert loader.calls == 2
+
+
+def test_verified_tokens_are_forgotten_when_they_expire(monkeypatch):
+    cache = auth.VerifiedTokenCache(2)
+    now = time.time()
+    cache.put("expiring", {"sub": "user", "exp": now + 10})
+    cache.put("no-exp", {"sub": "user"})
+    cache.put("later", {"sub": "user", "exp": now + 100})
+
+    assert cache.get("expiring")["sub"] == "user"
+    assert cache.get("no-exp") is None
+    monkeypatch.setattr(auth.time, "time", lambda: now + 50)
+    assert cache.get("expiring") is None
+    assert cache.get("later")["sub"] == "user"
+    assert list(cache.entries) == ["later"]
@@ -0,0 +1,108 @@
+import shutil
+
+import cv2
+import pytest
+
+from backend.video import (
+    Placement,
+    open_capture,
+    render_chunk,
+    render_placements,
+    render_placements_chunked,
+    split_frame_ranges,
+)
+from backend.video import chunked
+
+from conftest import write_video
+
+QUAD = [(10, 8), (60, 10), (58, 50), (12, 48)]
+
+
+def count_frames(path):
+    video_capture = cv2.VideoCapture(path)
+    count = 0
+    while video_capture.grab():
+        count += 1
+    video_capture.release()
+    return count
+
+
+def test_chunks_cover_every_frame_once(tmp_path, overlay_path):
+    video_path = write_video(str(tmp_path / "long.mp4"), frame_count=90)
+    placements = [Placement(QUAD, 0.5, 2.0)]
+    ranges = split_frame_ranges(90, 4)
+
+    written = [
+        render_chunk(
+            video_path,
+            overlay_path,
+            str(tmp_path / f"part_{index}.mp4"),
+            placements,
+            start,
+            stop,
+        )[0]
+        for index, (start, stop) in enumerate(ranges)
+    ]
+
+    ends = [stop for _, stop in ranges[:-1]] + [90]
+    assert written == [end - start for (start, _), end in zip(ranges, ends)]
+    assert [
+        count_frames(str(tmp_path / f"part_{index}.mp4")) for index in range(4)
+    ] == written
+
+
+def test_chunk_workers_bypass_the_frame_store(
+    monkeypatch, video_path, overlay_path, tmp_path
+):
+    def fail(*args, **kwargs):
+        raise AssertionError("chunk workers must not use open_video")
+
+    monkeypatch.setattr(chunked, "open_video", fail)
+    frames_written, _ = render_chunk(
+        video_path, overlay_path, str(tmp_path / "part.mp4"), [], 10, 20
+    )
+    assert frames_written == 10
+
+
+def test_a_chunk_without_its_overlay_fails(video_path, tmp_path):
+    with pytest.raises(RuntimeError, match="could not be read"):
+        render_chunk(
+            video_path,
+            str(tmp_path / "missing.png"),
+            str(tmp_path / "part.mp4"),
+            [],
+            0,
+            10,
+        )
+
+
+def test_without_ffmpeg_renders_in_one_pass(monkeypatch, tmp_path, overlay_path):
+    video_path = write_video(str(tmp_path / "long.mp4"), frame_count=600)
+    monkeypatch.setattr(chunked, "MIN_CHUNK_FRAMES", 100)
+    monkeypatch.setattr(chunked.shutil, "which", lambda name: None)
+    single_pass = []
+    monkeypatch.setattr(
+        chunked,
+        "render_placements",
+        lambda *args, **kwargs: single_pass.append(args) or True,
+    )
+
+    assert render_placements_chunked(
+        video_path, overlay_path, str(tmp_path / "out.mp4"), [], workers=4
+    )
+    assert len(single_pass) == 1
+
+
+@pytest.mark.skipif(not shutil.which("ffmpeg"), reason="ffmpeg is not installed")
+def test_chunked_render_keeps_the_frame_count(monkeypatch, tmp_path, overlay_path):
+    video_path = write_video(str(tmp_path / "long.mp4"), frame_count=600)
+    monkeypatch.setattr(chunked, "MIN_CHUNK_FRAMES", 100)
+    output_path = str(tmp_path / "out.mp4")
+    placements = [Placement(QUAD, 1.0, 15.0)]
+
+    assert render_placements_chunked(
+        video_path, overlay_path, output_path, placements, workers=4
+    )
+    video_capture, properties = open_capture(video_path)
+    video_capture.release()
+    assert count_frames(output_path) == properties["frame_count"] == 600
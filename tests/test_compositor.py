@@ -0,0 +1,26 @@
+import cv2
+import numpy as np
+
+from backend.video.compositor import (
+    overlay_corners,
+    quad_dimensions,
+    quad_roi,
+    warp_into_roi,
+)
+
+
+def test_warped_edges_keep_the_overlay_colour():
+    pts_dst = np.array(
+        [[10.3, 8.6], [50.7, 12.2], [47.4, 40.8], [12.1, 38.5]], dtype=np.float32
+    )
+    width, height = quad_dimensions(pts_dst)
+    overlay = np.full((height, width, 3), 255, dtype=np.uint8)
+    matrix = cv2.getPerspectiveTransform(overlay_corners(width, height), pts_dst)
+
+    warped, coverage = warp_into_roi(
+        overlay, matrix, pts_dst, quad_roi(pts_dst, (64, 48))
+    )
+
+    # Only the coverage may fade the edge; the colour itself must not darken
+    assert (coverage > 0).any() and (coverage < 255).any()
+    assert (warped[coverage > 0] == 255).all()
@@ -0,0 +1,72 @@
+import boto3
+import pytest
+from botocore.stub import Stubber
+
+from backend import auth
+
+CONFIRM = {"UserPoolId": "us-east-1_test", "Username": "user"}
+
+
+@pytest.fixture
+def cognito(monkeypatch):
+    """Install a stubbed Cognito client and return its Stubber."""
+    monkeypatch.setattr(auth, "CONFIRMATION_BACKOFF_SEC", 0)
+    monkeypatch.setattr(auth, "VERIFY_CONFIRMATION", False)
+    client = boto3.client(
+        "cognito-idp",
+        region_name="us-east-1",
+        aws_access_key_id="test",
+        aws_secret_access_key="test",
+    )
+    with Stubber(client) as stubber:
+        auth.set_cognito_client(client)
+        yield stubber
+        stubber.assert_no_pending_responses()
+    auth.set_cognito_client(None)
+
+
+def test_confirmation_is_retried_after_a_transient_error(cognito):
+    cognito.add_client_error("admin_confirm_sign_up", "InternalErrorException")
+    cognito.add_client_error("admin_confirm_sign_up", "TooManyRequestsException")
+    cognito.add_response("admin_confirm_sign_up", {}, CONFIRM)
+
+    assert auth.confirm_user_account("user")
+
+
+def test_confirmation_gives_up_after_every_attempt_fails(cognito, monkeypatch):
+    monkeypatch.setattr(auth, "CONFIRMATION_ATTEMPTS", 2)
+    for _ in range(2):
+        cognito.add_client_error("admin_confirm_sign_up", "InternalErrorException")
+
+    assert not auth.confirm_user_account("user")
+
+
+def test_an_already_confirmed_user_counts_as_confirmed(cognito):
+    cognito.add_client_error(
+        "admin_confirm_sign_up",
+        "NotAuthorizedException",
+        "User cannot be confirmed. Current status is CONFIRMED",
+    )
+
+    assert auth.confirm_user_account("user")
+
+
+def test_unknown_users_are_not_confirmed(cognito):
+    cognito.add_client_error("admin_confirm_sign_up", "UserNotFoundException")
+
+    assert not auth.confirm_user_account("user")
+
+
+def test_login_confirms_a_user_whose_confirmation_is_behind(cognito):
+    login = {
+        "ClientId": "test-client",
+        "AuthFlow": "USER_PASSWORD_AUTH",
+        "AuthParameters": {"USERNAME": "user", "PASSWORD": "Password-1"},
+    }
+    cognito.add_client_error("initiate_auth", "UserNotConfirmedException")
+    cognito.add_response("admin_confirm_sign_up", {}, CONFIRM)
+    cognito.add_response(
+        "initiate_auth", {"AuthenticationResult": {"AccessToken": "token"}}, login
+    )
+
+    assert auth.authenticate_user("user", "Password-1") == {"AccessToken": "token"}
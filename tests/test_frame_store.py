@@ -0,0 +1,113 @@
+import os
+
+import numpy as np
+import pytest
+
+from backend.video import (
+    FrameStore,
+    SpillingCapture,
+    StoredFrames,
+    open_capture,
+    open_video,
+)
+from backend.video import render
+
+from conftest import write_video
+
+
+def read_all(video_capture):
+    frames = []
+    while True:
+        ret, frame = video_capture.read()
+        if not ret:
+            return frames
+        frames.append(frame)
+
+
+def spill(store, video_path):
+    video_capture, properties = open_capture(video_path)
+    spilled = store.spill(video_path, video_capture, properties)
+    assert isinstance(spilled, SpillingCapture)
+    frames = read_all(spilled)
+    spilled.release()
+    return frames
+
+
+@pytest.fixture
+def store(tmp_path):
+    return FrameStore(str(tmp_path / "store"), 10**8)
+
+
+def test_a_full_read_is_committed_and_served(monkeypatch, store, video_path):
+    decoded = spill(store, video_path)
+    monkeypatch.setattr(render, "frame_store", store)
+
+    video_capture, properties = open_video(video_path)
+
+    assert isinstance(video_capture, StoredFrames)
+    assert properties["frame_count"] == len(decoded) == 60
+    stored = read_all(video_capture)
+    np.testing.assert_array_equal(np.array(stored), np.array(decoded))
+    # Seeks are exact at every frame
+    video_capture.set(render.cv2.CAP_PROP_POS_FRAMES, 41)
+    np.testing.assert_array_equal(video_capture.read()[1], decoded[41])
+    assert store.stats() == {"hits": 1, "misses": 0, "evictions": 0}
+
+
+def test_partial_reads_are_not_committed(store, video_path):
+    video_capture, properties = open_capture(video_path)
+    spilled = store.spill(video_path, video_capture, properties)
+    for _ in range(10):
+        spilled.read()
+    spilled.release()
+
+    assert store.open(video_path) == (None, None)
+    assert os.listdir(store.folder) == []
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    # Room for the first video and half of it again
+    store = FrameStore(str(tmp_path / "store"), 96 * 64 * 3 * 90)
+    first = write_video(str(tmp_path / "first.mp4"))
+    second = write_video(str(tmp_path / "second.mp4"), frame_count=40)
+    spill(store, first)
+    first_files = set(os.listdir(store.folder))
+    for name in first_files:
+        os.utime(os.path.join(store.folder, name), (1, 1))
+
+    spill(store, second)
+
+    assert store.stats()["evictions"] == 1
+    assert first_files.isdisjoint(os.listdir(store.folder))
+    assert len(os.listdir(store.folder)) == 2
+    assert store.open(first) == (None, None)
+    assert store.open(second)[1]["frame_count"] == 40
+
+
+class FailingFile:
+    """A file whose writes fail, as on a full disk."""
+
+    def __init__(self, file):
+        self.file = file
+
+    def write(self, data):
+        raise OSError("No space left on device")
+
+    def close(self):
+        self.file.close()
+
+
+def test_a_failed_spill_removes_its_partial_file(store, video_path):
+    video_capture, properties = open_capture(video_path)
+    spilled = store.spill(video_path, video_capture, properties)
+    for _ in range(5):
+        spilled.read()
+    assert [name for name in os.listdir(store.folder) if name.endswith(".partial")]
+    spilled.file = FailingFile(spilled.file)
+
+    # The render goes on without the store
+    assert len(read_all(spilled)) == 55
+    spilled.release()
+
+    assert os.listdir(store.folder) == []
+    assert store.open(video_path) == (None, None)
@@ -0,0 +1,226 @@
+import time
+
+from backend import jobs
+from backend.database import (
+    RenderJob,
+    RenderJobAccess,
+    RenderJobLease,
+    RenderResult,
+    db,
+)
+from backend.jobs import LEASE_TIMEOUT_SEC, reclaim_orphaned_jobs, run_render_job
+from backend.video import STAGES, Placement
+
+QUAD = [(2, 2), (40, 4), (38, 30), (4, 28)]
+MOVED = [(x + 20, y + 10) for x, y in QUAD]
+
+
+def add_job(job_id, status, owner=None, heartbeat_at=None):
+    db.session.add(
+        RenderJob(
+            id=job_id,
+            status=status,
+            video_filename="video.mp4",
+            result_path=f"/tmp/{job_id}.mp4",
+        )
+    )
+    if owner is not None:
+        db.session.add(
+            RenderJobLease(job_id=job_id, owner=owner, heartbeat_at=heartbeat_at)
+        )
+    db.session.commit()
+
+
+def test_reclaim_only_fails_jobs_of_dead_owners(app):
+    now = time.time()
+    with app.app_context():
+        add_job("live-running", "running", "other:1", now)
+        add_job("live-queued", "queued", "other:1", now - 5)
+        add_job("stale", "running", "dead:2", now - LEASE_TIMEOUT_SEC - 1)
+        add_job("no-lease", "queued")
+        add_job("stale-done", "done", "dead:2", now - LEASE_TIMEOUT_SEC - 1)
+        database_uri = db.engine.url.render_as_string(hide_password=False)
+
+        assert reclaim_orphaned_jobs(database_uri, now) == 2
+
+        db.session.expire_all()
+        statuses = {job.id: job.status for job in RenderJob.query.all()}
+    assert statuses == {
+        "live-running": "running",
+        "live-queued": "queued",
+        "stale": "failed",
+        "no-lease": "failed",
+        "stale-done": "done",
+    }
+
+
+def test_job_status_is_only_visible_to_its_users(app, login):
+    owner_headers, owner_id = login("owner")
+    other_headers, other_id = login("other")
+    coalesced_headers, coalesced_id = login("coalesced")
+    with app.app_context():
+        db.session.add(
+            RenderJob(
+                id="owned",
+                status="done",
+                video_filename="video.mp4",
+                result_path="/tmp/owned.mp4",
+                user_id=owner_id,
+            )
+        )
+        db.session.add(RenderJobAccess(job_id="owned", user_id=coalesced_id))
+        db.session.commit()
+
+    client = app.test_client()
+    assert client.get("/jobs/owned").status_code == 401
+    assert client.get("/jobs/owned", headers=other_headers).status_code == 404
+    for headers in (owner_headers, coalesced_headers):
+        response = client.get("/jobs/owned", headers=headers)
+        assert response.status_code == 200
+        assert "result_path" not in response.get_json()
+        assert response.get_json()["result_url"] == "/jobs/owned/result"
+
+
+def test_job_result_is_only_served_to_its_users(app, login, tmp_path):
+    owner_headers, owner_id = login("owner")
+    other_headers, _ = login("other")
+    result_path = tmp_path / "result.mp4"
+    result_path.write_bytes(b"rendered")
+    with app.app_context():
+        db.session.add(
+            RenderJob(
+                id="rendered",
+                status="done",
+                video_filename="video.mp4",
+                result_path=str(result_path),
+                user_id=owner_id,
+            )
+        )
+        db.session.commit()
+
+    client = app.test_client()
+    assert client.get("/jobs/rendered/result").status_code == 401
+    response = client.get("/jobs/rendered/result", headers=other_headers)
+    assert response.status_code == 404
+    response = client.get("/jobs/rendered/result", headers=owner_headers)
+    assert response.status_code == 200
+    assert response.data == b"rendered"
+
+
+def test_results_support_ranges_and_revalidation(app, login, tmp_path):
+    headers, user_id = login()
+    content = bytes(range(250)) * 4
+    result_path = tmp_path / "result.mp4"
+    result_path.write_bytes(content)
+    cache_key = "c" * 64
+    with app.app_context():
+        db.session.add(
+            RenderJob(
+                id="ranged",
+                status="done",
+                video_filename="video.mp4",
+                result_path=str(result_path),
+                user_id=user_id,
+            )
+        )
+        db.session.add(RenderResult(cache_key=cache_key, job_id="ranged"))
+        db.session.commit()
+    client = app.test_client()
+
+    response = client.get(
+        "/jobs/ranged/result", headers=dict(headers, Range="bytes=0-99")
+    )
+    assert response.status_code == 206
+    assert response.headers["Content-Range"] == "bytes 0-99/1000"
+    assert response.data == content[:100]
+
+    response = client.get("/jobs/ranged/result", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["ETag"] == f'"{cache_key}"'
+    response = client.get(
+        "/jobs/ranged/result",
+        headers=dict(headers, **{"If-None-Match": f'"{cache_key}"'}),
+    )
+    assert response.status_code == 304
+    assert response.data == b""
+
+
+def test_job_events_are_only_streamed_to_its_users(app, login):
+    owner_headers, owner_id = login("owner")
+    other_headers, _ = login("other")
+    with app.app_context():
+        add_job("streamed", "failed")
+        db.session.get(RenderJob, "streamed").user_id = owner_id
+        db.session.commit()
+
+    client = app.test_client()
+    assert client.get("/jobs/streamed/events").status_code == 401
+    response = client.get("/jobs/streamed/events", headers=other_headers)
+    assert response.status_code == 404
+    response = client.get("/jobs/streamed/events", headers=owner_headers)
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    assert b'"status": "failed"' in response.data
+
+
+def test_render_records_its_telemetry(
+    app, monkeypatch, video_path, overlay_path, tmp_path
+):
+    monkeypatch.setattr(jobs, "PROGRESS_INTERVAL_SEC", 0.0)
+    snapshots = []
+    record_telemetry = jobs.record_telemetry
+
+    def record(database_uri, job_ids, snapshot, **values):
+        snapshots.append(snapshot)
+        record_telemetry(database_uri, job_ids, snapshot, **values)
+
+    monkeypatch.setattr(jobs, "record_telemetry", record)
+    with app.app_context():
+        add_job("timed", "queued")
+        database_uri = db.engine.url.render_as_string(hide_password=False)
+
+    assert run_render_job(
+        database_uri,
+        "timed",
+        video_path,
+        overlay_path,
+        str(tmp_path / "result.mp4"),
+        # A moving quad is warped on every frame, not once up front
+        [Placement(QUAD, 0.0, keyframes=[(0.0, QUAD), (2.0, MOVED)])],
+        {"backend": "frame", "chunk_workers": 0},
+    )
+
+    with app.app_context():
+        job = db.session.get(RenderJob, "timed")
+        assert (job.status, job.frames_done, job.progress) == ("done", 60, 1.0)
+        assert job.stats.fps > 0
+        assert job.stats.eta_sec == 0
+        for stage in STAGES:
+            assert getattr(job.stats, f"{stage}_sec") > 0
+    assert len(snapshots) > 2
+    assert all(snapshot["eta_sec"] is not None for snapshot in snapshots)
+    for earlier, later in zip(snapshots, snapshots[1:]):
+        assert later["frames_done"] >= earlier["frames_done"]
+        for stage in STAGES:
+            assert later["stage_sec"][stage] >= earlier["stage_sec"][stage]
+
+
+def test_events_end_when_the_job_is_deleted(app, login, monkeypatch):
+    headers, user_id = login()
+    with app.app_context():
+        add_job("deleted", "running")
+        db.session.get(RenderJob, "deleted").user_id = user_id
+        db.session.commit()
+    get = db.session.get
+    # The job disappears once the stream has started
+    monkeypatch.setattr(
+        db.session,
+        "get",
+        lambda model, key: None if model is RenderJob else get(model, key),
+    )
+    monkeypatch.setattr("backend.routes.find_user_job", lambda job_id, user_id: True)
+
+    response = app.test_client().get("/jobs/deleted/events", headers=headers)
+
+    assert response.status_code == 200
+    assert response.data.startswith(b"event: error")
@@ -0,0 +1,45 @@
+import numpy as np
+
+from backend.video import interpolate_quads
+from backend.video.compositor import QuadCompositor
+from backend.video.keyframes import KeyframedCompositor
+
+SQUARE = np.array([[0, 0], [10, 0], [10, 10], [0, 10]], dtype=np.float64)
+
+
+def test_interpolates_and_clamps():
+    quads = interpolate_quads([10, 20], [SQUARE, SQUARE + 10], np.arange(5, 26, 5))
+
+    np.testing.assert_allclose(quads[:, 0, 0], [0, 0, 5, 10, 10])
+
+
+def test_keyframes_on_the_same_frame_keep_the_last():
+    quads = interpolate_quads(
+        [0, 10, 10, 20],
+        [SQUARE, SQUARE + 100, SQUARE + 10, SQUARE + 20],
+        np.arange(0, 21, 5),
+    )
+
+    assert np.isfinite(quads).all()
+    np.testing.assert_allclose(quads[:, 0, 0], [0, 5, 10, 15, 20])
+
+
+def test_keyframes_all_on_one_frame():
+    quads = interpolate_quads([4, 4], [SQUARE, SQUARE + 1], np.arange(3))
+
+    np.testing.assert_allclose(quads, np.repeat([SQUARE + 1], 3, axis=0))
+
+
+def test_compositing_starts_at_the_last_keyframe_on_the_first_frame():
+    image = np.full((10, 10, 3), 255, dtype=np.uint8)
+    quads = [SQUARE + 5, SQUARE + 30, SQUARE + 40]
+    compositor = KeyframedCompositor(
+        image, [(0, quads[0]), (0, quads[1]), (10, quads[2])], (64, 64)
+    )
+    expected = QuadCompositor(image, quads[1], (64, 64))
+
+    frame = compositor.apply(np.zeros((64, 64, 3), dtype=np.uint8), 0)
+
+    np.testing.assert_array_equal(
+        frame, expected.apply(np.zeros((64, 64, 3), dtype=np.uint8))
+    )
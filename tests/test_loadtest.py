@@ -0,0 +1,90 @@
+import json
+import os
+
+import pytest
+
+import loadtest
+
+
+def report(p95_ms, p99_ms, route="GET /projects"):
+    return {
+        "elapsed_sec": 1.0,
+        "requests": 100,
+        "throughput": 100.0,
+        "routes": {
+            route: {
+                "requests": 100,
+                "errors": 0,
+                "throughput": 100.0,
+                "p50_ms": 1.0,
+                "p95_ms": p95_ms,
+                "p99_ms": p99_ms,
+            }
+        },
+    }
+
+
+def test_percentiles_use_the_nearest_rank():
+    values = list(range(1, 101))
+
+    assert [loadtest.percentile(values, percent) for percent in (50, 95, 99)] == [
+        50,
+        95,
+        99,
+    ]
+    assert loadtest.percentile(list(range(1, 11)), 95) == 10
+    assert loadtest.percentile([7.5], 50) == 7.5
+    assert loadtest.percentile([], 99) is None
+
+
+def test_summaries_group_samples_by_route():
+    samples = [("GET /projects", latency / 1000, 200) for latency in range(1, 21)]
+    samples.append(("POST /login", 0.005, 401))
+
+    summary = loadtest.summarize(samples, 2.0)
+
+    assert summary["requests"] == 21
+    assert summary["routes"]["GET /projects"]["p95_ms"] == pytest.approx(19)
+    assert summary["routes"]["POST /login"]["errors"] == 1
+    assert summary["routes"]["POST /login"]["throughput"] == 0.5
+
+
+def test_mixes_are_parsed():
+    assert loadtest.parse_mix(" login=1, list_projects=4,user_info") == {
+        "login": 1.0,
+        "list_projects": 4.0,
+        "user_info": 1.0,
+    }
+    assert loadtest.parse_mix("login=0,user_info=2") == {"user_info": 2.0}
+    with pytest.raises(ValueError, match="Unknown operation"):
+        loadtest.parse_mix("login=1,upload=2")
+    with pytest.raises(ValueError, match="at least one"):
+        loadtest.parse_mix("login=0")
+
+
+def test_tail_latency_growth_beyond_the_tolerance_regresses():
+    baseline = report(10.0, 20.0)
+
+    assert loadtest.compare_reports(baseline, report(11.9, 23.9), 0.2) == []
+    assert loadtest.compare_reports(baseline, report(12.5, 20.0), 0.2) == [
+        "GET /projects p95_ms rose from 10.0 to 12.5"
+    ]
+    # Routes missing from the baseline are not compared
+    assert loadtest.compare_reports(baseline, report(99, 99, "POST /login")) == []
+
+
+def test_baselines_are_saved_and_compared(monkeypatch, tmp_path):
+    runs = iter([report(10.0, 20.0), report(15.0, 20.0)])
+    monkeypatch.setattr(loadtest, "build_transport", lambda target: None)
+    monkeypatch.setattr(loadtest, "run_load", lambda *args, **kwargs: next(runs))
+    baseline = tmp_path / "instance" / "baseline.json"
+
+    assert loadtest.main(["--save-baseline", "--baseline", str(baseline)]) == 0
+    assert json.loads(baseline.read_text())["routes"]["GET /projects"]["p95_ms"] == 10
+    assert loadtest.main(["--compare", "--baseline", str(baseline)]) == 1
+
+
+def test_the_default_baseline_is_kept_in_the_instance_folder():
+    assert loadtest.DEFAULT_BASELINE.endswith(
+        os.path.join("instance", "loadtest_baseline.json")
+    )
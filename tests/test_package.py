@@ -0,0 +1,13 @@
+import os
+import subprocess
+import sys
+
+
+def test_video_package_imports_without_the_app_environment():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    environment = {"PATH": os.environ.get("PATH", ""), "HOME": root}
+    code = (
+        "import sys, backend.video;"
+        "assert 'backend.settings' not in sys.modules, 'settings were loaded'"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=root, env=environment, check=True)
@@ -0,0 +1,64 @@
+import json
+import os
+
+import pytest
+
+from conftest import POINTS
+
+
+def test_preview_requires_auth(app, render_form):
+    _, form = render_form
+    response = app.test_client().post("/preview", data=form)
+    assert response.status_code == 401
+
+
+@pytest.mark.parametrize(
+    "route", ["/preview", "/process_video", "/process_video_batch"]
+)
+def test_renders_need_an_owned_video(app, login, render_form, route):
+    _, form = render_form
+    headers, _ = login("other")
+    client = app.test_client()
+
+    escaped = client.post(
+        route, data=dict(form, video_filename="../video.mp4"), headers=headers
+    )
+    not_owned = client.post(route, data=form, headers=headers)
+
+    assert escaped.status_code == 400
+    assert not_owned.status_code == 404
+
+
+@pytest.mark.parametrize(
+    "render_form",
+    [
+        {"times": "[]"},
+        {"max_width": "0"},
+        {"duration": "0"},
+        {"duration": "nan"},
+        # Two entries at one time, so the first would never be shown
+        {"timestamps": json.dumps([{"timestamp": 0.2, "points": POINTS}] * 2)},
+    ],
+    indirect=True,
+)
+def test_preview_rejects_invalid_fields(app, render_form):
+    headers, form = render_form
+    response = app.test_client().post(
+        "/preview", data=dict(form, format="clip"), headers=headers
+    )
+    assert response.status_code == 400
+
+
+def test_preview_clip_is_deleted_after_sending(app, render_form):
+    headers, form = render_form
+    results = os.environ["RESULT_FOLDER"]
+    before = set(os.listdir(results))
+    response = app.test_client().post(
+        "/preview",
+        data=dict(form, format="clip"),
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert response.mimetype == "video/mp4"
+    assert response.data
+    assert set(os.listdir(results)) == before
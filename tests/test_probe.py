@@ -0,0 +1,97 @@
+import json
+import subprocess
+
+import pytest
+
+from backend.video import keyframe_before, open_capture, probe
+from backend.video.probe import probe_with_ffprobe
+
+
+def fake_ffprobe(monkeypatch, output, returncode=0):
+    def run(args, **kwargs):
+        return subprocess.CompletedProcess(args, returncode, json.dumps(output), "")
+
+    monkeypatch.setattr(probe.subprocess, "run", run)
+
+
+def test_ffprobe_output_is_parsed(monkeypatch):
+    fake_ffprobe(
+        monkeypatch,
+        {
+            "streams": [
+                {
+                    "width": 1920,
+                    "height": 1080,
+                    "r_frame_rate": "30000/1001",
+                    "avg_frame_rate": "0/0",
+                }
+            ],
+            # Packets are in decode order; B-frames come after the frame they
+            # are displayed before
+            "packets": [
+                {"pts_time": "0.500000", "flags": "K_"},
+                {"pts_time": "0.566733", "flags": "__"},
+                {"pts_time": "0.533367", "flags": "__"},
+                {"pts_time": "N/A", "flags": "__"},
+                {"pts_time": "0.600100", "flags": "K_"},
+            ],
+            "format": {"duration": "0.133467"},
+        },
+    )
+
+    assert probe_with_ffprobe("ffprobe", "video.mp4") == {
+        "width": 1920,
+        "height": 1080,
+        "fps_num": 30000,
+        "fps_den": 1001,
+        "duration_sec": 0.133467,
+        "frame_count": 4,
+        "keyframes": [[0, 0.0], [3, 0.1001]],
+    }
+
+
+@pytest.mark.parametrize(
+    "output, returncode",
+    [
+        ({}, 1),
+        ({"streams": []}, 0),
+        ({"streams": [{"width": 8, "height": 8, "r_frame_rate": "0/0"}]}, 0),
+    ],
+)
+def test_unusable_ffprobe_output_is_ignored(monkeypatch, output, returncode):
+    fake_ffprobe(monkeypatch, output, returncode)
+
+    assert probe_with_ffprobe("ffprobe", "video.mp4") is None
+
+
+def test_keyframe_before():
+    keyframes = [10, 40, 70]
+
+    assert keyframe_before(keyframes, 9) is None
+    assert keyframe_before(keyframes, 10) == 10
+    assert keyframe_before(keyframes, 69) == 40
+    assert keyframe_before(keyframes, 500) == 70
+    assert keyframe_before([], 5) is None
+
+
+def test_probed_captures_use_the_decoded_frame_size(video_path):
+    stored = {
+        "width": 64,
+        "height": 96,
+        "fps_num": 30000,
+        "fps_den": 1001,
+        "duration_sec": 2.0,
+        "frame_count": 59,
+        "keyframes": [[0, 0.0], [30, 1.001]],
+    }
+
+    video_capture, properties = open_capture(video_path, stored)
+    video_capture.release()
+
+    assert properties == {
+        "width": 96,
+        "height": 64,
+        "fps": 30000 / 1001,
+        "frame_count": 59,
+        "keyframes": [0, 30],
+    }
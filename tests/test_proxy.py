@@ -0,0 +1,94 @@
+import json
+import os
+import shutil
+import uuid
+
+import cv2
+import pytest
+
+from backend import routes
+from backend.database import Project, ProxyRendition, db
+from backend.jobs import RenderQueue
+from backend.video import generate_proxies, proxy_size
+
+from conftest import POINTS
+
+
+def test_proxy_size_is_even_and_bounded():
+    assert proxy_size(1920, 1080, 640) == (640, 360)
+    assert proxy_size(1000, 333, 640) == (640, 214)
+    assert proxy_size(96, 64, 640) == (96, 64)
+
+
+def test_proxies_are_generated(video_path, tmp_path):
+    result = generate_proxies(
+        video_path, str(tmp_path), "clip", max_width=40, thumbnail_count=4
+    )
+
+    assert (result["proxy_width"], result["proxy_height"]) == (40, 26)
+    assert (result["scale_x"], result["scale_y"]) == (96 / 40, 64 / 26)
+    proxy = cv2.VideoCapture(str(tmp_path / result["proxy_path"]))
+    assert proxy.get(cv2.CAP_PROP_FRAME_WIDTH) == 40
+    assert proxy.get(cv2.CAP_PROP_FRAME_HEIGHT) == 26
+    assert proxy.get(cv2.CAP_PROP_FRAME_COUNT) == 60
+    proxy.release()
+    strip = cv2.imread(str(tmp_path / result["thumbnails_path"]))
+    # Four thumbnails 90 pixels high, at the 3:2 aspect of the source
+    assert strip.shape == (90, 4 * 135, 3)
+    assert cv2.imread(str(tmp_path / result["poster_path"])).shape == (64, 96, 3)
+
+
+@pytest.fixture
+def shared_video(app, video_path):
+    """Store a video and return a function giving a user a project over it."""
+    filename = f"proxied-{uuid.uuid4().hex}.mp4"
+    shutil.copy(video_path, os.path.join(os.environ["UPLOAD_FOLDER"], filename))
+
+    def add_project(user_id, **rendition):
+        with app.app_context():
+            project = Project(name="video", user_id=user_id, file_path=filename)
+            db.session.add(project)
+            db.session.flush()
+            db.session.add(ProxyRendition(project_id=project.id, **rendition))
+            db.session.commit()
+        return {
+            "video_filename": filename,
+            "coordinate_space": "proxy",
+            "timestamps": json.dumps([{"timestamp": 0.2, "points": POINTS}]),
+        }
+
+    return add_project
+
+
+def test_proxy_coordinates_map_to_source_pixels(
+    app, login, monkeypatch, overlay_path, shared_video
+):
+    monkeypatch.setenv("OVERLAY_IMAGE", overlay_path)
+    monkeypatch.setattr(RenderQueue, "_schedule", lambda self, *args: None)
+    parsed = []
+    parse_placements = routes.parse_placements
+
+    def record(*args, **kwargs):
+        parsed.append(parse_placements(*args, **kwargs))
+        return parsed[-1]
+
+    monkeypatch.setattr(routes, "parse_placements", record)
+    owner_headers, owner_id = login("owner")
+    other_headers, other_id = login("other")
+    form = shared_video(owner_id, status="ready", scale_x=2.0, scale_y=4.0)
+    # Another user's project over the same file has no proxy yet
+    shared_video(other_id)
+    client = app.test_client()
+
+    response = client.post("/process_video", data=form, headers=owner_headers)
+    assert response.status_code == 202
+    [placement] = parsed[0]
+    assert [tuple(point) for point in placement.points] == [
+        (4, 8),
+        (28, 8),
+        (28, 40),
+        (4, 40),
+    ]
+
+    response = client.post("/process_video", data=form, headers=other_headers)
+    assert response.status_code == 409
@@ -0,0 +1,58 @@
+import cv2
+import numpy as np
+
+from backend.video import (
+    BATCH_BACKEND,
+    Placement,
+    parse_placements,
+    render_placements,
+)
+
+QUAD = [(10, 8), (60, 10), (58, 50), (12, 48)]
+
+
+def read_frames(path):
+    video_capture = cv2.VideoCapture(path)
+    frames = []
+    while True:
+        ret, frame = video_capture.read()
+        if not ret:
+            break
+        frames.append(frame)
+    video_capture.release()
+    return np.stack(frames)
+
+
+def test_serial_pipelined_and_batch_renders_match(tmp_path, video_path, overlay_path):
+    placements = [Placement(QUAD, 0.3, 1.0)] + parse_placements(
+        [
+            {
+                "timestamp": 1.2,
+                "points": [{"x": x, "y": y} for x, y in QUAD],
+                "interpolate": True,
+            },
+            {
+                "timestamp": 1.8,
+                "points": [{"x": x + 20, "y": y + 6} for x, y in QUAD],
+            },
+        ]
+    )
+    outputs = {}
+    for name, options in {
+        "serial": {"pipelined": False},
+        "pipelined": {"pipelined": True},
+        "batch": {"backend": BATCH_BACKEND},
+    }.items():
+        outputs[name] = str(tmp_path / f"{name}.mp4")
+        assert render_placements(
+            video_path, overlay_path, outputs[name], placements, **options
+        )
+
+    serial = read_frames(outputs["serial"])
+    assert len(serial) == 60
+    # Frame 15 is inside the first placement, whose quad covers this region
+    source = read_frames(video_path)
+    region = (15, slice(20, 40), slice(25, 45))
+    assert np.abs(serial[region].astype(int) - source[region]).mean() > 30
+    for name in ("pipelined", "batch"):
+        np.testing.assert_array_equal(read_frames(outputs[name]), serial, err_msg=name)
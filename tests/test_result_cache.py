@@ -0,0 +1,64 @@
+import hashlib
+import json
+import os
+import shutil
+
+from backend.database import StoredFile, db
+from backend.result_cache import (
+    VARIANTS_MODE,
+    file_digest,
+    render_cache_key,
+    render_mode,
+    video_digest,
+)
+from backend.video import Placement
+
+from conftest import POINTS
+
+
+def test_identical_requests_hit_and_changed_requests_miss(app, render_form):
+    headers, form = render_form
+    client = app.test_client()
+
+    first = client.post("/process_video", data=form, headers=headers)
+    again = client.post("/process_video", data=form, headers=headers)
+    moved = dict(
+        form,
+        timestamps=json.dumps([{"timestamp": 0.4, "points": POINTS}]),
+    )
+    changed = client.post("/process_video", data=moved, headers=headers)
+
+    assert first.status_code == again.status_code == changed.status_code == 202
+    assert again.get_json()["job_id"] == first.get_json()["job_id"]
+    assert changed.get_json()["job_id"] != first.get_json()["job_id"]
+
+
+def test_render_mode_is_part_of_the_key(video_path, overlay_path):
+    placements = [Placement([(1, 1), (9, 1), (9, 9), (1, 9)], 0.0)]
+    digest = file_digest(video_path)
+    modes = [
+        render_mode({"backend": "frame", "chunk_workers": 0}),
+        render_mode({"backend": "batch", "chunk_workers": 1}),
+        render_mode({"backend": "frame", "chunk_workers": 4}),
+        VARIANTS_MODE,
+    ]
+
+    keys = {render_cache_key(digest, overlay_path, placements, mode) for mode in modes}
+
+    assert len(keys) == len(modes)
+    assert render_mode({"backend": "batch", "chunk_workers": 4}) == modes[2]
+
+
+def test_uploaded_videos_use_their_stored_digest(app, video_path):
+    upload_folder = os.path.dirname(video_path)
+    size = os.path.getsize(video_path)
+    recorded = hashlib.sha256(b"digest recorded during the upload").hexdigest()
+    with app.app_context():
+        db.session.add(StoredFile(sha256=recorded, filename="source.mp4", size=size))
+        db.session.commit()
+
+        assert video_digest("source.mp4", video_path) == recorded
+        # Files that are not stored uploads are hashed
+        other = os.path.join(upload_folder, "other.mp4")
+        shutil.copy(video_path, other)
+        assert video_digest("other.mp4", other) == file_digest(video_path)
@@ -0,0 +1,46 @@
+import pytest
+
+from backend.video import PlacementSchedule, parse_placements
+
+from conftest import POINTS
+
+
+def test_the_interval_index_finds_the_active_compositors():
+    schedule = PlacementSchedule(
+        [
+            (0, 10, "first"),
+            (5, None, "open"),
+            (8, 8, "empty"),
+            (20, 30, "late"),
+        ]
+    )
+
+    assert schedule.boundaries == [0, 5, 10, 20, 30]
+    assert schedule.active(-1) == ()
+    assert schedule.active(0) == ("first",)
+    assert schedule.active(5) == ("first", "open")
+    assert schedule.active(9) == ("first", "open")
+    assert schedule.active(10) == ("open",)
+    assert schedule.active(25) == ("open", "late")
+    assert schedule.active(30) == schedule.active(10**6) == ("open",)
+
+
+def test_entries_sharing_a_timestamp_need_an_end():
+    entries = [
+        {"timestamp": 1.0, "points": POINTS},
+        {"timestamp": 1.0, "points": POINTS},
+    ]
+    with pytest.raises(ValueError, match="end_timestamp"):
+        parse_placements(entries)
+
+    entries[0]["end_timestamp"] = 2.0
+    placements = parse_placements(entries)
+    assert [(p.start_time_sec, p.end_time_sec) for p in placements] == [
+        (1.0, 2.0),
+        (1.0, None),
+    ]
+
+
+def test_entries_ending_before_they_start_are_rejected():
+    with pytest.raises(ValueError):
+        parse_placements([{"timestamp": 2.0, "end_timestamp": 1.0, "points": POINTS}])
@@ -0,0 +1,121 @@
+from concurrent.futures import Future
+from http import HTTPStatus
+
+import pytest
+
+from backend.exceptions import RenderRequestError
+from backend.scheduler import RenderScheduler, estimate_render_cost
+from backend.video import Placement, frame_store
+
+
+class Starts:
+    """Records the order jobs start in and lets the test finish them."""
+
+    def __init__(self):
+        self.order = []
+        self.futures = {}
+
+    def __call__(self, name):
+        def start():
+            self.order.append(name)
+            self.futures[name] = Future()
+            return self.futures[name]
+
+        return start
+
+    def finish(self, name):
+        self.futures[name].set_result(None)
+
+
+def test_users_take_turns():
+    scheduler = RenderScheduler(max_running=1, cost_budget=100)
+    starts = Starts()
+    for index in range(3):
+        scheduler.submit("heavy", 10, starts(f"heavy-{index}"))
+    scheduler.submit("light", 10, starts("light-0"))
+    scheduler.dispatch()
+
+    for _ in range(3):
+        starts.finish(starts.order[-1])
+
+    assert starts.order == ["heavy-0", "light-0", "heavy-1", "heavy-2"]
+
+
+def test_small_jobs_pass_a_job_over_the_budget():
+    scheduler = RenderScheduler(max_running=3, cost_budget=100)
+    starts = Starts()
+    scheduler.submit("first", 60, starts("first-0"))
+    scheduler.submit("big", 80, starts("big-0"))
+    scheduler.submit("small", 30, starts("small-0"))
+    scheduler.dispatch()
+
+    assert starts.order == ["first-0", "small-0"]
+    assert scheduler.stats()["cost_in_flight"] == 90
+
+    starts.finish("first-0")
+    starts.finish("small-0")
+    assert starts.order[-1] == "big-0"
+    assert scheduler.stats()["cost_in_flight"] == 80
+
+
+def test_a_job_larger_than_the_budget_runs_alone():
+    scheduler = RenderScheduler(max_running=2, cost_budget=100)
+    starts = Starts()
+    scheduler.submit("big", 500, starts("big-0"))
+    scheduler.submit("small", 10, starts("small-0"))
+    scheduler.dispatch()
+
+    assert starts.order == ["big-0"]
+    starts.finish("big-0")
+    assert starts.order == ["big-0", "small-0"]
+
+
+def test_admission_limits():
+    scheduler = RenderScheduler(
+        max_running=1, cost_budget=100, max_job_cost=50, max_queued_per_user=2
+    )
+    starts = Starts()
+    with pytest.raises(RenderRequestError) as error:
+        scheduler.submit("user", 51, starts("too-big"))
+    assert error.value.status_code == HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+
+    scheduler.submit("user", 10, starts("user-0"))
+    scheduler.submit("user", 10, starts("user-1"))
+    with pytest.raises(RenderRequestError) as error:
+        scheduler.submit("user", 10, starts("user-2"))
+    assert error.value.status_code == HTTPStatus.TOO_MANY_REQUESTS
+    scheduler.submit("other", 10, starts("other-0"))
+    assert scheduler.stats()["queued"] == {"user": 2, "other": 1}
+
+
+def test_a_large_job_progresses_under_a_stream_of_small_ones():
+    scheduler = RenderScheduler(max_running=2, cost_budget=100, max_skips=2)
+    starts = Starts()
+    scheduler.submit("small", 30, starts("small-0"))
+    scheduler.dispatch()
+    scheduler.submit("big", 90, starts("big-0"))
+    for index in range(1, 6):
+        scheduler.submit("small", 30, starts(f"small-{index}"))
+    scheduler.dispatch()
+
+    # Each finished small job frees room for the next small one only
+    starts.finish("small-0")
+    assert starts.order == ["small-0", "small-1", "small-2"]
+
+    # The big job has now been passed over twice, so the budget is held for it
+    starts.finish("small-1")
+    assert starts.order == ["small-0", "small-1", "small-2"]
+    starts.finish("small-2")
+    assert starts.order[-1] == "big-0"
+    assert scheduler.stats()["cost_in_flight"] == 90
+
+    starts.finish("big-0")
+    assert starts.order[-2:] == ["small-3", "small-4"]
+
+
+def test_cost_is_estimated_without_the_frame_store(monkeypatch, video_path):
+    monkeypatch.setattr(frame_store, "spill", None)
+    placements = [Placement([(1, 1), (9, 1), (9, 9), (1, 9)], 1.0)]
+
+    # 30 of the 60 frames at 30 fps, 96 x 64 pixels each
+    assert estimate_render_cost(video_path, placements) == 96 * 64 * 30
@@ -0,0 +1,67 @@
+import cv2
+import numpy as np
+
+from backend.video.tracking import PlanarTracker
+
+QUAD = [(40, 30), (100, 30), (100, 90), (40, 90)]
+STEP = (3, 2)
+
+
+def textured_patch(seed=0):
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(0, 256, (60, 60, 1), dtype=np.uint8).repeat(3, axis=2)
+    return cv2.GaussianBlur(noise, (3, 3), 0)
+
+
+def frame_with(patch, x, y):
+    frame = np.full((180, 240, 3), 90, dtype=np.uint8)
+    frame[y : y + 60, x : x + 60] = patch
+    return frame
+
+
+def count_detections(tracker):
+    calls = []
+    detect = tracker._detect
+
+    def counted(*args):
+        calls.append(args)
+        return detect(*args)
+
+    tracker._detect = counted
+    return calls
+
+
+def test_the_quad_follows_a_moving_surface():
+    patch = textured_patch()
+    tracker = PlanarTracker(QUAD, keyframe_interval=1000)
+    detections = count_detections(tracker)
+    tracker.start(frame_with(patch, *QUAD[0]))
+
+    for index in range(1, 11):
+        offset = np.multiply(STEP, index)
+        quad = tracker.update(frame_with(patch, *(QUAD[0] + offset)))
+        np.testing.assert_allclose(quad, np.add(QUAD, offset), atol=0.5)
+
+    assert tracker.confidence > 0.9
+    # Good tracks are followed without looking for new features
+    assert len(detections) == 1
+
+
+def test_features_are_detected_again_when_confidence_drops():
+    patch = textured_patch()
+    tracker = PlanarTracker(
+        QUAD, keyframe_interval=1000, min_features=1, min_confidence=0.9
+    )
+    detections = count_detections(tracker)
+    tracker.start(frame_with(patch, 40, 30))
+    tracker.update(frame_with(patch, 43, 32))
+    assert len(detections) == 1
+
+    # The right half of the surface moves differently, so only about half of
+    # the features agree on one homography
+    frame = frame_with(patch, 46, 34)
+    frame[:, 76:] = frame_with(patch, 56, 40)[:, 76:]
+    tracker.update(frame)
+
+    assert tracker.confidence < 0.9
+    assert len(detections) == 2
@@ -0,0 +1,183 @@
+import hashlib
+import io
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from backend import model_routes, result_cache, uploads
+from backend.database import Project, StoredFile, UploadSession, db
+from backend.settings import UPLOAD_WRITE_TIMEOUT_SEC
+from backend.uploads import (
+    claim_chunk,
+    claim_completion,
+    partial_path,
+    release_chunk,
+    release_completion,
+)
+
+CONTENT = bytes(range(256)) * 40
+
+
+def put_chunk(client, headers, upload_id, offset, data):
+    return client.put(
+        f"/uploads/{upload_id}?offset={offset}", data=data, headers=headers
+    )
+
+
+def test_upload_resumes_and_rejects_duplicate_offsets(app, login):
+    headers, _ = login()
+    client = app.test_client()
+    response = client.post(
+        "/uploads", json={"filename": "clip.mp4", "size": len(CONTENT)}, headers=headers
+    )
+    assert response.status_code == 201
+    upload_id = response.get_json()["upload_id"]
+
+    response = put_chunk(client, headers, upload_id, 0, CONTENT[:4000])
+    assert response.get_json()["offset"] == 4000
+    # A retried chunk, and one from the future, are told where to resume
+    for offset in (0, 6000):
+        response = put_chunk(client, headers, upload_id, offset, CONTENT[:1000])
+        assert response.status_code == 409
+        assert response.get_json()["offset"] == 4000
+    response = client.get(f"/uploads/{upload_id}", headers=headers)
+    assert response.get_json()["offset"] == 4000
+
+    response = put_chunk(client, headers, upload_id, 4000, CONTENT[4000:])
+    assert response.status_code == 200
+    assert response.get_json()["offset"] == len(CONTENT)
+    with app.app_context():
+        upload = db.session.get(UploadSession, upload_id)
+        assert upload.status == "uploading"
+        with open(partial_path(app.config["UPLOAD_FOLDER"], upload), "rb") as file:
+            assert file.read() == CONTENT
+
+
+def test_one_writer_per_chunk_until_its_claim_goes_stale(app):
+    with app.app_context():
+        db.session.add(
+            UploadSession(id="claimed", user_id="user", filename="a.mp4", size=100)
+        )
+        db.session.commit()
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+
+        assert claim_chunk("claimed", 0, now)
+        assert not claim_chunk("claimed", 0, now)
+        stale = now + timedelta(seconds=UPLOAD_WRITE_TIMEOUT_SEC + 1)
+        assert claim_chunk("claimed", 0, stale)
+
+        release_chunk("claimed", 40)
+        assert not claim_chunk("claimed", 0, stale)
+        assert claim_chunk("claimed", 40, stale)
+
+
+def start_upload(client, headers, content):
+    response = client.post(
+        "/uploads", json={"filename": "clip.mp4", "size": len(content)}, headers=headers
+    )
+    upload_id = response.get_json()["upload_id"]
+    assert put_chunk(client, headers, upload_id, 0, content).status_code == 200
+    return upload_id
+
+
+def test_upload_is_completed_once(monkeypatch, app, login):
+    monkeypatch.setattr(model_routes, "start_video_probe", lambda *args: None)
+    monkeypatch.setattr(model_routes, "start_proxy_generation", lambda *args: None)
+    headers, user_id = login()
+    client = app.test_client()
+    upload_id = start_upload(client, headers, CONTENT)
+    with app.app_context():
+        # Another process is completing it
+        assert claim_completion(upload_id)
+    response = client.post(
+        f"/uploads/{upload_id}/complete", json={"name": "clip"}, headers=headers
+    )
+    assert response.status_code == 409
+
+    with app.app_context():
+        release_completion(upload_id)
+    response = client.post(
+        f"/uploads/{upload_id}/complete", json={"name": "clip"}, headers=headers
+    )
+    assert response.status_code == 201
+    retried = client.post(
+        f"/uploads/{upload_id}/complete", json={"name": "clip"}, headers=headers
+    )
+    assert retried.status_code == 200
+    with app.app_context():
+        assert Project.query.filter_by(user_id=user_id).count() == 1
+        assert not claim_completion(upload_id)
+
+
+def test_concurrently_stored_content_is_shared(monkeypatch, app, login):
+    monkeypatch.setattr(model_routes, "start_video_probe", lambda *args: None)
+    monkeypatch.setattr(model_routes, "start_proxy_generation", lambda *args: None)
+    headers, _ = login()
+    client = app.test_client()
+    content = CONTENT[::-1]
+    stored_before = set(os.listdir(app.config["UPLOAD_FOLDER"]))
+    first = client.post(
+        f"/uploads/{start_upload(client, headers, content)}/complete",
+        json={"name": "first"},
+        headers=headers,
+    )
+    second_id = start_upload(client, headers, content)
+    # The second upload looks its content up before the first one is stored
+    get = db.session.get
+    lookups = []
+
+    def get_before_first_is_stored(model, key):
+        if model is StoredFile and not lookups:
+            lookups.append(key)
+            return None
+        return get(model, key)
+
+    monkeypatch.setattr(db.session, "get", get_before_first_is_stored)
+    second = client.post(
+        f"/uploads/{second_id}/complete", json={"name": "second"}, headers=headers
+    )
+    monkeypatch.undo()
+
+    assert second.status_code == 201
+    assert second.get_json()["deduplicated"]
+    assert second.get_json()["filename"] == first.get_json()["filename"]
+    assert set(os.listdir(app.config["UPLOAD_FOLDER"])) - stored_before == {
+        first.get_json()["filename"]
+    }
+
+
+def test_idle_digests_are_forgotten(app, login):
+    headers, _ = login()
+    client = app.test_client()
+    upload_id = start_upload(client, headers, CONTENT[:1000])
+    assert upload_id in uploads._hashers
+
+    uploads.prune_hashers(time.monotonic() + UPLOAD_WRITE_TIMEOUT_SEC + 1)
+
+    assert upload_id not in uploads._hashers
+
+
+def test_single_request_uploads_record_their_digest(app, login, monkeypatch):
+    monkeypatch.setattr(model_routes, "start_video_probe", lambda *args: None)
+    monkeypatch.setattr(model_routes, "start_proxy_generation", lambda *args: None)
+    headers, _ = login()
+    client = app.test_client()
+    content = CONTENT[::3]
+
+    filenames = [
+        client.post(
+            "/projects",
+            data={"name": "clip", "file": (io.BytesIO(content), "clip.mp4")},
+            headers=headers,
+        ).get_json()["filename"]
+        for _ in range(2)
+    ]
+
+    assert filenames[0] == filenames[1]
+    assert filenames[0].endswith(".mp4")
+    # Render requests read the digest instead of hashing the video
+    monkeypatch.setattr(result_cache, "file_digest", None)
+    path = os.path.join(app.config["UPLOAD_FOLDER"], filenames[0])
+    with app.app_context():
+        digest = result_cache.video_digest(filenames[0], path)
+    assert digest == hashlib.sha256(content).hexdigest()
@@ -0,0 +1,33 @@
+import cv2
+import numpy as np
+
+from backend.video import Placement, PlanarTracker, render_placements, render_variants
+
+from test_render import QUAD, read_frames
+
+
+def test_tracked_placements_are_tracked_once_for_all_variants(
+    monkeypatch, tmp_path, video_path, overlay_path
+):
+    other_path = str(tmp_path / "other.png")
+    cv2.imwrite(other_path, np.full((20, 30, 3), (0, 255, 0), dtype=np.uint8))
+    updates = []
+    update = PlanarTracker.update
+    monkeypatch.setattr(
+        PlanarTracker,
+        "update",
+        lambda self, frame: updates.append(self) or update(self, frame),
+    )
+    # The second half of the video is tracked
+    placements = [Placement(QUAD, 1.0, tracked=True)]
+    outputs = [str(tmp_path / "first.mp4"), str(tmp_path / "second.mp4")]
+
+    assert render_variants(
+        video_path, list(zip([overlay_path, other_path], outputs)), placements
+    )
+
+    assert len(updates) == 29
+    assert len(set(updates)) == 1
+    single_path = str(tmp_path / "single.mp4")
+    assert render_placements(video_path, overlay_path, single_path, placements)
+    np.testing.assert_array_equal(read_frames(outputs[0]), read_frames(single_path))